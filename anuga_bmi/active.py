@@ -0,0 +1,321 @@
+#! /usr/bin/env python
+"""
+Wet/dry active set.
+
+The active set holds the wet triangles (deeper than a wet depth) and the
+triangles within a halo of `halo` neighbours of them. It is kept as the
+number of wet triangles within the halo of each triangle, so when a few
+triangles wet or dry only the counts of their halos change.
+
+The set is updated by ActiveSetOperator at every timestep, before the
+operators that use it. Since the CFL condition keeps the water from
+crossing more than one triangle per timestep, a halo of one is enough for
+work done between updates.
+
+Users of the set record how much of their work they did, which gives
+the fraction of the work that was skipped. Users that only look at the
+domain now and then (output, reductions) watch the set, and get the
+triangles that were in it or were written through the BMI (touch) since
+they last looked.
+"""
+
+import numpy as np
+import scipy.sparse
+
+from anuga.operators.base_operator import Operator
+
+
+# above this fraction of changed triangles, the counts are recomputed
+_RECOUNT_FRACTION = 0.125
+
+
+class ActiveSet(object):
+    """
+    Wet triangles and their halo.
+
+    Parameters
+    ----------
+    neighbours : ndarray
+        (M, 3) neighbouring triangle of each edge (negative on the
+        boundary), as domain.neighbours.
+    wet_depth : float
+        Depth above which a triangle is wet.
+    halo : int, optional
+        Rings of neighbours added around the wet triangles.
+    """
+
+    def __init__(self, neighbours, wet_depth, halo=1):
+
+        neighbours = np.asarray(neighbours)
+        n = len(neighbours)
+
+        rows = np.repeat(np.arange(n), neighbours.shape[1])
+        cols = neighbours.ravel()
+        inside = cols >= 0
+
+        adjacency = scipy.sparse.csr_matrix(
+            (np.ones(np.count_nonzero(inside) + n),
+             (np.r_[rows[inside], np.arange(n)],
+              np.r_[cols[inside], np.arange(n)])),
+            shape=(n, n))
+
+        reach = scipy.sparse.identity(n, format='csr')
+        for _ in range(int(halo)):
+            reach = reach.dot(adjacency)
+            reach.data[:] = 1.
+
+        self._reach = reach.tocsr()
+        self.wet_depth = float(wet_depth)
+        self.halo = int(halo)
+
+        self.wet = np.zeros(n, dtype=bool)
+        self.mask = np.zeros(n, dtype=bool)
+        self.indices = np.zeros(0, dtype=int)
+        self._counts = np.zeros(n, dtype=int)
+        self._all = np.arange(n)
+
+        self.updates = 0
+        self._done = {}
+        self._total = {}
+        self._visited = []
+
+
+    def __len__(self):
+        return len(self.indices)
+
+
+    @property
+    def size(self):
+        """Number of triangles."""
+        return len(self.wet)
+
+
+    def update(self, height):
+        """
+        Update the set from the water depth.
+
+        Returns
+        -------
+        bool
+            Whether the set changed.
+        """
+
+        wet = height > self.wet_depth
+        changed = np.flatnonzero(wet != self.wet)
+        self.wet = wet
+
+        if len(changed) == 0:
+            return False
+
+        self.updates += 1
+
+        if len(changed) > _RECOUNT_FRACTION * self.size:
+            self._counts[:] = self._reach.dot(wet.astype(float))
+            mask = self._counts > 0
+            entered = np.flatnonzero(mask & ~self.mask)
+            self.mask = mask
+        else:
+            halos = self._reach[changed]
+            delta = np.where(wet[changed], 1, -1)
+            np.add.at(self._counts, halos.indices,
+                      np.repeat(delta, np.diff(halos.indptr)))
+            touched = halos.indices
+            was_active = self.mask[touched]
+            self.mask[touched] = self._counts[touched] > 0
+            entered = touched[self.mask[touched] & ~was_active]
+
+        self.indices = np.flatnonzero(self.mask)
+
+        if len(entered):
+            for visited in self._visited:
+                visited.append(entered)
+
+        return True
+
+
+    def watch(self):
+        """
+        Start tracking the triangles that enter the set or are written.
+
+        Returns
+        -------
+        int
+            Key of the tracker, for visited.
+        """
+
+        self._visited.append([self.indices])
+        return len(self._visited) - 1
+
+
+    def visited(self, key):
+        """
+        Sorted indices of the triangles that were in the set or were
+        written since the last call (or watch), and restart tracking.
+
+        A triangle that leaves the set is still returned by the next call,
+        so the watcher sees its last change (e.g. drying) before it stops
+        looking at it.
+        """
+
+        visited = self._visited[key]
+        self._visited[key] = [self.indices]
+
+        if len(visited) == 1:
+            return visited[0]
+        return np.unique(np.concatenate(visited))
+
+
+    def touch(self, indices=None):
+        """
+        Mark triangles whose quantities were written outside the
+        timestepping (all of them by default).
+        """
+
+        if not self._visited:
+            return
+
+        if indices is None:
+            indices = self._all
+        elif isinstance(indices, slice):
+            indices = self._all[indices]
+        else:
+            indices = np.asarray(indices, dtype=int).ravel()
+
+        for visited in self._visited:
+            visited.append(indices)
+
+
+    def record(self, name, n_done=None):
+        """
+        Record a pass of a user of the set over n_done triangles (all
+        active triangles by default) instead of all of them.
+        """
+
+        if n_done is None:
+            n_done = len(self.indices)
+
+        self._done[name] = self._done.get(name, 0) + n_done
+        self._total[name] = self._total.get(name, 0) + self.size
+
+
+    @property
+    def statistics(self):
+        """Size of the set and the fraction of work skipped by each user."""
+
+        statistics = {'active_cells': len(self.indices),
+                      'active_fraction': len(self.indices) / float(max(self.size, 1)),
+                      'active_set_updates': self.updates}
+
+        for name, total in self._total.items():
+            statistics['skipped_' + name] = 1. - self._done[name] / float(total)
+
+        return statistics
+
+
+class ActiveSetOperator(Operator):
+    """
+    Operator that updates an active set at every timestep.
+
+    It must be created before the operators that use the set, so that
+    anuga calls it first.
+
+    Parameters
+    ----------
+    domain : anuga.Domain
+        Domain.
+    active_set : ActiveSet
+        Set to update.
+    """
+
+    def __init__(self, domain, active_set):
+
+        Operator.__init__(self, domain, description='BMI active set',
+                          label='active_set')
+
+        self.active_set = active_set
+        active_set.update(domain.quantities['height'].centroid_values)
+
+
+    def __call__(self):
+        self.active_set.update(self.domain.quantities['height'].centroid_values)
+
+
+    def parallel_safe(self):
+        return True
+
+
+    def statistics(self):
+        return 'BMI active set: wet depth %g, halo %d' % (
+            self.active_set.wet_depth, self.active_set.halo)
+
+
+    def timestepping_statistics(self):
+        return 'BMI active set: %d of %d triangles' % (len(self.active_set),
+                                                       self.active_set.size)
+
+
+def restrict_to_active_set(operator_class, name, reset=()):
+    """
+    Subclass of a Region-based anuga operator that works on the triangles
+    of an active set only.
+
+    Region operators update the triangles at self.indices (all of them
+    when it is None); the subclass points it at the active set before
+    each call, and skips the call when the set is empty.
+
+    Parameters
+    ----------
+    operator_class : type
+        anuga operator, also derived from anuga's Region.
+    name : str
+        Name of the operator in the active set statistics.
+    reset : sequence of str, optional
+        Quantities set to 0 on the triangles that leave the set, since
+        the operator no longer updates them there.
+
+    Returns
+    -------
+    type
+        Operator class, created as operator_class(domain, active_set,
+        *args, **kwargs).
+    """
+
+    class ActiveSetRestricted(operator_class):
+
+        def __init__(self, domain, active_set, *args, **kwargs):
+
+            operator_class.__init__(self, domain, *args, **kwargs)
+
+            assert hasattr(self, 'indices') and self.indices is None, (
+                "%s cannot be restricted to the active set. "
+                "Set active_set: False to use it." % operator_class.__name__)
+
+            self.active_set = active_set
+            self._last_indices = active_set.indices
+            self._updates = active_set.updates
+
+
+        def __call__(self):
+
+            active_set = self.active_set
+
+            if reset and active_set.updates != self._updates:
+                left = np.setdiff1d(self._last_indices, active_set.indices,
+                                    assume_unique=True)
+                for quantity in reset:
+                    self.domain.quantities[quantity].centroid_values[left] = 0.
+                self._last_indices = active_set.indices
+                self._updates = active_set.updates
+
+            active_set.record(name)
+
+            if len(active_set.indices) == 0:
+                return
+
+            self.indices = active_set.indices
+            operator_class.__call__(self)
+
+
+    ActiveSetRestricted.__name__ = 'ActiveSet' + operator_class.__name__
+
+    return ActiveSetRestricted
@@ -4,10 +4,15 @@
 import types
 
 import numpy as np
-import yaml
 from basic_modeling_interface import Bmi
 
-from anuga_bmi.anuga_solver import AnugaSolver
+from anuga_bmi.indexing import IndexPlan
+
+
+# grid ids, one per location on the triangle mesh
+_CENTROIDS = 0
+_NODES = 1
+_EDGES = 2
 
 
 class BmiAnuga(Bmi):
@@ -40,10 +45,42 @@ class BmiAnuga(Bmi):
         """Create a BmiAnuga model that is ready for initialization."""
         self._anuga = None
         self._time = 0.
-        self._values = {}
-        self._var_units = {}
-        self._grids = {}
-        self._grid_type = {}
+
+        # metadata is available before initialize, without importing the
+        # solver
+        self._var_units = {
+            'manning_n_parameter': '-',
+            'land_surface__elevation': 'm',
+            'land_surface_water_surface__elevation': 'm',
+            'land_surface_water__depth': 'm',
+            'land_surface_water_flow__x_component_of_momentum': 'm2 s-1',
+            'land_surface_water_flow__y_component_of_momentum': 'm2 s-1',
+            'land_surface_water_flow__shear_stress': 'kg m-1 s-2',
+            'land_surface_water_sediment_suspended__volume_concentration': '-',
+            'land_vegetation__stem_spacing': 'm',
+            'land_vegetation__stem_diameter': 'm',
+            'land_surface__initial_elevation': 'm',}
+        
+        # one grid per location on the shared triangle mesh, so that
+        # couplers can reuse interpolation weights across variables
+        self._grids = {
+            _CENTROIDS: list(self._var_units.keys()),
+            _NODES: [],
+            _EDGES: [],}
+        
+        self._grid_location = {
+            _CENTROIDS: 'face',
+            _NODES: 'node',
+            _EDGES: 'edge',}
+        
+        self._grid_type = {
+            _CENTROIDS: 'unstructured grid',
+            _NODES: 'unstructured grid',
+            _EDGES: 'unstructured grid',}
+        
+        self._var_grid = dict((var_name, grid_id)
+                              for grid_id, var_names in self._grids.items()
+                              for var_name in var_names)
 
     def initialize(self, filename='anuga.yaml'):
         """Initialize the ANUGA model.
@@ -54,8 +91,23 @@ class BmiAnuga(Bmi):
             Path to name of input file.
         """
         
+        import yaml
+        
         with open(filename, 'r') as file_obj:
             params = yaml.load(file_obj)
+            
+        self._initialize_model(params)
+        
+    def _initialize_model(self, params, snapshot=None):
+        """Create the solver from input parameters.
+
+        Parameters
+        ----------
+        params : dict
+            Input parameters. Missing ones take their default values.
+        snapshot : Snapshot, optional
+            Saved state to restart from.
+        """
         
         default_params = {'domain_type':'square',
                           'shape':(10.,5.),
@@ -66,6 +118,16 @@ class BmiAnuga(Bmi):
                           'elevation_profile':'shallow linear ramp',
                           'output_filename':'anuga_output',
                           'output_timestep':10,
+                          'coupling_timestep':None,
+                          'coupling_mode': 'fixed',
+                          'coupling_min_timestep': None,
+                          'coupling_max_timestep': None,
+                          'coupling_target_steps': 50,
+                          'coupling_max_wet_change': 0.05,
+                          'coupling_growth': 2.0,
+                          'wet_depth': None,
+                          'active_set': False,
+                          'active_halo': 1,
                           'boundary_tags':{'left':[],
                                            'right':[],
                                            'top':[],
@@ -78,10 +140,19 @@ class BmiAnuga(Bmi):
                                                'xmomentum':2,
                                                'ymomentum':2,
                                                'elevation':1},
+                          'output_mode':'sync',
+                          'output_buffer_size':4,
+                          'output_format':'sww',
+                          'output_compression_level':4,
+                          'output_precision':'float32',
+                          'output_chunks':{},
+                          'output_least_significant_digit':{},
                           'maximum_triangle_area':10,
                           'initial_flow_depth': 0,
                           'interior_polygon_filename':'',
                           'interior_polygon_triangle_area': 0.0,
+                          'mesh_cache_directory':'',
+                          'mesh_cache_max_bytes':2000000000,
                           'toggle_sediment_transport':False,
                           'inflow_sediment_concentration': 0.0,
                           'initial_sediment_concentration': 0.0,
@@ -89,6 +160,27 @@ class BmiAnuga(Bmi):
                           'vegetation_stem_diameter': 0.0,
                           'vegetation_stem_spacing': 0.0,
                           'Mannings_n_parameter': 0.0,
+                          'land_cover_filename': '',
+                          'land_cover_table': {},
+                          'field_samples_per_edge': 4,
+                          'rainfall_rate': 0.0,
+                          'rainfall_units': 'mm/hr',
+                          'rainfall_variable': '',
+                          'infiltration_rate': 0.0,
+                          'infiltration_units': 'mm/hr',
+                          'infiltration_variable': '',
+                          'forcing_samples_per_edge': 4,
+                          'gauges': {},
+                          'gauge_quantities': ['stage', 'height'],
+                          'gauge_interval': None,
+                          'regions_of_interest': {},
+                          'region_quantities': ['height'],
+                          'region_interval': None,
+                          'reductions': [],
+                          'arrival_depth': 0.01,
+                          'progress_level': 'off',
+                          'progress_interval': 0.0,
+                          'parallel': False,
                           }
         
         
@@ -108,71 +200,16 @@ class BmiAnuga(Bmi):
                     
                     
             
-        self._anuga = AnugaSolver(params)
-
-
-        self._values = {
-            'manning_n_parameter': self._anuga.manning_n_parameter,
-            'land_surface__elevation': self._anuga.land_surface__elevation,
-            'land_surface_water_surface__elevation': self._anuga.land_surface_water_surface__elevation,
-            'land_surface_water__depth': self._anuga.land_surface_water__depth,
-            'land_surface_water_flow__x_component_of_momentum': self._anuga.land_surface_water_flow__x_component_of_momentum,
-            'land_surface_water_flow__y_component_of_momentum': self._anuga.land_surface_water_flow__y_component_of_momentum,
-            'land_surface_water_flow__shear_stress': self._anuga.land_surface_water_flow__shear_stress,
-            'land_surface_water_sediment_suspended__volume_concentration': self._anuga.land_surface_water_sediment_suspended__volume_concentration,
-            'land_vegetation__stem_spacing': self._anuga.land_vegetation__stem_spacing,
-            'land_vegetation__stem_diameter': self._anuga.land_vegetation__stem_diameter,
-            'land_surface__initial_elevation': self._anuga.land_surface__initial_elevation}
+        # anuga is only imported once a model is created
+        from anuga_bmi.anuga_solver import AnugaSolver
         
-        
-        self._var_units = {
-            'manning_n_parameter': '-',
-            'land_surface__elevation': 'm',
-            'land_surface_water_surface__elevation': 'm',
-            'land_surface_water__depth': 'm',
-            'land_surface_water_flow__x_component_of_momentum': 'm2 s-1',
-            'land_surface_water_flow__y_component_of_momentum': 'm2 s-1',
-            'land_surface_water_flow__shear_stress': 'kg m-1 s-2',
-            'land_surface_water_sediment_suspended__volume_concentration': '-',
-            'land_vegetation__stem_spacing': 'm',
-            'land_vegetation__stem_diameter': 'm',
-            'land_surface__initial_elevation': 'm',}
-        
-        self._grids = {
-            0: ['manning_n_parameter'],
-            1: ['land_surface__elevation'],
-            2: ['land_surface_water_surface__elevation'],
-            3: ['land_surface_water__depth'],
-            4: ['land_surface_water_flow__x_component_of_momentum'],
-            5: ['land_surface_water_flow__y_component_of_momentum'],
-            6: ['land_surface_water_flow__shear_stress'],
-            7: ['land_surface_water_sediment_suspended__volume_concentration'],
-            8: ['land_vegetation__stem_spacing'],
-            9: ['land_vegetation__stem_diameter'],
-            10: ['land_surface__initial_elevation'],}
-        
-        self._grid_type = {
-            0: 'unstructured grid',
-            1: 'unstructured grid',
-            2: 'unstructured grid',
-            3: 'unstructured grid',
-            4: 'unstructured grid',
-            5: 'unstructured grid',
-            6: 'unstructured grid',
-            7: 'unstructured grid',
-            8: 'unstructured grid',
-            9: 'unstructured grid',
-            10: 'unstructured grid',}
-
-
-
+        self._anuga = AnugaSolver(params, snapshot)
+        self._time = self._anuga._time
 
 
     def update(self):
         """Advance model by one time step."""
-        self._time += self.get_time_step()
-        self._anuga._time = self._time
-        self._anuga.update()
+        self.update_until(self._time + self.get_time_step())
 
     def update_frac(self, time_frac):
         """Update model by a fraction of a time step.
@@ -182,10 +219,7 @@ class BmiAnuga(Bmi):
         time_frac : float
             Fraction fo a time step.
         """
-        time_step = self.get_time_step()
-        self._anuga.time_step = time_frac * time_step
-        self.update()
-        self._anuga.time_step = time_step
+        self.update_until(self._time + time_frac * self.get_time_step())
 
 
     def update_until(self, then):
@@ -196,16 +230,97 @@ class BmiAnuga(Bmi):
         then : float
             Time to run model until.
         """
-        n_steps = (then - self.get_current_time()) / self.get_time_step()
+        if then <= self._time:
+            return
+            
+        self._time = then
+        self._anuga._time = self._time
+        self._anuga.update()
 
-        for _ in range(int(n_steps)):
-            self.update()
+    def add_elevation_change(self, delta, indices=None):
+        """Raise or lower the land surface, conserving the water depth.
+
+        Faster than setting land_surface__elevation for morphodynamic
+        coupling: only the changed cells are updated, the water surface
+        moves with the bed, and the changes are summed in place (see
+        get_cumulative_elevation_change).
+
+        Parameters
+        ----------
+        delta : array_like or float
+            Elevation change of each indexed cell, or of all cells.
+        indices : array_like or IndexPlan, optional
+            Array of indices, or a plan from create_index_plan. Repeated
+            indices get the sum of their changes; a scalar delta counts
+            once per occurrence, so a cell listed k times changes by
+            k * delta. All cells by default.
+        """
+        self._anuga.add_elevation_change(delta, indices)
+
+    def get_cumulative_elevation_change(self):
+        """Sum of the changes made with add_elevation_change.
+
+        Returns
+        -------
+        ndarray
+            Reference to the cumulative change of each cell.
+        """
+        return self._anuga.cumulative_elevation_change
+
+    def set_land_cover(self, table, filename=None):
+        """Set friction and vegetation from a land-cover table.
+
+        The land-cover class of each cell is sampled once per raster, so
+        switching scenarios only looks up the new values.
+
+        Parameters
+        ----------
+        table : dict or str
+            Values of each class ({code: {column: value}}) or a CSV file,
+            with columns manning_n, stem_diameter and/or stem_spacing.
+        filename : str, optional
+            Land-cover raster. The last one used by default.
+        """
+        self._anuga.set_land_cover(table, filename)
+
+    def save_state(self, path):
+        """Save the full model state to a snapshot directory.
+
+        Parameters
+        ----------
+        path : str
+            Snapshot directory.
+        """
+        self._anuga.save_state(path)
+
+    def load_state(self, path):
+        """Restart the model from a snapshot directory.
+
+        The mesh, quantities, boundary conditions, time and monitor
+        reductions are restored from the snapshot; output continues in
+        '<output_filename>_restart_<snapshot time>', with the time in
+        milliseconds precision (e.g. _restart_3600p000 for 3600 s).
+        Gauge and region time series start again from the snapshot
+        time.
+
+        Parameters
+        ----------
+        path : str
+            Snapshot directory written by save_state.
+        """
+        from anuga_bmi.checkpoint import Snapshot
         
-        if (n_steps - int(n_steps)) > 0.0:
-            self.update_frac(n_steps - int(n_steps))
+        snapshot = Snapshot(path)
+
+        if self._anuga is not None:
+            self._anuga.finalize()
+
+        self._initialize_model(snapshot.params, snapshot)
 
     def finalize(self):
         """Finalize model."""
+        if self._anuga is not None:
+            self._anuga.finalize()
         self._anuga = None
         
         
@@ -273,9 +388,22 @@ class BmiAnuga(Bmi):
         int
             Grid id.
         """
-        for grid_id, var_name_list in self._grids.items():
-            if var_name in var_name_list:
-                return grid_id
+        return self._var_grid[var_name]
+
+    def get_var_location(self, var_name):
+        """Location of a variable on its grid.
+
+        Parameters
+        ----------
+        var_name : str
+            Name of variable as CSDMS Standard Name.
+
+        Returns
+        -------
+        str
+            'face', 'node' or 'edge'.
+        """
+        return self._grid_location[self._var_grid[var_name]]
 
     """
     Grids
@@ -330,39 +458,97 @@ class BmiAnuga(Bmi):
         array_like
             Value array.
         """
-        return self._values[var_name]
+        return self._anuga.views.ref(var_name)
 
-    def get_value(self, var_name):
+    def get_value(self, var_name, out=None):
         """Copy of values.
 
         Parameters
         ----------
         var_name : str
             Name of variable as CSDMS Standard Name.
+        out : ndarray, optional
+            Array to copy the values into.
 
         Returns
         -------
         array_like
             Copy of values.
         """
-        return self.get_value_ref(var_name).copy()
+        if out is None:
+            return self.get_value_ref(var_name).copy()
+
+        np.copyto(out, self.get_value_ref(var_name))
+        return out
 
-    def get_value_at_indices(self, var_name, indices):
+    def get_values(self, var_names, out=None):
+        """Copies of the values of several variables.
+
+        Parameters
+        ----------
+        var_names : iterable of str
+            Names of variables as CSDMS Standard Names.
+        out : dict, optional
+            Arrays to copy the values into, keyed on variable name.
+            Variables without an array get a new one, which is added to
+            out, so passing the same dict again reuses every buffer.
+
+        Returns
+        -------
+        dict
+            Copies of values, keyed on variable name.
+        """
+        if out is None:
+            out = {}
+
+        for var_name in var_names:
+            out[var_name] = self.get_value(var_name, out.get(var_name))
+
+        return out
+
+    def get_value_at_indices(self, var_name, indices, out=None):
         """Get values at particular indices.
 
         Parameters
         ----------
         var_name : str
             Name of variable as CSDMS Standard Name.
-        indices : array_like
-            Array of indices.
+        indices : array_like or IndexPlan
+            Array of indices, or a plan from create_index_plan.
+        out : ndarray, optional
+            Array to copy the values into.
 
         Returns
         -------
         array_like
             Values at indices.
         """
-        return self.get_value_ref(var_name).take(indices)
+        if isinstance(indices, IndexPlan):
+            return indices.gather(self.get_value_ref(var_name), out)
+
+        return np.take(self.get_value_ref(var_name), indices, out=out)
+
+    def create_index_plan(self, indices, grid_id=_CENTROIDS):
+        """Plan for repeated access to the values at a set of indices.
+
+        The indices are validated, sorted and deduplicated once. Pass the
+        plan instead of the indices to get_value_at_indices and
+        set_value_at_indices (or set_values) to reuse that work and copy
+        runs of consecutive indices as slices.
+
+        Parameters
+        ----------
+        indices : array_like
+            Array of indices, in the order values are exchanged.
+        grid_id : int, optional
+            Grid of the indexed variables.
+
+        Returns
+        -------
+        IndexPlan
+            Index plan.
+        """
+        return IndexPlan(indices, self.get_grid_size(grid_id))
 
     def set_value(self, var_name, src):
         """Set model values.
@@ -374,8 +560,7 @@ class BmiAnuga(Bmi):
         src : array_like
             Array of new values.
         """
-        val = self.get_value_ref(var_name)
-        val[:] = src
+        self._anuga.views.write(var_name, src)
 
     def set_value_at_indices(self, var_name, src, indices):
         """Set model values at particular indices.
@@ -386,11 +571,27 @@ class BmiAnuga(Bmi):
             Name of variable as CSDMS Standard Name.
         src : array_like
             Array of new values.
-        indices : array_like
-            Array of indices.
+        indices : array_like or IndexPlan
+            Array of indices, or a plan from create_index_plan.
         """
-        val = self.get_value_ref(var_name)
-        val.flat[indices] = src
+        self._anuga.views.write(var_name, src, indices)
+
+    def set_values(self, values, indices=None):
+        """Set the values of several variables at once.
+
+        Stage, depth and elevation are brought back in step, and the
+        vertex values updated, once for the whole group instead of once
+        per variable.
+
+        Parameters
+        ----------
+        values : dict
+            Arrays of new values, keyed on variable name.
+        indices : array_like or IndexPlan, optional
+            Array of indices, or a plan from create_index_plan, the same
+            for every variable. All values by default.
+        """
+        self._anuga.views.write_many(values, indices)
 
 
 
@@ -413,21 +614,200 @@ class BmiAnuga(Bmi):
     """
         
     def get_grid_x(self, grid_id = None):
-        """Get coordinates of grid nodes in the streamwise direction"""
+        """Get x coordinates of the points of a grid (centroids by default).
+
+        The values of a grid are located at its points: the centroids of
+        the faces, the mesh nodes or the edge midpoints. The connectivity
+        of the mesh (get_grid_face_nodes, get_grid_edge_nodes) indexes
+        the nodes, given by get_grid_node_x.
+        """
+        if grid_id == _NODES:
+            return self._anuga.topology.node_x
+        elif grid_id == _EDGES:
+            return self._anuga.topology.edge_x
         return self._anuga.grid_x
         
     def get_grid_y(self, grid_id = None):
-        """Get coordinates of grid nodes in the streamwise direction"""
+        """Get y coordinates of the points of a grid (see get_grid_x)."""
+        if grid_id == _NODES:
+            return self._anuga.topology.node_y
+        elif grid_id == _EDGES:
+            return self._anuga.topology.edge_y
         return self._anuga.grid_y
         
     def get_grid_z(self, grid_id = None):
-        """Get elevation of the grid nodes"""
+        """Get elevation of the points of a grid (see get_grid_x)."""
+        if grid_id == _NODES:
+            return self._anuga.node_z
+        elif grid_id == _EDGES:
+            edge_nodes = self._anuga.topology.edge_nodes
+            node_z = self._anuga.node_z
+            return 0.5 * (node_z[edge_nodes[:, 0]] + node_z[edge_nodes[:, 1]])
         return self._anuga.grid_z
 
+    def get_grid_face_x(self, grid_id = None):
+        """Get x coordinates of the face centroids, where the values of
+        face variables are located."""
+        return self._anuga.grid_x
+
+    def get_grid_face_y(self, grid_id = None):
+        """Get y coordinates of the face centroids."""
+        return self._anuga.grid_y
+
+    def get_grid_edge_x(self, grid_id = None):
+        """Get x coordinates of the edge midpoints."""
+        return self._anuga.topology.edge_x
+
+    def get_grid_edge_y(self, grid_id = None):
+        """Get y coordinates of the edge midpoints."""
+        return self._anuga.topology.edge_y
+
+    def get_grid_node_x(self, grid_id = None):
+        """Get x coordinates of the mesh nodes (triangle vertices)"""
+        return self._anuga.topology.node_x
+
+    def get_grid_node_y(self, grid_id = None):
+        """Get y coordinates of the mesh nodes (triangle vertices)"""
+        return self._anuga.topology.node_y
+
+    def get_grid_node_count(self, grid_id):
+        """Number of nodes of the mesh."""
+        return self._anuga.topology.node_count
+
+    def get_grid_edge_count(self, grid_id):
+        """Number of edges of the mesh."""
+        return self._anuga.topology.edge_count
+
+    def get_grid_face_count(self, grid_id):
+        """Number of faces (triangles) of the mesh."""
+        return self._anuga.topology.face_count
+
+    def get_grid_nodes_per_face(self, grid_id, nodes_per_face=None):
+        """Number of nodes of each face.
+
+        Parameters
+        ----------
+        grid_id : int
+            Identifier of a grid.
+        nodes_per_face : ndarray, optional
+            Array to copy the values into.
+
+        Returns
+        -------
+        ndarray
+            Nodes per face (a read-only reference unless nodes_per_face
+            is given).
+        """
+        return _fill(self._anuga.topology.nodes_per_face, nodes_per_face)
+
+    def get_grid_face_nodes(self, grid_id, face_nodes=None):
+        """Node indices of each face, as an (n_faces, 3) array.
+
+        Parameters
+        ----------
+        grid_id : int
+            Identifier of a grid.
+        face_nodes : ndarray, optional
+            Array to copy the values into.
+
+        Returns
+        -------
+        ndarray
+            Face-node connectivity (a read-only reference unless
+            face_nodes is given).
+        """
+        return _fill(self._anuga.topology.face_nodes, face_nodes)
+
+    def get_grid_edge_nodes(self, grid_id, edge_nodes=None):
+        """Node indices of each edge, as an (n_edges, 2) array.
+
+        Parameters
+        ----------
+        grid_id : int
+            Identifier of a grid.
+        edge_nodes : ndarray, optional
+            Array to copy the values into.
+
+        Returns
+        -------
+        ndarray
+            Edge-node connectivity (a read-only reference unless
+            edge_nodes is given).
+        """
+        return _fill(self._anuga.topology.edge_nodes, edge_nodes)
+
+    def get_grid_face_edges(self, grid_id, face_edges=None):
+        """Edge indices of each face, as an (n_faces, 3) array.
+
+        Edge i of a face is the edge opposite its node i.
+
+        Parameters
+        ----------
+        grid_id : int
+            Identifier of a grid.
+        face_edges : ndarray, optional
+            Array to copy the values into.
+
+        Returns
+        -------
+        ndarray
+            Face-edge connectivity (a read-only reference unless
+            face_edges is given).
+        """
+        return _fill(self._anuga.topology.face_edges, face_edges)
+
+    def locate(self, x, y):
+        """Triangles that contain points, with interpolation weights.
+
+        Points are in the coordinates of the grids (see get_grid_x).
+
+        Parameters
+        ----------
+        x : array_like
+            x coordinates of the points.
+        y : array_like
+            y coordinates of the points.
+
+        Returns
+        -------
+        tuple of (ndarray, ndarray)
+            Face index of each point (-1 outside the mesh) and the (n, 3)
+            barycentric weights of the nodes of the face.
+        """
+        points = np.column_stack((np.ravel(x), np.ravel(y)))
+        return self._anuga.spatial_index.locate(points)
+
+    def query_polygon(self, polygon):
+        """Faces whose centroid is inside a polygon.
+
+        Parameters
+        ----------
+        polygon : array_like
+            (n, 2) vertices of the polygon, in the coordinates of the
+            grids (see get_grid_x).
+
+        Returns
+        -------
+        ndarray
+            Sorted face indices.
+        """
+        return self._anuga.spatial_index.query_polygon(polygon)
+
+    def get_grid_connectivity(self, grid_id):
+        """Flattened node indices of the faces."""
+        return self._anuga.topology.face_nodes.reshape(-1)
+
+    def get_grid_offset(self, grid_id):
+        """Offsets of the end of each face in the connectivity array."""
+        return self._anuga.topology.offsets
+
     def get_grid_shape(self, grid_id):
-        """Number of rows and columns of uniform rectilinear grid."""
-        var_name = self._grids[grid_id][0]
-        return self.get_value_ref(var_name).shape
+        """Number of points of a grid."""
+        if grid_id == _NODES:
+            return (self._anuga.topology.node_count,)
+        elif grid_id == _EDGES:
+            return (self._anuga.topology.edge_count,)
+        return self._anuga.grid_x.shape
 
     def get_grid_spacing(self, grid_id):
         """Spacing of rows and columns of uniform rectilinear grid."""
@@ -459,5 +839,81 @@ class BmiAnuga(Bmi):
         return self._time
 
     def get_time_step(self):
-        """Time step of model."""
+        """Time step of model.
+
+        With coupling_mode: adaptive, this is the recommended interval
+        (see get_recommended_time_step), so update() follows it.
+        """
         return self._anuga.time_step
+
+    def get_active_cells(self):
+        """Cells that are wet, or within active_halo cells of a wet cell.
+
+        Requires active_set: True. Cells outside the set are dry, so
+        couplers that exchange flow variables can restrict their exchanges
+        to these cells (e.g. with get_value_at_indices and
+        create_index_plan).
+
+        Returns
+        -------
+        ndarray
+            Sorted indices of the active cells.
+        """
+        return self._anuga.active_cells
+
+    def get_recommended_time_step(self):
+        """Coupling interval recommended from the last update.
+
+        The interval is chosen from the internal solver timesteps and the
+        change of the number of wet cells in the last update, within
+        coupling_min_timestep and coupling_max_timestep.
+
+        Returns
+        -------
+        float
+            Recommended interval until the next exchange.
+        """
+        return self._anuga.recommended_time_step
+
+    def get_stepping_statistics(self):
+        """Timestepping counters of the model updates.
+
+        Returns
+        -------
+        dict
+            Number of updates, yields and internal solver steps, the range
+            of internal timesteps and the wall time, both in total and for
+            the last update, the number of wet cells (counted with
+            coupling_mode: adaptive only, None otherwise) and the
+            recommended coupling interval.
+        """
+        return self._anuga.stepping_statistics
+
+    def set_progress_reporting(self, level, interval=None, callback=None):
+        """Configure progress reporting.
+
+        Parameters
+        ----------
+        level : str
+            'off', 'summary' (one line per update) or 'verbose' (ANUGA's
+            timestepping statistics at every yield).
+        interval : float, optional
+            Minimum wall time in seconds between two messages.
+        callback : callable, optional
+            Called as callback(message, statistics) instead of logging
+            the message to the 'anuga_bmi' logger. Unchanged if not given.
+        """
+        reporter = self._anuga.reporter
+        reporter.set_level(level)
+        if interval is not None:
+            reporter.interval = float(interval)
+        if callback is not None:
+            reporter.callback = callback
+
+
+def _fill(values, out):
+    """Copy values into out if given; otherwise return values as is."""
+    if out is None:
+        return values
+    out[...] = values.reshape(out.shape)
+    return out
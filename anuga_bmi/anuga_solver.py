@@ -1,25 +1,74 @@
 #! /usr/bin/env python
+import os
+import time
 import warnings
 
 import numpy as np
 
 import anuga
 
+from anuga_bmi.active import ActiveSet, ActiveSetOperator, restrict_to_active_set
+from anuga_bmi.boundaries import TimeSeriesBoundary
+from anuga_bmi.checkpoint import save_state
+from anuga_bmi.coupling import CouplingController
+from anuga_bmi.fields import (LAND_COVER_COLUMNS, LandCover, ResamplerCache,
+                              read_land_cover_table, read_raster)
+from anuga_bmi.forcing import InfiltrationOperator, RainfallOperator, rate_field
+from anuga_bmi.mesh_cache import MeshCache, mesh_key
+from anuga_bmi.monitors import Monitors
+from anuga_bmi.output import BackgroundWriter, DirectWriter, NetCDF4Sink, SWWSink
+from anuga_bmi.parallel import DomainDecomposition, ParallelQuantityViews
+from anuga_bmi.profiles import get_profile
+from anuga_bmi.quantities import QUANTITY_NAMES, QuantityViews
+from anuga_bmi.raster import TriangleField
+from anuga_bmi.reporting import ProgressReporter
+from anuga_bmi.spatial import SpatialIndex
+from anuga_bmi.topology import MeshTopology
+
+
+# relative tolerance used when comparing model times
+_TIME_EPSILON = 1.0e-10
+
 
 class AnugaSolver(object):
 
-    def __init__(self, params):
-                
+    def __init__(self, params, snapshot=None):
+        
+        self._params = params
+        self._snapshot = snapshot
+        
         self._domain_type = str(params['domain_type'])
         self._shape = tuple(params['shape'])
         self._size = tuple(params['size'])
         self._boundary_filename = str(params['boundary_filename'])
         self._elevation_filename = str(params['elevation_filename'])
         self._output_filename = str(params['output_filename'])
-        self._time_step = float(params['output_timestep'])
+        self._output_timestep = float(params['output_timestep'])
+        self._time_step = float(params['coupling_timestep'] or
+                                params['output_timestep'])
+        self._coupling_mode = str(params['coupling_mode']).lower()
+        self._controller = CouplingController(self._time_step,
+                min_interval = float(params['coupling_min_timestep'] or
+                                     0.1 * self._time_step),
+                max_interval = float(params['coupling_max_timestep'] or
+                                     10. * self._time_step),
+                target_steps = float(params['coupling_target_steps']),
+                max_wet_change = float(params['coupling_max_wet_change']),
+                growth = float(params['coupling_growth']))
+        self._wet_depth = params['wet_depth']
+        self._use_active_set = bool(params['active_set'])
+        self._active_halo = int(params['active_halo'])
+        self.active_set = None
         self._bdry_tags = dict(params['boundary_tags'])
         self._bdry_conditions = dict(params['boundary_conditions'])
         self._stored_quantities = dict(params['stored_quantities'])
+        self._output_mode = str(params['output_mode']).lower()
+        self._output_buffer_size = int(params['output_buffer_size'])
+        self._output_format = str(params['output_format']).lower()
+        self._output_compression_level = int(params['output_compression_level'])
+        self._output_precision = str(params['output_precision'])
+        self._output_chunks = dict(params['output_chunks'])
+        self._output_least_significant_digit = dict(params['output_least_significant_digit'])
         self._max_triangle_area = float(params['maximum_triangle_area'])
         self._initial_flow_depth = float(params['initial_flow_depth'])
         
@@ -27,27 +76,96 @@ class AnugaSolver(object):
         self._interior_poly_triangle_area = float(params['interior_polygon_triangle_area'])
         self._interior_regions = None
         
+        self._mesh_cache_directory = str(params['mesh_cache_directory'])
+        self._mesh_cache_max_bytes = float(params['mesh_cache_max_bytes'])
+        
         self._use_sed_operator = bool(params['toggle_sediment_transport'])
         self._inflow_concentration = float(params['inflow_sediment_concentration'])
         self._initial_concentration = float(params['initial_sediment_concentration'])
         self._use_veg_operator = bool(params['toggle_vegetation_drag'])
         self._veg_stem_diameter = params['vegetation_stem_diameter']
         self._veg_stem_spacing = params['vegetation_stem_spacing']
-        self._mannings_n = float(params['Mannings_n_parameter'])
+        self._mannings_n = params['Mannings_n_parameter']
+        if not isinstance(self._mannings_n, str):
+            self._mannings_n = float(self._mannings_n)
+        self._land_cover_filename = str(params['land_cover_filename'])
+        self._land_cover_table = params['land_cover_table']
+        self._field_samples_per_edge = int(params['field_samples_per_edge'])
+        self._resamplers = None
+        self._land_covers = {}
+        
+        self._rainfall_rate = params['rainfall_rate']
+        self._rainfall_units = str(params['rainfall_units'])
+        self._rainfall_variable = str(params['rainfall_variable'])
+        self._infiltration_rate = params['infiltration_rate']
+        self._infiltration_units = str(params['infiltration_units'])
+        self._infiltration_variable = str(params['infiltration_variable'])
+        self._forcing_samples_per_edge = int(params['forcing_samples_per_edge'])
+        self.rainfall = None
+        self.infiltration = None
         
         self._elevation_profile = str(params['elevation_profile'])
+        
+        self._gauges = params['gauges']
+        self._gauge_quantities = list(params['gauge_quantities'])
+        self._gauge_interval = float(params['output_timestep']
+                                     if params['gauge_interval'] is None
+                                     else params['gauge_interval'])
+        self._regions_of_interest = dict(params['regions_of_interest'])
+        self._region_quantities = list(params['region_quantities'])
+        self._region_interval = float(params['output_timestep']
+                                      if params['region_interval'] is None
+                                      else params['region_interval'])
+        self._reductions = list(params['reductions'])
+        self._arrival_depth = float(params['arrival_depth'])
+        self.monitors = None
+        
+        self._parallel = bool(params['parallel'])
+        self.decomposition = None
 
         
         self._time = 0
+        self._evolve = None
+        self._evolve_yieldstep = None
+        self._yieldtime_pending = False
+        self._store_output = True
+        self._next_output_time = None
+        self._writer = None
+        
+        self.views = None
+        self._topology = None
+        self._spatial_index = None
+        self._reporter = ProgressReporter(level = params['progress_level'],
+                                          interval = params['progress_interval'])
+        
+        if snapshot is not None:
+            # keep the output of the original run and of every earlier
+            # restart (snapshots keep the original output_filename)
+            self._output_filename += ('_restart_%.3f' % snapshot.time).replace('.', 'p')
         
         self.initialize_domain()
         self.set_boundary_conditions()
         self.set_other_domain_options()
         self.initialize_operators()
         
+        if self._land_cover_filename:
+            self.set_land_cover(self._land_cover_table, self._land_cover_filename)
+        
         
         # store initial elevations for differencing
         self._land_surface__initial_elevation = np.zeros_like(self.land_surface__elevation)
+        self._elev_difference = None
+        
+        # running sum of the changes made with add_elevation_change
+        self._cumulative_elevation_change = np.zeros_like(self.land_surface__elevation)
+        
+        if snapshot is not None:
+            snapshot.restore(self)
+            
+        self.initialize_monitors()
+        
+        if snapshot is not None and self.monitors is not None:
+            snapshot.restore_reductions(self.monitors)
         
         
     def initialize_operators(self):
@@ -57,18 +175,36 @@ class AnugaSolver(object):
         Available operators:
         * Sed transport
         * Vegetation
+        * Rainfall (constant rate or raster, see anuga_bmi.forcing)
+        * Infiltration (constant capacity or raster)
         
-        Operators remaining to implement:
-        * Infiltration
-        * Rainfall
+        With active_set, the wet/dry active set is updated first at every
+        timestep (see anuga_bmi.active), and the sed transport, vegetation
+        and infiltration operators only work on its triangles. The shear
+        stress is set to 0 on the triangles that leave the set.
         
         """
         
+        if self._use_active_set:
+        
+            self.active_set = ActiveSet(self.domain.neighbours,
+                                        self.wet_depth,
+                                        halo = self._active_halo)
+            ActiveSetOperator(self.domain, self.active_set)
+            
+            
+        
         if self._use_veg_operator:
             # better to have veg before sed transport??
             
             from anuga.operators.vegetation_operator import Vegetation_operator
-            veg_op = Vegetation_operator(self.domain)
+            
+            if self.active_set is None:
+                veg_op = Vegetation_operator(self.domain)
+            else:
+                veg_op = restrict_to_active_set(Vegetation_operator,
+                                                'vegetation')(self.domain,
+                                                              self.active_set)
             
             self.land_vegetation__stem_spacing = self._veg_stem_spacing
             self.land_vegetation__stem_diameter = self._veg_stem_diameter
@@ -81,7 +217,14 @@ class AnugaSolver(object):
             self.domain.set_flow_algorithm('DE0')
             
             from anuga.operators.sed_transport_operator import Sed_transport_operator
-            sed_op = Sed_transport_operator(self.domain)
+            
+            if self.active_set is None:
+                sed_op = Sed_transport_operator(self.domain)
+            else:
+                sed_op = restrict_to_active_set(Sed_transport_operator,
+                                                'sediment',
+                                                reset = ['shear_stress'])(self.domain,
+                                                                          self.active_set)
             
             
             assert self._initial_concentration <= 0.3, (
@@ -92,12 +235,90 @@ class AnugaSolver(object):
             
             self.land_surface_water_sediment_suspended__volume_concentration = self._initial_concentration
             sed_op.set_inflow_concentration(self._inflow_concentration)
+            
+            
+        
+        if isinstance(self._rainfall_rate, str) or self._rainfall_rate > 0:
+        
+            rate = rate_field(self.domain, self._rainfall_rate,
+                              units = self._rainfall_units,
+                              variable = self._rainfall_variable,
+                              samples_per_edge = self._forcing_samples_per_edge)
+            self.rainfall = RainfallOperator(self.domain, rate)
+            
+            
+            
+        if isinstance(self._infiltration_rate, str) or self._infiltration_rate > 0:
         
+            rate = rate_field(self.domain, self._infiltration_rate,
+                              units = self._infiltration_units,
+                              variable = self._infiltration_variable,
+                              samples_per_edge = self._forcing_samples_per_edge)
+            self.infiltration = InfiltrationOperator(self.domain, rate,
+                                                     active_set = self.active_set)
         
         
         
+        
+    def initialize_monitors(self):
+        """
+        Initialize the gauges, regions of interest and reductions
+        (see anuga_bmi.monitors), if any are requested.
+        """
+        
+        if not (self._gauges or self._regions_of_interest or self._reductions):
+            return
+            
+        assert self.decomposition is None, (
+            "Monitors of parallel domains are not supported.")
+            
+        self.monitors = Monitors(self.domain,
+                                 spatial_index = self.spatial_index,
+                                 gauges = self._gauges,
+                                 gauge_quantities = self._gauge_quantities,
+                                 gauge_interval = self._gauge_interval,
+                                 regions = self._regions_of_interest,
+                                 region_quantities = self._region_quantities,
+                                 region_interval = self._region_interval,
+                                 reductions = self._reductions,
+                                 arrival_depth = self._arrival_depth,
+                                 active_set = self.active_set)
+        
+        
     def initialize_domain(self):
-        """Initialize anuga domain"""
+        """
+        Initialize anuga domain
+        
+        In parallel mode the full domain is only built on the first
+        process and is then partitioned across all processes.
+        """
+        
+        self.views = QuantityViews(self)
+        
+        if self._parallel and anuga.numprocs > 1:
+        
+            if anuga.myid == 0:
+                self.create_domain()
+            else:
+                self.domain = None
+                
+            self.domain = anuga.distribute(self.domain)
+            
+            self.decomposition = DomainDecomposition(self.domain)
+            self.views = ParallelQuantityViews(self, self.decomposition)
+            
+        else:
+        
+            self.create_domain()
+                                 
+        anuga.Quantity(self.domain, name='veg_diameter', register=True)
+        anuga.Quantity(self.domain, name='veg_spacing', register=True)
+        anuga.Quantity(self.domain, name='shear_stress', register=True)
+        anuga.Quantity(self.domain, name='concentration', register=True)
+        
+        
+    def create_domain(self):
+        """Create the full anuga domain and set its initial conditions"""
 
 
         assert self._domain_type[:5] in ['squar', 'recta', 'outli', 'irreg', 'bound'], (
@@ -107,7 +328,21 @@ class AnugaSolver(object):
 
 
 
-        if self._domain_type[:5] in ['squar', 'recta']:
+        if self._snapshot is not None:
+        
+            # restart: the mesh and all quantities come from the snapshot
+            if self._domain_type[:5] in ['squar', 'recta']:
+                evolved_quantities = None
+            else:
+                evolved_quantities = ['stage', 'xmomentum', 'ymomentum', 'concentration']
+                
+            self.domain = self.domain_from_mesh(self._snapshot.nodes,
+                                                self._snapshot.triangles,
+                                                self._snapshot.boundary,
+                                                self._snapshot.geo_reference,
+                                                evolved_quantities)
+                                                
+        elif self._domain_type[:5] in ['squar', 'recta']:
         
             self.domain = anuga.rectangular_cross_domain(
                                 self._shape[0],
@@ -131,11 +366,6 @@ class AnugaSolver(object):
                 "Cannot recognize type of elevation file '%s'. "
                 "Please use an .asc or .pts file." % self._elevation_filename)
             
-            if self._elevation_filename[-4:] == '.asc':
-                anuga.asc2dem(filename_root + '.asc')
-                anuga.dem2pts(filename_root + '.dem')
-            
-            
             if ((self._interior_regions is None) and
                 (self._interior_poly_triangle_area > 0.0) and
                 (self._interior_poly_filename is not None)):
@@ -152,202 +382,114 @@ class AnugaSolver(object):
             # generalize the mesh creation to be able to use the sed transport operator
             evolved_quantities =  ['stage', 'xmomentum', 'ymomentum', 'concentration']
             
-            anuga.pmesh.mesh_interface.create_mesh_from_regions(
-                                bounding_polygon = bounding_polygon,
-                                boundary_tags = self._bdry_tags,
-                                interior_regions = self._interior_regions,
-                                maximum_triangle_area = self._max_triangle_area,
-                                filename = filename_root + '.msh')
-                                
-            self.domain = anuga.Domain(filename_root + '.msh',
-                                       evolved_quantities = evolved_quantities)
+            cache = None
+            cached = None
             
+            if self._mesh_cache_directory:
+                cache = MeshCache(self._mesh_cache_directory,
+                                  self._mesh_cache_max_bytes)
+                key = mesh_key(bounding_polygon,
+                               self._interior_regions,
+                               self._elevation_filename,
+                               self._bdry_tags,
+                               self._max_triangle_area)
+                cached = cache.load(key)
             
-            self.domain.set_quantity('elevation',
-                                     filename = filename_root + '.pts')
             
-        
-        self.land_surface_water__depth = self._initial_flow_depth
-        self.land_surface_water_surface__elevation += self._initial_flow_depth
-        self.manning_n_parameter = self._mannings_n
-                                 
-        anuga.Quantity(self.domain, name='veg_diameter', register=True)
-        anuga.Quantity(self.domain, name='veg_spacing', register=True)
-        anuga.Quantity(self.domain, name='shear_stress', register=True)
-        anuga.Quantity(self.domain, name='concentration', register=True)
-        
-
-
-    def set_elevation_rectangular(self):
-    
-            if self._elevation_profile == 'shallow linear ramp':
-            
-                self.domain.set_quantity('elevation', lambda x,y: -x/5.)
+            if cached is not None:
             
-            if self._elevation_profile == 'steep linear ramp':
-            
-                self.domain.set_quantity('elevation', lambda x,y: -x/10.)
-
-            if self._elevation_profile == 'tall step down':
-            
-                z = -x/10
-                N = len(x)
-                minx = np.floor(np.max(x)/2)
-                maxx = np.ceil(np.max(x)/2 + 1)
-                stepx = np.min(x[(x >= minx) & (x <= maxx)])
-                stepz = 0.6 * (np.max(z) - np.min(z))
-
-                for i in range(N):
-                    if x[i] > stepx:
-                        z[i] -= stepz
-                        
-                self.domain.set_quantity('elevation', z)            
-            
-            if self._elevation_profile == 'short step down':
-            
-                z = -x/10
-                N = len(x)
-                minx = np.floor(np.max(x)/2)
-                maxx = np.ceil(np.max(x)/2 + 1)
-                stepx = np.min(x[(x >= minx) & (x <= maxx)])
-                stepz = 0.2 * (np.max(z) - np.min(z))
-
-                for i in range(N):
-                    if x[i] > stepx:
-                        z[i] -= stepz
-                        
-                self.domain.set_quantity('elevation', z)
-            
-            
-            if self._elevation_profile == 'step up':
-            
-                z = -x/10
-                N = len(x)
-                minx = np.floor(np.max(x)/2)
-                maxx = np.ceil(np.max(x)/2 + 1)
-                stepx = np.min(x[(x >= minx) & (x <= maxx)])
-                stepz = 0.3 * (np.max(z) - np.min(z))
-
-                for i in range(N):
-                    if x[i] > stepx:
-                        z[i] += stepz
-                        
-                self.domain.set_quantity('elevation', z)
-            
-            
-            if self._elevation_profile == 'dam':
+                # warm start: skip triangulation and interpolation
+                self.domain = self.domain_from_mesh(cached['nodes'],
+                                                    cached['triangles'],
+                                                    cached['boundary'],
+                                                    cached['geo_reference'],
+                                                    evolved_quantities)
+                                                    
+                self.domain.set_quantity('elevation', cached['elevation'],
+                                         location = 'vertices')
+                                         
+            else:
             
-                z = -x/10.
-                N = len(x)
-                minx = np.floor(np.max(x)/2)
-                maxx = np.ceil(np.max(x)/2)
-                maxz = 0.9 * np.max(z)
-    
-                if len(x[(x >= minx) & (x <= maxx)]) < 5:
-                    maxx = np.ceil(np.max(x)/2 + 1)
-    
-                for i in range(N):
-                    if minx <= x[i] <= maxx:
-                        z[i] = maxz
-                        
-                self.domain.set_quantity('elevation', z)
-                       
-                       
-            if self._elevation_profile == 'thin cylinder':
-                                              
-                z = -x/10
-                N = len(x)
-
-                minx = np.floor(np.max(x)/2)
-                maxx = np.ceil(np.max(x)/2 + 1)
-                stepx = np.min(x[(x >= minx) & (x <= maxx)])
-
-                miny = np.floor(np.max(y)/2)
-                maxy = np.ceil(np.max(y)/2 + 1)
-                stepy = np.min(y[(y >= miny) & (y <= maxy)])
-
-                radius = 0.1 * (np.max(y) - np.min(y))
-
-                for i in range(N):
-                    if (x[i]-stepx)**2 + (y[i]-stepy)**2 < radius**2:
-                        z[i] = np.max(z)
-                        
-                self.domain.set_quantity('elevation', z)
-            
-            
-            if self._elevation_profile == 'thick cylinder':
-                                              
-                z = -x/10
-                N = len(x)
-
-                minx = np.floor(np.max(x)/2)
-                maxx = np.ceil(np.max(x)/2 + 1)
-                stepx = np.min(x[(x >= minx) & (x <= maxx)])
-
-                miny = np.floor(np.max(y)/2)
-                maxy = np.ceil(np.max(y)/2 + 1)
-                stepy = np.min(y[(y >= miny) & (y <= maxy)])
-
-                radius = 0.4 * (np.max(y) - np.min(y))
-
-                for i in range(N):
-                    if (x[i]-stepx)**2 + (y[i]-stepy)**2 < radius**2:
-                        z[i] = np.max(z)
-                        
-                self.domain.set_quantity('elevation', z)
+                if self._elevation_filename[-4:] == '.asc':
+                    anuga.asc2dem(filename_root + '.asc')
+                    anuga.dem2pts(filename_root + '.dem')
                 
+                anuga.pmesh.mesh_interface.create_mesh_from_regions(
+                                    bounding_polygon = bounding_polygon,
+                                    boundary_tags = self._bdry_tags,
+                                    interior_regions = self._interior_regions,
+                                    maximum_triangle_area = self._max_triangle_area,
+                                    filename = filename_root + '.msh')
+                                    
+                self.domain = anuga.Domain(filename_root + '.msh',
+                                           evolved_quantities = evolved_quantities)
                 
                 
-            if self._elevation_profile == 'wing dams':
-            
-                z = -x/10
-                N = len(x)
-                minx = np.floor(np.max(x)/2)
-                stepx1 = np.min(x[(x >= minx)])
-                stepx2 = np.min(x[(x > stepx1)])
-                dist = 0.2 * (np.max(y) - np.min(y))
-    
-                for i in range(N):
-                    if stepx1 <= x[i] <= stepx2:
-                        if (y[i] < dist) or (y[i] > np.max(y) - dist):
-                            z[i] += 1
-                            
-                self.domain.set_quantity('elevation', z)
-                
-                
-            if self._elevation_profile == 'alternating dykes':
+                self.domain.set_quantity('elevation',
+                                         filename = filename_root + '.pts')
+                                         
+                if cache is not None:
+                    geo_reference = self.domain.geo_reference
+                    cache.store(key,
+                                nodes = self.domain.get_nodes(),
+                                triangles = self.domain.get_triangles(),
+                                boundary = self.domain.boundary,
+                                geo_reference = (geo_reference.get_zone(),
+                                                 geo_reference.get_xllcorner(),
+                                                 geo_reference.get_yllcorner()),
+                                elevation = self.domain.quantities['elevation'].vertex_values)
             
-                z = -x/10
-                N = len(x)
-
-                minx = np.floor(np.max(x)/4)
-                stepx1 = np.min(x[(x >= minx)])
-                stepx2 = np.min(x[(x > stepx1)])
+        
+        self.land_surface_water__depth = self._initial_flow_depth
+        self.land_surface_water_surface__elevation += self._initial_flow_depth
+        self.manning_n_parameter = self._mannings_n
+        
 
-                minx = np.floor(np.max(x)/2)
-                stepx3 = np.min(x[(x >= minx)])
-                stepx4 = np.min(x[(x > stepx3)])
 
-                minx = np.floor(3*np.max(x)/4)
-                stepx5 = np.min(x[(x >= minx)])
-                stepx6 = np.min(x[(x > stepx5)])
+    def domain_from_mesh(self, nodes, triangles, boundary, geo_reference,
+                         evolved_quantities):
+        """
+        Create an anuga domain from mesh arrays.
+        
+        Parameters
+        ----------
+        nodes : ndarray
+            (N, 2) node coordinates relative to the geo-reference.
+        triangles : ndarray
+            (M, 3) node indices of the triangles.
+        boundary : dict
+            Tag of each boundary edge, keyed on (triangle, edge).
+        geo_reference : sequence
+            (zone, xllcorner, yllcorner).
+        evolved_quantities : list or None
+            Names of the evolved quantities. None for anuga's defaults.
+        """
+        
+        from anuga.coordinate_transforms.geo_reference import Geo_reference
+        
+        zone, xllcorner, yllcorner = geo_reference
+        
+        kwargs = {}
+        if evolved_quantities is not None:
+            kwargs['evolved_quantities'] = evolved_quantities
+        
+        return anuga.Domain(np.asarray(nodes, dtype=float),
+                            np.asarray(triangles, dtype=int),
+                            boundary = boundary,
+                            geo_reference = Geo_reference(int(zone),
+                                                          float(xllcorner),
+                                                          float(yllcorner)),
+                            **kwargs)
 
-                dist = 0.3 * (np.max(y) - np.min(y))
 
-                for i in range(N):
-                    if stepx1 <= x[i] <= stepx2:
-                        if (y[i] < dist):
-                            z[i] += 1
-            
-                    if stepx3 <= x[i] <= stepx4:
-                        if (y[i] > np.max(y) - dist):
-                            z[i] += 1
-            
-                    if stepx5 <= x[i] <= stepx6:
-                        if (y[i] < dist):
-                            z[i] += 1
-                            
-                self.domain.set_quantity('elevation', z)
+    def set_elevation_rectangular(self):
+        """
+        Set the elevation of a rectangular domain from the analytic profile
+        named by elevation_profile (see anuga_bmi.profiles).
+        """
+    
+        self.domain.set_quantity('elevation',
+                                 get_profile(self._elevation_profile))
         
         
         
@@ -360,13 +502,15 @@ class AnugaSolver(object):
         - transmissive
         - dirichlet / fixed (must specify stage at this boundary)
         - time (need to specify a lambda function)
+        - time_series / hydrograph (need to specify a CSV or NetCDF file
+          with time, stage and optionally discharge or x/y momentum and
+          concentration; see anuga_bmi.boundaries)
         
         TODO:
         - check possible failure modes (how would anuga normally fail if the boundaries
             are not specified correctly?)
         - add defaults if not enough boundaries are specified
         - fail if receives an unknown boundary type
-        - accept other inputs for time boundary (file?)
         """
         
         _bdry_conditions = {}
@@ -406,8 +550,17 @@ class AnugaSolver(object):
                 assert len(value) > 1, ("Need to specify lambda function for "
                                         "Time boundary '%s'" % key)
                 
-                _bdry_conditions[key] = anuga.Time_boundary(domain = domain,
-                                                                 function = value[1])
+                _bdry_conditions[key] = anuga.Time_boundary(domain = self.domain,
+                                                            function = value[1])
+                
+            elif bdry_type.lower() in ['time_series', 'timeseries', 'hydrograph']:
+            
+                assert len(value) > 1, ("Need to specify the time series file "
+                                        "of boundary '%s'" % key)
+                                        
+                _bdry_conditions[key] = TimeSeriesBoundary(self.domain,
+                                                           str(value[1]),
+                                                           tag = key)
                 
             else:
             
@@ -422,6 +575,16 @@ class AnugaSolver(object):
 
     def set_other_domain_options(self):
     
+        assert self._coupling_mode in ['fixed', 'adaptive'], (
+            "Coupling mode must be 'fixed' or 'adaptive'. Mode '%s' is not "
+            "recognized." % self._coupling_mode)
+        assert self._output_mode in ['sync', 'async'], (
+            "Output mode must be 'sync' or 'async'. Mode '%s' is not "
+            "recognized." % self._output_mode)
+        assert self._output_format in ['sww', 'netcdf4', 'none'], (
+            "Output format must be 'sww', 'netcdf4' or 'none'. Format '%s' "
+            "is not recognized." % self._output_format)
+    
         self.domain.set_name(self._output_filename)
         self.domain.set_quantities_to_be_stored(self._stored_quantities)                
         
@@ -430,27 +593,99 @@ class AnugaSolver(object):
     def grid_x(self):
         """x position of centroids"""
         var_values = self.domain.quantities['x'].centroid_values
+        if self.decomposition is not None:
+            var_values = self.decomposition.gather(var_values)
         return var_values
         
     @property
     def grid_y(self):
         """y position of centroids"""
         var_values = self.domain.quantities['y'].centroid_values
+        if self.decomposition is not None:
+            var_values = self.decomposition.gather(var_values)
         return var_values
         
+    @property
+    def topology(self):
+        """Connectivity of the mesh, built on first use"""
+        
+        assert self.decomposition is None, (
+            "The mesh topology is not available for parallel domains.")
+            
+        if self._topology is None:
+            self._topology = MeshTopology(self.domain.get_nodes(),
+                                          self.domain.get_triangles())
+        return self._topology
+        
+    @property
+    def spatial_index(self):
+        """Point and polygon lookups on the mesh, built on first use"""
+        
+        assert self.decomposition is None, (
+            "The spatial index is not available for parallel domains.")
+            
+        if self._spatial_index is None:
+            self._spatial_index = SpatialIndex(self.domain.get_nodes(),
+                                               self.domain.get_triangles())
+        return self._spatial_index
+        
     @property
     def grid_z(self):
         """z position of centroids"""
-        return self.land_surface__elevation()
+        return self.land_surface__elevation
+        
+    @property
+    def node_z(self):
+        """Elevation of the mesh nodes, the mean of the vertex values of the
+        triangles that share each node"""
+        
+        triangles = self.domain.get_triangles().ravel()
+        vertex_values = self.domain.quantities['elevation'].vertex_values.ravel()
+        n_nodes = self.topology.node_count
+        
+        return (np.bincount(triangles, vertex_values, n_nodes) /
+                np.maximum(np.bincount(triangles, minlength = n_nodes), 1))
 
     @property
     def time_step(self):
-        """The time step."""
+        """The time step (the recommended interval in adaptive mode)."""
+        if self._coupling_mode == 'adaptive':
+            return self._controller.interval
         return self._time_step
 
     @time_step.setter
     def time_step(self, new_dt):
         self._time_step = new_dt
+        
+    @property
+    def recommended_time_step(self):
+        """Coupling interval recommended from the last update."""
+        return self._controller.interval
+
+    @property
+    def params(self):
+        """Input parameters of the solver."""
+        return self._params
+
+    @property
+    def output_timestep(self):
+        """Interval between outputs to the SWW file."""
+        return self._output_timestep
+
+    @property
+    def stepping_statistics(self):
+        """Wall time, internal step counts and timestep range of the solver,
+        and the recommended coupling interval."""
+        statistics = self._reporter.statistics
+        statistics.update(self._controller.statistics)
+        if self.active_set is not None:
+            statistics.update(self.active_set.statistics)
+        return statistics
+
+    @property
+    def reporter(self):
+        """Progress reporter of the solver."""
+        return self._reporter
 
     @property
     def shape(self):
@@ -472,7 +707,11 @@ class AnugaSolver(object):
         
     @manning_n_parameter.setter
     def manning_n_parameter(self, new_friction):
-        self.domain.set_quantity('friction', new_friction, location='centroids')
+    
+        if (type(new_friction) == str):
+            self.set_field('manning_n_parameter', new_friction)
+        else:
+            self.views.write('manning_n_parameter', new_friction)
 
     @property
     def land_surface__elevation(self):
@@ -480,7 +719,7 @@ class AnugaSolver(object):
         
     @land_surface__elevation.setter
     def land_surface__elevation(self, new_elev):
-        self.domain.set_quantity('elevation', new_elev, location='centroids')
+        self.views.write('land_surface__elevation', new_elev)
 
     @property
     def land_surface_water_surface__elevation(self):
@@ -489,11 +728,7 @@ class AnugaSolver(object):
 
     @land_surface_water_surface__elevation.setter
     def land_surface_water_surface__elevation(self, new_stage):
-    
-        self.domain.set_quantity('stage', new_stage, location='centroids')
-        
-        new_depth = new_stage - self.land_surface__elevation
-        self.domain.set_quantity('height', new_depth, location='centroids')
+        self.views.write('land_surface_water_surface__elevation', new_stage)
         
         
     @property
@@ -502,11 +737,7 @@ class AnugaSolver(object):
         
     @land_surface_water__depth.setter
     def land_surface_water__depth(self, new_depth):
-    
-        self.domain.set_quantity('height', new_depth, location='centroids')
-        
-        new_stage = self.land_surface__elevation + new_depth
-        self.domain.set_quantity('stage', new_stage, location='centroids')
+        self.views.write('land_surface_water__depth', new_depth)
         
         
     @property
@@ -515,7 +746,7 @@ class AnugaSolver(object):
         
     @land_surface_water_flow__x_component_of_momentum.setter
     def land_surface_water_flow__x_component_of_momentum(self, new_mom):
-        self.domain.set_quantity('xmomentum', new_mom, location='centroids')
+        self.views.write('land_surface_water_flow__x_component_of_momentum', new_mom)
         
     @property
     def land_surface_water_flow__y_component_of_momentum(self):
@@ -523,7 +754,7 @@ class AnugaSolver(object):
         
     @land_surface_water_flow__y_component_of_momentum.setter
     def land_surface_water_flow__y_component_of_momentum(self, new_mom):
-        self.domain.set_quantity('ymomentum', new_mom, location='centroids')
+        self.views.write('land_surface_water_flow__y_component_of_momentum', new_mom)
         
     @property
     def land_surface_water_flow__shear_stress(self):
@@ -531,7 +762,7 @@ class AnugaSolver(object):
         
     @land_surface_water_flow__shear_stress.setter
     def land_surface_water_flow__shear_stress(self, new_ss):
-        self.domain.set_quantity('shear_stress', new_ss, location='centroids')
+        self.views.write('land_surface_water_flow__shear_stress', new_ss)
     
     @property
     def land_surface_water_sediment_suspended__volume_concentration(self):
@@ -539,7 +770,7 @@ class AnugaSolver(object):
         
     @land_surface_water_sediment_suspended__volume_concentration.setter
     def land_surface_water_sediment_suspended__volume_concentration(self, new_c):
-        self.domain.set_quantity('concentration', new_c, location='centroids')
+        self.views.write('land_surface_water_sediment_suspended__volume_concentration', new_c)
         
     @property
     def land_vegetation__stem_spacing(self):
@@ -549,9 +780,9 @@ class AnugaSolver(object):
     def land_vegetation__stem_spacing(self, new_vs):
     
         if (type(new_vs) == str):
-            self.domain.set_quantity('veg_spacing', filename = new_vs)
+            self.set_field('land_vegetation__stem_spacing', new_vs)
         else:
-            self.domain.set_quantity('veg_spacing', new_vs, location='centroids')
+            self.views.write('land_vegetation__stem_spacing', new_vs)
         
     @property
     def land_vegetation__stem_diameter(self):
@@ -561,12 +792,100 @@ class AnugaSolver(object):
     def land_vegetation__stem_diameter(self, new_vd):
     
         if (type(new_vd) == str):
-            self.domain.set_quantity('veg_diameter', filename = new_vd)
+            self.set_field('land_vegetation__stem_diameter', new_vd)
         else:
-            self.domain.set_quantity('veg_diameter', new_vd, location='centroids')
+            self.views.write('land_vegetation__stem_diameter', new_vd)
 
     #########
     
+    @property
+    def resamplers(self):
+        """Raster resamplers of the mesh, one per raster geometry"""
+        
+        # the domain is replaced when it is distributed
+        if self._resamplers is None or self._resamplers[0] is not self.domain:
+            geo_reference = self.domain.geo_reference
+            nodes = self.domain.get_nodes() + [geo_reference.get_xllcorner(),
+                                               geo_reference.get_yllcorner()]
+            self._resamplers = (self.domain,
+                                ResamplerCache(nodes, self.domain.get_triangles(),
+                                               self._field_samples_per_edge))
+        return self._resamplers[1]
+        
+        
+    def set_field(self, var_name, filename, variable=None):
+        """
+        Set a variable from a raster (.asc or .nc) averaged over each
+        triangle, or from any other file anuga can read.
+        
+        The resampling operator is kept per raster geometry, so other
+        rasters on the same cells only cost a matrix-vector product.
+        Triangles with no raster data keep their values.
+        
+        Parameters
+        ----------
+        var_name : str
+            Name of variable as CSDMS Standard Name.
+        filename : str
+            Raster file, in absolute coordinates.
+        variable : str, optional
+            Data variable of a NetCDF raster.
+        """
+        
+        if not filename.endswith(('.asc', '.nc')):
+            self.domain.set_quantity(QUANTITY_NAMES[var_name],
+                                     filename = filename)
+            return
+        
+        grid, values = read_raster(filename, variable)
+        
+        dst = self.views.local_ref(var_name)
+        dst[:] = self.resamplers.get(grid).area_mean(values, fill = dst)
+        self.views.sync([var_name])
+        
+        
+    def set_land_cover(self, table, filename=None):
+        """
+        Set friction and vegetation from the land-cover class of each
+        triangle.
+        
+        The classes of a land-cover raster are sampled once, so switching
+        between tables (scenarios) is a gather per column. Triangles with
+        no class, or whose class is not in the table, keep their values.
+        
+        Parameters
+        ----------
+        table : dict or str
+            {code: {column: value}} or a CSV file, with columns manning_n,
+            stem_diameter and/or stem_spacing.
+        filename : str, optional
+            Land-cover raster (.asc or .nc). The last one by default.
+        """
+        
+        filename = filename or self._land_cover_filename
+        
+        assert filename, "No land-cover raster was given."
+        
+        if filename not in self._land_covers:
+            grid, values = read_raster(filename)
+            self._land_covers[filename] = LandCover.from_raster(
+                    self.resamplers.get(grid), values)
+            
+        self._land_cover_filename = filename
+        land_cover = self._land_covers[filename]
+        
+        codes, columns = read_land_cover_table(table)
+        
+        var_names = []
+        for column, values in columns.items():
+            var_name = LAND_COVER_COLUMNS[column]
+            dst = self.views.local_ref(var_name)
+            dst[:] = land_cover.lookup(codes, values, fill = dst)
+            var_names.append(var_name)
+            
+        self.views.sync(var_names)
+        
+        
     @property
     def land_surface__initial_elevation(self):
         """Initial surface elevation, for differencing"""
@@ -583,14 +902,286 @@ class AnugaSolver(object):
         
         
     def update_elev_difference(self):
-        return self.land_surface__elevation - self._land_surface__initial_elevation
+        """Elevation minus initial elevation, in an array reused between calls"""
+        
+        if self._elev_difference is None:
+            self._elev_difference = np.empty_like(self._land_surface__initial_elevation)
+            
+        return np.subtract(self.land_surface__elevation,
+                           self._land_surface__initial_elevation,
+                           out = self._elev_difference)
+        
+        
+    def add_elevation_change(self, delta, indices=None):
+        """
+        Raise or lower the bed, conserving the water depth.
+        
+        Only the changed triangles are updated: their elevation and stage
+        (centroid, vertex and edge values) are shifted by delta, and delta
+        is added to the cumulative elevation change.
+        
+        Parameters
+        ----------
+        delta : array_like or float
+            Elevation change of each indexed triangle, or of all of them.
+        indices : array_like or IndexPlan, optional
+            Triangles to change. Repeated triangles get the sum of their
+            changes (k * delta for a scalar delta and a triangle listed k
+            times). All triangles by default.
+        """
+        
+        self.views.add_elevation(delta, indices,
+                                 change = self._cumulative_elevation_change)
+        
+    @property
+    def cumulative_elevation_change(self):
+        """Sum of the changes made with add_elevation_change"""
+        
+        change = self._cumulative_elevation_change
+        if self.decomposition is not None:
+            change = self.decomposition.gather(change)
+        return change
 
 
     #########    
 
+    def start_evolve(self):
+        """
+        Create the long-lived evolve generator.
+        
+        The generator is created once, with a final time that is never
+        reached, and is then steered to each requested time by moving the
+        domain's next yield time. This avoids paying the evolve setup
+        (boundary evaluation, storage initialization, timestep checks) on
+        every update.
+        """
+        
+        self._store_output = (self.domain.store and
+                              self._output_format != 'none')
+        
+        if self._output_format != 'sww':
+            # anuga only writes SWW files; the output writer does the rest
+            self.domain.store = False
+        
+        if (self._store_output and self._output_format == 'sww' and
+                self.domain.get_relative_time() > 0.):
+            # evolve only creates the output file when starting from time
+            # zero (e.g. not after a restart)
+            self.domain.initialise_storage()
+        
+        self._evolve_yieldstep = self._output_timestep
+        self._evolve = self.domain.evolve(yieldstep = self._evolve_yieldstep,
+                                          finaltime = np.finfo('d').max)
+        
+        # consume the initial yield (stores the initial conditions)
+        next(self._evolve)
+        
+        # the initial yield is made before the stepping loop, so resuming
+        # the generator does not increment yieldtime yet
+        self._yieldtime_pending = False
+        self._next_output_time = self.domain.get_time() + self._output_timestep
+        
+        if self._store_output:
+            self._writer = self.create_writer()
+            
+        if self._store_output and self._output_format != 'sww':
+            # the initial conditions
+            self._writer.store_timestep(self.domain)
+        
+        
+    def create_writer(self):
+        """
+        Output writer for the output format and mode, or None when anuga
+        writes the output itself (sync SWW output without an active set).
+        """
+        
+        if self._output_format == 'netcdf4':
+            filename = os.path.join(self.domain.get_datadir(),
+                                    self.domain.get_name() + '.nc')
+            sink = NetCDF4Sink(filename, self.domain, self._stored_quantities,
+                    complevel = self._output_compression_level,
+                    precision = self._output_precision,
+                    chunks = self._output_chunks,
+                    least_significant_digit = self._output_least_significant_digit)
+        elif self._output_mode == 'async' or self.active_set is not None:
+            # with an active set, sync SWW output also goes through the
+            # sink, which only recomputes the active triangles
+            sink = SWWSink(self.domain, active_set = self.active_set)
+        else:
+            return None
+            
+        if self._output_mode == 'async':
+            return BackgroundWriter(sink, self._output_buffer_size)
+            
+        return DirectWriter(sink)
+        
+        
+    def advance_to(self, target):
+        """
+        Advance the domain to time target with the persistent generator.
+        
+        The generator only stops at target and at the output times in
+        between, so output is written every output_timestep no matter how
+        the interval is split into coupling steps.
+        
+        Parameters
+        ----------
+        target : float
+            Model time to stop at.
+        """
+        
+        if self._evolve is None:
+            self.start_evolve()
+            
+        tolerance = _TIME_EPSILON * max(1., abs(target))
+        wall_start = time.time()
+        time_start = self.domain.get_time()
+        n_steps = 0
+        
+        while self.domain.get_time() < target - tolerance:
+        
+            if self._next_output_time <= target + tolerance:
+                stop = self._next_output_time
+                is_output = self._store_output
+                self._next_output_time += self._output_timestep
+            else:
+                stop = target
+                is_output = False
+                
+            # anuga writes the output itself unless an output writer is set
+            self.domain.store = is_output and self._writer is None
+                
+            self._yield_at(stop)
+            n_steps += self.domain.number_of_steps
+            self._reporter.record_yield(self.domain)
+            
+            if is_output and self._writer is not None:
+                self._writer.store_timestep(self.domain)
+            
+        self.domain.store = self._store_output and self._writer is None
+        
+        elapsed = self.domain.get_time() - time_start
+        
+        self._reporter.record_advance(n_steps,
+                                      time.time() - wall_start,
+                                      self.domain.get_time(),
+                                      elapsed)
+        
+        # the wet cells only steer the adaptive interval: counting them is
+        # a pass over all triangles (and a reduction in parallel)
+        wet_cells = None
+        if self._coupling_mode == 'adaptive':
+            wet_cells = self.wet_cell_count()
+        
+        self._controller.record(elapsed, n_steps, wet_cells)
+        
+        
+    @property
+    def wet_depth(self):
+        """Depth above which a triangle is wet."""
+        if self._wet_depth is None:
+            return self.domain.minimum_allowed_height
+        return float(self._wet_depth)
+        
+        
+    def wet_cell_count(self):
+        """Number of triangles deeper than wet_depth (over all processes)."""
+        
+        if self.active_set is not None:
+            wet = self.active_set.wet
+        else:
+            wet = self.domain.quantities['height'].centroid_values > self.wet_depth
+        
+        if self.decomposition is None:
+            return int(np.count_nonzero(wet))
+            
+        local = np.count_nonzero(wet[self.decomposition.full])
+        return int(self.decomposition.sum(local))
+        
+        
+    @property
+    def active_cells(self):
+        """Indices of the wet triangles and their halo (global in parallel)."""
+        
+        assert self.active_set is not None, (
+            "The active set is off. Set active_set: True to use it.")
+        
+        # the depth may have been set since the last timestep
+        self.active_set.update(self.domain.quantities['height'].centroid_values)
+        self.active_set.record('exports')
+        
+        if self.decomposition is None:
+            return self.active_set.indices
+            
+        mask = self.decomposition.gather(self.active_set.mask.astype(np.int8))
+        return np.flatnonzero(mask)
+        
+        
+    def _yield_at(self, stop):
+        """Run the evolve generator up to its next yield, at time stop."""
+        
+        if self._yieldtime_pending:
+            # after an intermediate yield the generator adds its yieldstep
+            # to yieldtime before taking the next step
+            self.domain.yieldtime = stop - self._evolve_yieldstep
+        else:
+            self.domain.yieldtime = stop
+            
+        if hasattr(self.domain, 'relative_yieldtime'):
+            # newer anuga versions steer by the time relative to starttime
+            self.domain.relative_yieldtime = (self.domain.yieldtime -
+                                              self.domain.get_time() +
+                                              self.domain.get_relative_time())
+            
+        next(self._evolve)
+        self._yieldtime_pending = True
+        
+        
     def update(self):
         """Evolve."""
         
-        for t in self.domain.evolve(yieldstep = self._time_step, finaltime = self._time):
-            print self.domain.timestepping_statistics()
+        self.advance_to(self._time)
+        
+        
+    def save_state(self, path):
+        """
+        Save a snapshot of the solver state (see anuga_bmi.checkpoint).
+        
+        Parameters
+        ----------
+        path : str
+            Snapshot directory.
+        """
+        
+        assert self.decomposition is None, (
+            "Snapshots of parallel domains are not supported.")
+            
+        save_state(self, path)
+        
+        
+    def finalize(self):
+        """
+        Close the evolve generator and the forcing rasters, merge parallel
+        output files and write the monitors.
+        """
+        
+        if self._evolve is not None:
+            self._evolve.close()
+            self._evolve = None
+            
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            
+        for operator in [self.rainfall, self.infiltration]:
+            if operator is not None and isinstance(operator.rate, TriangleField):
+                operator.rate.series.close()
+            
+        if (self.decomposition is not None and self._store_output and
+                self._output_format == 'sww'):
+            self.domain.sww_merge(delete_old = True)
+            
+        if self.monitors is not None:
+            self.monitors.write(os.path.join(self.domain.get_datadir(),
+                                             self.domain.get_name()))
 
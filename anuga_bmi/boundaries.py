@@ -0,0 +1,268 @@
+#! /usr/bin/env python
+"""
+File-driven time-series boundary conditions.
+
+A hydrograph file is read once into arrays. At every timestep the
+boundary interpolates all of its columns at once, starting from the
+interval of the previous lookup (the cursor), and anuga then sets the
+boundary edges from those values with its vectorized Dirichlet code.
+
+Hydrograph files are CSV files with a header row, or NetCDF files with
+one variable per column, with these columns:
+- time (s), required
+- stage (m), required
+- discharge (m3 s-1) across the boundary, or xmomentum and ymomentum
+  (m2 s-1); no flow if neither is given
+- concentration (volumetric), for domains that evolve concentration
+"""
+
+import csv
+
+import numpy as np
+
+import anuga
+
+
+class TimeSeries(object):
+    """
+    Columns of a time series, interpolated linearly in time.
+
+    Times outside the series take the first or last values.
+
+    Parameters
+    ----------
+    times : array_like
+        Increasing times.
+    columns : dict
+        Values of each column at the times.
+    """
+
+    def __init__(self, times, columns):
+
+        self.times = np.asarray(times, dtype=float)
+
+        if len(self.times) == 0:
+            raise ValueError('A time series needs at least one time')
+        if np.any(np.diff(self.times) <= 0.):
+            raise ValueError('The times of a time series must increase')
+
+        self.names = sorted(columns.keys())
+        self.values = np.column_stack([np.asarray(columns[name], dtype=float)
+                                       for name in self.names])
+        self._slopes = (np.diff(self.values, axis=0) /
+                        np.diff(self.times)[:, np.newaxis])
+
+        self._cursor = 0
+
+
+    @classmethod
+    def from_file(cls, filename):
+        """
+        Time series read from a CSV (header row of column names) or a
+        NetCDF file.
+        """
+
+        if filename.endswith('.nc'):
+
+            import netCDF4
+
+            with netCDF4.Dataset(filename, 'r') as dataset:
+                columns = dict((name, np.array(variable[:], dtype=float))
+                               for name, variable in dataset.variables.items()
+                               if variable.ndim == 1)
+        else:
+
+            with open(filename, 'r') as file_obj:
+                reader = csv.reader(file_obj)
+                header = [name.strip().lower() for name in next(reader)]
+                rows = [[float(value) for value in row] for row in reader if row]
+
+            data = np.array(rows, dtype=float).reshape(-1, len(header))
+            columns = dict((name, data[:, i]) for i, name in enumerate(header))
+
+        if 'time' not in columns:
+            raise ValueError("Time series file '%s' has no time column" %
+                             filename)
+
+        times = columns.pop('time')
+
+        return cls(times, columns)
+
+
+    def index(self, name):
+        """Position of a column in the interpolated values."""
+        return self.names.index(name)
+
+
+    def interpolate(self, t, out=None):
+        """
+        Values of every column at time t.
+
+        Parameters
+        ----------
+        t : float
+            Time.
+        out : ndarray, optional
+            Array to fill, ordered as self.names.
+
+        Returns
+        -------
+        ndarray
+            Interpolated values.
+        """
+
+        if out is None:
+            out = np.empty(len(self.names))
+
+        times = self.times
+        n = len(times)
+
+        if n == 1 or t <= times[0]:
+            out[:] = self.values[0]
+            return out
+
+        if t >= times[-1]:
+            out[:] = self.values[-1]
+            return out
+
+        # times usually move forward by less than an interval, so the
+        # cursor only needs to be checked or moved by one
+        i = self._cursor
+        if times[i] <= t < times[i + 1]:
+            pass
+        elif i + 2 < n and times[i + 1] <= t < times[i + 2]:
+            i += 1
+        else:
+            i = int(np.searchsorted(times, t, side='right')) - 1
+        self._cursor = i
+
+        np.multiply(self._slopes[i], t - times[i], out=out)
+        out += self.values[i]
+
+        return out
+
+
+class TimeSeriesBoundary(anuga.Dirichlet_boundary):
+    """
+    Dirichlet boundary whose values follow a time series.
+
+    The values are interpolated once per model time, however many edges
+    the boundary has. A discharge is spread evenly along the boundary
+    segment and directed into the domain.
+
+    Parameters
+    ----------
+    domain : anuga.Domain
+        Domain of the boundary.
+    series : TimeSeries or str
+        Time series, or the name of a hydrograph file.
+    tag : str
+        Boundary tag the boundary is set on.
+    """
+
+    def __init__(self, domain, series, tag):
+
+        if isinstance(series, str):
+            series = TimeSeries.from_file(series)
+
+        if 'stage' not in series.names:
+            raise ValueError("Time series boundary '%s' needs a stage" % tag)
+
+        self.domain = domain
+        self.series = series
+        self.tag = tag
+
+        self._row = np.empty(len(series.names))
+        self._time = None
+
+        self._stage = series.index('stage')
+        self._discharge = None
+        self._momentum = None
+        self._concentration = None
+
+        if 'discharge' in series.names:
+            self._discharge = series.index('discharge')
+            # momentum of a unit discharge, spread along the segment and
+            # directed against the outward normal
+            self._unit_discharge = (-self._segment_normal() /
+                                    self._segment_length())
+        elif 'xmomentum' in series.names or 'ymomentum' in series.names:
+            self._momentum = [series.index(name) if name in series.names else None
+                              for name in ['xmomentum', 'ymomentum']]
+
+        n_values = 3
+        if 'concentration' in series.names:
+            if list(domain.evolved_quantities) != ['stage', 'xmomentum',
+                                                   'ymomentum', 'concentration']:
+                raise ValueError("Time series boundary '%s' has a concentration "
+                                 "but the domain does not evolve one" % tag)
+            self._concentration = series.index('concentration')
+            n_values = 4
+
+        anuga.Dirichlet_boundary.__init__(self, [0.] * n_values)
+        self.update()
+
+
+    def _segment_edges(self):
+        return [(vol_id, edge_id)
+                for (vol_id, edge_id), tag in self.domain.boundary.items()
+                if tag == self.tag]
+
+
+    def _segment_length(self):
+
+        length = sum(self.domain.edgelengths[vol_id, edge_id]
+                     for vol_id, edge_id in self._segment_edges())
+
+        if length <= 0.:
+            raise ValueError("Boundary '%s' has no edges" % self.tag)
+
+        return length
+
+
+    def _segment_normal(self):
+        """Mean outward unit normal of the segment."""
+
+        normal = np.zeros(2)
+        for vol_id, edge_id in self._segment_edges():
+            normal += (self.domain.normals[vol_id, 2 * edge_id:2 * edge_id + 2] *
+                       self.domain.edgelengths[vol_id, edge_id])
+
+        return normal / np.linalg.norm(normal)
+
+
+    def update(self):
+        """Interpolate the boundary values at the current model time."""
+
+        t = self.domain.get_time()
+        if t == self._time:
+            return
+        self._time = t
+
+        row = self.series.interpolate(t, out=self._row)
+        values = self.dirichlet_values
+
+        values[0] = row[self._stage]
+
+        if self._discharge is not None:
+            values[1:3] = row[self._discharge] * self._unit_discharge
+        elif self._momentum is not None:
+            values[1:3] = [row[i] if i is not None else 0.
+                           for i in self._momentum]
+
+        if self._concentration is not None:
+            values[3] = row[self._concentration]
+
+
+    def evaluate(self, vol_id=None, edge_id=None):
+        self.update()
+        return self.dirichlet_values
+
+
+    def evaluate_segment(self, domain, segment_edges):
+        self.update()
+        anuga.Dirichlet_boundary.evaluate_segment(self, domain, segment_edges)
+
+
+    def __repr__(self):
+        return 'Time series boundary (%s)' % ', '.join(self.series.names)
@@ -0,0 +1,168 @@
+#! /usr/bin/env python
+"""
+Snapshots of the full solver state for checkpoint/restart.
+
+A snapshot is a directory with one .npy file per array and a JSON
+manifest:
+- manifest.json: format version, model time, input parameters,
+  geo-reference, boundary tag names and the list of stored quantities
+- mesh arrays: nodes, triangles, boundary_edges, boundary_tag_ids
+- per quantity: <name>.centroid.npy and <name>.vertex.npy
+- initial_elevation.npy and cumulative_elevation_change.npy
+- reduction.<name>.npy for each monitor reduction (max_depth, ...)
+
+The arrays are opened memory-mapped on load, so restoring a large domain
+streams each array once into the new domain instead of parsing a file.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from anuga_bmi.mesh_cache import decode_boundary, encode_boundary
+
+
+_SNAPSHOT_VERSION = 1
+
+
+def save_state(solver, path):
+    """
+    Write a snapshot of an AnugaSolver.
+
+    Parameters
+    ----------
+    solver : AnugaSolver
+        Solver to save.
+    path : str
+        Snapshot directory. Created if needed; existing files are
+        overwritten.
+    """
+
+    domain = solver.domain
+
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    def save(name, array):
+        np.save(os.path.join(path, name + '.npy'), np.ascontiguousarray(array))
+
+    edges, tag_ids, tag_names = encode_boundary(domain.boundary)
+
+    save('nodes', domain.get_nodes())
+    save('triangles', domain.get_triangles())
+    save('boundary_edges', edges)
+    save('boundary_tag_ids', tag_ids)
+
+    quantity_names = sorted(domain.quantities.keys())
+    for name in quantity_names:
+        quantity = domain.quantities[name]
+        save(name + '.centroid', quantity.centroid_values)
+        save(name + '.vertex', quantity.vertex_values)
+
+    save('initial_elevation', solver.land_surface__initial_elevation)
+    save('cumulative_elevation_change', solver.cumulative_elevation_change)
+
+    reductions = []
+    if solver.monitors is not None:
+        reductions = sorted(solver.monitors.values.keys())
+        for name in reductions:
+            save('reduction.' + name, solver.monitors.values[name])
+
+    geo_reference = domain.geo_reference
+
+    manifest = {'version': _SNAPSHOT_VERSION,
+                'time': float(domain.get_time()),
+                'params': solver.params,
+                'geo_reference': [geo_reference.get_zone(),
+                                  geo_reference.get_xllcorner(),
+                                  geo_reference.get_yllcorner()],
+                'boundary_tag_names': [str(tag) for tag in tag_names],
+                'quantities': quantity_names,
+                'reductions': reductions}
+
+    # write the manifest last: a snapshot without one is incomplete
+    with open(os.path.join(path, 'manifest.json'), 'w') as file_obj:
+        json.dump(manifest, file_obj, indent=2, sort_keys=True)
+
+
+class Snapshot(object):
+    """
+    Snapshot read back from disk, with memory-mapped arrays.
+
+    Parameters
+    ----------
+    path : str
+        Snapshot directory written by save_state.
+    """
+
+    def __init__(self, path):
+
+        self.path = path
+
+        with open(os.path.join(path, 'manifest.json'), 'r') as file_obj:
+            manifest = json.load(file_obj)
+
+        assert manifest['version'] == _SNAPSHOT_VERSION, (
+            "Snapshot '%s' has version %s; version %s is expected." %
+            (path, manifest['version'], _SNAPSHOT_VERSION))
+
+        self.time = manifest['time']
+        self.params = manifest['params']
+        self.geo_reference = manifest['geo_reference']
+        self.quantity_names = manifest['quantities']
+        self.reductions = manifest.get('reductions', [])
+
+        self.nodes = self.load('nodes')
+        self.triangles = self.load('triangles')
+        self.boundary = decode_boundary(self.load('boundary_edges'),
+                                        self.load('boundary_tag_ids'),
+                                        manifest['boundary_tag_names'])
+
+
+    def load(self, name):
+        """Memory-mapped array of the snapshot."""
+        return np.load(os.path.join(self.path, name + '.npy'), mmap_mode='r')
+
+
+    def restore(self, solver):
+        """
+        Copy the quantities, initial elevation and time of the snapshot
+        into a solver whose domain was built from the snapshot mesh.
+        """
+
+        domain = solver.domain
+
+        for name in self.quantity_names:
+
+            if name not in domain.quantities:
+                continue
+
+            quantity = domain.quantities[name]
+            quantity.centroid_values[:] = self.load(name + '.centroid')
+            quantity.vertex_values[:] = self.load(name + '.vertex')
+            quantity.interpolate_from_vertices_to_edges()
+
+        solver.land_surface__initial_elevation = self.load('initial_elevation')
+
+        if os.path.exists(os.path.join(self.path,
+                                       'cumulative_elevation_change.npy')):
+            solver._cumulative_elevation_change[:] = self.load(
+                'cumulative_elevation_change')
+
+        # the restart time becomes the start time: evolve begins from the
+        # start time, and the SWW times are written relative to it
+        domain.set_starttime(self.time)
+        solver._time = self.time
+
+
+    def restore_reductions(self, monitors):
+        """
+        Copy the saved monitor reductions into the monitors of the
+        restarted solver (reductions that either one lacks are left as
+        they are).
+        """
+
+        for name in self.reductions:
+            if name in monitors.values:
+                monitors.values[name][:] = self.load('reduction.' + name)
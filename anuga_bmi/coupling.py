@@ -0,0 +1,113 @@
+#! /usr/bin/env python
+"""
+Adaptive coupling interval.
+
+ANUGA's internal timestep is limited by the CFL condition, so it shrinks
+when the flow speeds up and the water deepens, and the wet area grows or
+shrinks fastest while a flood arrives or recedes. The controller turns
+the statistics of each update into the interval of the next one:
+- the solver should take about target_steps internal steps per update,
+  at the mean internal timestep of the last update
+- the number of wet cells should change by at most max_wet_change
+  (relative) per update, at the rate of the last update
+The interval grows by at most a factor growth per update, and stays
+within [min_interval, max_interval].
+"""
+
+
+class CouplingController(object):
+    """
+    Recommend the next coupling interval from the solver timesteps.
+
+    Parameters
+    ----------
+    interval : float
+        First interval.
+    min_interval : float
+        Smallest interval.
+    max_interval : float
+        Largest interval.
+    target_steps : float, optional
+        Internal solver steps per update.
+    max_wet_change : float, optional
+        Largest relative change of the number of wet cells per update.
+    growth : float, optional
+        Largest growth of the interval from one update to the next.
+    """
+
+    def __init__(self, interval, min_interval, max_interval, target_steps=50.,
+                 max_wet_change=0.05, growth=2.):
+
+        assert 0. < min_interval <= max_interval, (
+            "Coupling interval bounds must satisfy 0 < min <= max, "
+            "not [%g, %g]" % (min_interval, max_interval))
+        assert growth > 1., "Coupling interval growth must be > 1"
+
+        self.min_interval = float(min_interval)
+        self.max_interval = float(max_interval)
+        self.target_steps = float(target_steps)
+        self.max_wet_change = float(max_wet_change)
+        self.growth = float(growth)
+
+        self.interval = self._clip(float(interval))
+        self.wet_cells = None
+        self.limit = 'initial'
+
+
+    def _clip(self, interval):
+        return min(max(interval, self.min_interval), self.max_interval)
+
+
+    @property
+    def statistics(self):
+        """Recommended interval, what limits it, and the wet cell count."""
+        return {'recommended_interval': self.interval,
+                'interval_limit': self.limit,
+                'wet_cells': self.wet_cells}
+
+
+    def record(self, elapsed, n_steps, wet_cells):
+        """
+        Update the recommended interval after an update.
+
+        Parameters
+        ----------
+        elapsed : float
+            Model time covered by the update.
+        n_steps : int
+            Internal solver steps taken.
+        wet_cells : int or None
+            Number of wet cells after the update, or None if they were
+            not counted (the wet cell change then does not limit the
+            interval).
+
+        Returns
+        -------
+        float
+            Recommended interval of the next update.
+        """
+
+        previous_wet = self.wet_cells
+        self.wet_cells = wet_cells
+
+        if elapsed <= 0. or n_steps == 0:
+            return self.interval
+
+        candidates = [(self.target_steps * elapsed / n_steps, 'timestep'),
+                      (self.growth * self.interval, 'growth')]
+
+        if (previous_wet is not None and wet_cells is not None and
+                wet_cells != previous_wet):
+            rate = abs(wet_cells - previous_wet) / (max(previous_wet, 1) * elapsed)
+            candidates.append((self.max_wet_change / rate, 'wet_change'))
+
+        interval, self.limit = min(candidates)
+
+        if interval <= self.min_interval:
+            self.limit = 'min_interval'
+        elif interval >= self.max_interval:
+            self.limit = 'max_interval'
+
+        self.interval = self._clip(interval)
+
+        return self.interval
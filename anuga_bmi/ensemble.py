@@ -0,0 +1,351 @@
+#! /usr/bin/env python
+"""
+Ensembles of BmiAnuga members built from one input file.
+
+Each member is a BmiAnuga initialized from the shared input file plus its
+own parameter overrides (e.g. Mannings_n_parameter,
+inflow_sediment_concentration or the boundary stages). Members are spread
+over a pool of worker processes, and every worker owns its members for
+the lifetime of the ensemble.
+
+Outline meshes and elevations are generated once: the first member is
+initialized on its own, which fills the mesh cache, and every other
+member then starts warm from it.
+"""
+
+import copy
+import multiprocessing
+import os
+import tempfile
+import time
+import traceback
+
+import numpy as np
+import yaml
+
+
+class Ensemble(object):
+    """
+    Pool of BmiAnuga members.
+
+    Parameters
+    ----------
+    filename : str
+        Input file shared by all members.
+    overrides : list of dict
+        Parameter overrides of each member. The ensemble has one member
+        per item.
+    n_workers : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+    directory : str, optional
+        Directory for the member input files and, unless the input file
+        sets mesh_cache_directory, the mesh cache.
+    start_method : str, optional
+        multiprocessing start method ('fork' or 'spawn'). Ignored on
+        Python 2, which always forks.
+    """
+
+    def __init__(self, filename, overrides, n_workers=None, directory=None,
+                 start_method=None):
+
+        if len(overrides) == 0:
+            raise ValueError('An ensemble needs at least one member')
+
+        with open(filename, 'r') as file_obj:
+            params = yaml.safe_load(file_obj)
+
+        self.directory = directory or tempfile.mkdtemp(prefix='anuga_ensemble_')
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        if not params.get('mesh_cache_directory'):
+            params['mesh_cache_directory'] = os.path.join(self.directory,
+                                                          'mesh_cache')
+
+        output_filename = params.get('output_filename') or 'anuga_output'
+
+        self.filenames = []
+        for i, member_overrides in enumerate(overrides):
+
+            member_params = copy.deepcopy(params)
+            member_params.update(_builtin(member_overrides))
+            if 'output_filename' not in member_overrides:
+                member_params['output_filename'] = ('%s_member%03d' %
+                                                    (output_filename, i))
+
+            member_filename = os.path.join(self.directory,
+                                           'member%03d.yaml' % i)
+            with open(member_filename, 'w') as file_obj:
+                yaml.safe_dump(member_params, file_obj)
+
+            self.filenames.append(member_filename)
+
+        n_members = len(self.filenames)
+        n_workers = min(n_workers or multiprocessing.cpu_count(), n_members)
+
+        # members of each worker, round robin
+        self._assignment = [list(range(w, n_members, n_workers))
+                            for w in range(n_workers)]
+
+        if start_method is None or not hasattr(multiprocessing, 'get_context'):
+            context = multiprocessing
+        else:
+            context = multiprocessing.get_context(start_method)
+
+        self._time = 0.
+        self._member_seconds = 0.
+        self._wall_time = 0.
+
+        self._connections = []
+        self._workers = []
+
+        for w, members in enumerate(self._assignment):
+
+            parent, child = context.Pipe()
+            worker = context.Process(target=_serve,
+                                     args=(child,
+                                           [self.filenames[i] for i in members]))
+            worker.daemon = True
+            worker.start()
+
+            self._connections.append(parent)
+            self._workers.append(worker)
+
+            if w == 0:
+                # let the first member fill the mesh cache before the
+                # others start
+                _check(parent.recv())
+
+        for w, connection in enumerate(self._connections):
+            for _ in range(len(self._assignment[w]) - (w == 0)):
+                _check(connection.recv())
+
+
+    def __len__(self):
+        return len(self.filenames)
+
+
+    def _broadcast(self, command, *args):
+        """Send a command to every worker and collect the replies."""
+
+        for connection in self._connections:
+            connection.send((command, args))
+
+        return self._collect()
+
+
+    def _collect(self):
+        """
+        Collect one reply from every worker, then raise the first error.
+        Every reply is read first, so none is left for the next command.
+        """
+
+        replies = [connection.recv() for connection in self._connections]
+
+        return [_check(reply) for reply in replies]
+
+
+    def _stack(self, replies):
+        """Order per-worker lists of member results by member index."""
+
+        results = [None] * len(self)
+        for members, reply in zip(self._assignment, replies):
+            for i, value in zip(members, reply):
+                results[i] = value
+
+        return np.array(results)
+
+
+    def update_until(self, then):
+        """
+        Advance all members, in lockstep, to time then.
+
+        Parameters
+        ----------
+        then : float
+            Time to run the members until.
+        """
+
+        start = time.time()
+        self._broadcast('update_until', then)
+
+        self._wall_time += time.time() - start
+        self._member_seconds += len(self) * max(then - self._time, 0.)
+        self._time = max(then, self._time)
+
+
+    def get_value(self, var_name):
+        """
+        Values of a variable for every member.
+
+        Returns
+        -------
+        ndarray
+            Array of shape (number of members, number of cells).
+        """
+
+        return self._stack(self._broadcast('get_value', var_name))
+
+
+    def set_value(self, var_name, src):
+        """
+        Set a variable of every member.
+
+        Parameters
+        ----------
+        var_name : str
+            Name of variable as CSDMS Standard Name.
+        src : array_like
+            Array of shape (number of members, number of cells).
+        """
+
+        for connection, members in zip(self._connections, self._assignment):
+            connection.send(('set_value',
+                             (var_name, [np.asarray(src[i]) for i in members])))
+
+        self._collect()
+
+
+    def run(self, times, var_names):
+        """
+        Advance every member independently through a list of times and
+        sample variables at each of them.
+
+        Parameters
+        ----------
+        times : sequence of float
+            Increasing sampling times.
+        var_names : sequence of str
+            Names of the variables to sample.
+
+        Returns
+        -------
+        dict
+            Arrays of shape (number of members, number of times, number of
+            cells), keyed on variable name.
+        """
+
+        times = [float(t) for t in times]
+
+        start = time.time()
+        replies = self._broadcast('run', times, list(var_names))
+
+        self._wall_time += time.time() - start
+        self._member_seconds += len(self) * max(times[-1] - self._time, 0.)
+        self._time = max(times[-1], self._time)
+
+        return dict((name, self._stack([[member[name] for member in reply]
+                                        for reply in replies]))
+                    for name in var_names)
+
+
+    @property
+    def throughput(self):
+        """Simulated member-seconds per wall-clock second."""
+
+        if self._wall_time == 0.:
+            return 0.
+
+        return self._member_seconds / self._wall_time
+
+
+    def finalize(self):
+        """Finalize every member and stop the workers."""
+
+        if self._workers:
+            self._broadcast('finalize')
+
+        for worker in self._workers:
+            worker.join()
+
+        self._connections = []
+        self._workers = []
+
+
+def _builtin(value):
+    """Copy of value with numpy scalars and arrays as Python types, which
+    yaml.safe_dump can write."""
+
+    if isinstance(value, dict):
+        return dict((key, _builtin(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_builtin(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _check(reply):
+    """Unpack a worker reply, raising the errors of the worker."""
+
+    status, value = reply
+
+    if status == 'error':
+        raise RuntimeError('Ensemble worker failed:\n' + value)
+
+    return value
+
+
+def _serve(connection, filenames):
+    """Worker loop: own some members and run the commands of the ensemble."""
+
+    from anuga_bmi import BmiAnuga
+
+    members = []
+
+    try:
+        for filename in filenames:
+            member = BmiAnuga()
+            member.initialize(filename)
+            members.append(member)
+            connection.send(('ok', None))
+    except Exception:
+        connection.send(('error', traceback.format_exc()))
+        return
+
+    while True:
+
+        command, args = connection.recv()
+
+        try:
+            if command == 'update_until':
+                for member in members:
+                    member.update_until(args[0])
+                reply = None
+
+            elif command == 'get_value':
+                reply = [member.get_value(args[0]) for member in members]
+
+            elif command == 'set_value':
+                var_name, values = args
+                for member, src in zip(members, values):
+                    member.set_value(var_name, src)
+                reply = None
+
+            elif command == 'run':
+                times, var_names = args
+                reply = []
+                for member in members:
+                    samples = dict((name, []) for name in var_names)
+                    for t in times:
+                        member.update_until(t)
+                        for name in var_names:
+                            samples[name].append(member.get_value(name))
+                    reply.append(dict((name, np.array(samples[name]))
+                                      for name in var_names))
+
+            elif command == 'finalize':
+                for member in members:
+                    member.finalize()
+                connection.send(('ok', None))
+                return
+
+            else:
+                raise ValueError("Unknown ensemble command '%s'" % command)
+
+        except Exception:
+            connection.send(('error', traceback.format_exc()))
+        else:
+            connection.send(('ok', reply))
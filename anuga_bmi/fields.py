@@ -0,0 +1,283 @@
+#! /usr/bin/env python
+"""
+Friction and vegetation fields from rasters and land-cover tables.
+
+Resampling a raster onto the mesh is split into a part that depends only
+on the geometry of the mesh and of the raster, and is computed once, and
+a cheap part that depends on the values:
+- continuous rasters (e.g. Manning's n) are averaged over each triangle,
+  one sparse matrix-vector product through the area weights of
+  anuga_bmi.raster
+- land-cover rasters are sampled at the centroids once; the class of each
+  triangle is kept, so a new table of values per class is a single
+  gather
+
+Land-cover tables map each class code to the values of some of these
+columns:
+- manning_n
+- stem_diameter (m)
+- stem_spacing (m)
+
+They are dicts ({code: {column: value}}) or CSV files with a header row
+whose first column is the code.
+"""
+
+import csv
+
+import numpy as np
+
+from anuga_bmi.raster import RasterSeries, area_weights
+
+
+# BMI variable set from each land-cover column
+LAND_COVER_COLUMNS = {
+    'manning_n': 'manning_n_parameter',
+    'stem_diameter': 'land_vegetation__stem_diameter',
+    'stem_spacing': 'land_vegetation__stem_spacing',
+}
+
+
+def read_raster(filename, variable=None):
+    """
+    First frame of a raster file.
+
+    Returns
+    -------
+    tuple of (RasterGrid, ndarray)
+        Grid and flattened values, with nan for nodata.
+    """
+
+    series = RasterSeries(filename, variable)
+    try:
+        return series.grid, series.values(0)
+    finally:
+        series.close()
+
+
+def read_land_cover_table(table):
+    """
+    Values of each land-cover class.
+
+    Parameters
+    ----------
+    table : dict or str
+        {code: {column: value}}, or a CSV file.
+
+    Returns
+    -------
+    tuple of (ndarray, dict)
+        Sorted class codes, and the values of each column for these
+        codes (nan where a class has no value).
+    """
+
+    if isinstance(table, str):
+        with open(table, 'r') as file_obj:
+            reader = csv.reader(file_obj)
+            header = [name.strip().lower() for name in next(reader)]
+            table = dict((float(row[0]),
+                          dict((name, float(value)) for name, value
+                               in zip(header[1:], row[1:]) if value.strip()))
+                         for row in reader if row)
+
+    unknown = set(name for values in table.values() for name in values
+                  if name not in LAND_COVER_COLUMNS)
+    if unknown:
+        raise ValueError("Did not recognize land-cover columns %s" %
+                         sorted(unknown))
+
+    codes = np.array(sorted(float(code) for code in table), dtype=float)
+    by_code = dict((float(code), values) for code, values in table.items())
+
+    columns = dict((name, np.array([by_code[code].get(name, np.nan)
+                                    for code in codes], dtype=float))
+                   for name in LAND_COVER_COLUMNS
+                   if any(name in values for values in table.values()))
+
+    return codes, columns
+
+
+class RasterResampler(object):
+    """
+    Resampling of the rasters on one grid onto the triangles of a mesh.
+
+    Parameters
+    ----------
+    grid : RasterGrid
+        Raster geometry.
+    nodes : ndarray
+        (N, 2) node coordinates, in the frame of the raster.
+    triangles : ndarray
+        (M, 3) node indices of the triangles.
+    samples_per_edge : int, optional
+        Resolution of the area weights.
+    """
+
+    def __init__(self, grid, nodes, triangles, samples_per_edge=4):
+
+        self.grid = grid
+        self.cells = grid.cell_index(nodes[triangles].mean(axis=1))
+
+        self._nodes = nodes
+        self._triangles = triangles
+        self._samples_per_edge = samples_per_edge
+        self._weights = None
+
+
+    @property
+    def weights(self):
+        """Area weights, computed on first use."""
+
+        if self._weights is None:
+            self._weights = area_weights(self.grid, self._nodes,
+                                         self._triangles,
+                                         self._samples_per_edge)
+        return self._weights
+
+
+    def at_centroids(self, values, fill):
+        """
+        Values of the raster cells that contain the centroids.
+
+        Parameters
+        ----------
+        values : ndarray
+            Flattened raster values (nan for nodata).
+        fill : ndarray
+            Values of the triangles whose centroid is outside the raster
+            or on nodata.
+
+        Returns
+        -------
+        ndarray
+            Values on the triangles.
+        """
+
+        sampled = np.where(self.cells >= 0, values[self.cells], np.nan)
+
+        return np.where(np.isnan(sampled), fill, sampled)
+
+
+    def area_mean(self, values, fill):
+        """
+        Mean of the raster over each triangle, ignoring nodata.
+
+        Parameters
+        ----------
+        values : ndarray
+            Flattened raster values (nan for nodata).
+        fill : ndarray
+            Values of the triangles with no raster data.
+
+        Returns
+        -------
+        ndarray
+            Values on the triangles.
+        """
+
+        valid = np.isfinite(values)
+
+        total = self.weights.dot(np.where(valid, values, 0.))
+        covered = self.weights.dot(valid.astype(float))
+
+        has_data = covered > 0.
+        total[has_data] /= covered[has_data]
+
+        return np.where(has_data, total, fill)
+
+
+class ResamplerCache(object):
+    """
+    Raster resamplers of a mesh, one per raster geometry.
+
+    Parameters
+    ----------
+    nodes : ndarray
+        (N, 2) node coordinates, in the frame of the rasters.
+    triangles : ndarray
+        (M, 3) node indices of the triangles.
+    samples_per_edge : int, optional
+        Resolution of the area weights.
+    """
+
+    def __init__(self, nodes, triangles, samples_per_edge=4):
+
+        self._nodes = nodes
+        self._triangles = triangles
+        self._samples_per_edge = samples_per_edge
+        self._resamplers = {}
+
+
+    def __len__(self):
+        return len(self._resamplers)
+
+
+    def get(self, grid):
+        """Resampler of the rasters on the cells of grid."""
+
+        key = grid.key
+        if key not in self._resamplers:
+            self._resamplers[key] = RasterResampler(grid, self._nodes,
+                                                    self._triangles,
+                                                    self._samples_per_edge)
+        return self._resamplers[key]
+
+
+class LandCover(object):
+    """
+    Land-cover class of each triangle.
+
+    Parameters
+    ----------
+    codes : ndarray
+        Class code of each triangle (nan for none).
+    """
+
+    def __init__(self, codes):
+
+        codes = np.asarray(codes, dtype=float)
+
+        self.classes, self._inverse = np.unique(codes[np.isfinite(codes)],
+                                                return_inverse=True)
+        self._selector = np.flatnonzero(np.isfinite(codes))
+
+
+    @classmethod
+    def from_raster(cls, resampler, values):
+        """Classes at the centroids of the triangles."""
+        return cls(resampler.at_centroids(values, np.nan))
+
+
+    def lookup(self, codes, column, fill):
+        """
+        Values of a table column on the triangles.
+
+        Parameters
+        ----------
+        codes : ndarray
+            Sorted class codes of the table.
+        column : ndarray
+            Values of the column for these codes (nan for none).
+        fill : ndarray
+            Values of the triangles with no class, or a class without a
+            value.
+
+        Returns
+        -------
+        ndarray
+            Values on the triangles.
+        """
+
+        # value of each class of the mesh, then one gather
+        position = np.clip(np.searchsorted(codes, self.classes), 0,
+                           max(len(codes) - 1, 0))
+        per_class = np.full(len(self.classes), np.nan)
+        if len(codes):
+            found = codes[position] == self.classes
+            per_class[found] = column[position[found]]
+
+        values = np.array(fill, dtype=float)
+        sampled = per_class[self._inverse]
+        has_value = ~np.isnan(sampled)
+        values[self._selector[has_value]] = sampled[has_value]
+
+        return values
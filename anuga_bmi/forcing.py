@@ -0,0 +1,195 @@
+#! /usr/bin/env python
+"""
+Rainfall and infiltration operators.
+
+Both rates can be a constant or a raster (see anuga_bmi.raster), given in
+any of the units of RATE_UNITS. Raster rates are mapped onto the
+triangles once per frame, so each timestep only scales the per-triangle
+rates by the timestep.
+"""
+
+import numpy as np
+
+from anuga.operators.base_operator import Operator
+
+from anuga_bmi.raster import RasterSeries, TriangleField
+
+
+# factor from each unit to m s-1
+RATE_UNITS = {
+    'm/s': 1.,
+    'mm/s': 1.e-3,
+    'mm/hr': 1.e-3 / 3600.,
+    'mm/day': 1.e-3 / 86400.,
+    'in/hr': 0.0254 / 3600.,
+}
+
+
+def rate_field(domain, rate, units='mm/hr', variable=None, samples_per_edge=4):
+    """
+    Rate on the triangles of a domain, in m s-1.
+
+    Parameters
+    ----------
+    domain : anuga.Domain
+        Domain.
+    rate : float or str
+        Constant rate, or a raster file.
+    units : str, optional
+        Units of the rate (see RATE_UNITS).
+    variable : str, optional
+        Data variable of a NetCDF raster.
+    samples_per_edge : int, optional
+        Resolution of the raster area weights.
+
+    Returns
+    -------
+    TriangleField or float
+        Raster field, or a constant rate.
+    """
+
+    if units not in RATE_UNITS:
+        raise ValueError("Did not recognize rate units '%s'" % units)
+
+    scale = RATE_UNITS[units]
+
+    if not isinstance(rate, str):
+        return float(rate) * scale
+
+    # rasters are in absolute coordinates
+    geo_reference = domain.geo_reference
+    nodes = domain.get_nodes() + [geo_reference.get_xllcorner(),
+                                  geo_reference.get_yllcorner()]
+
+    return TriangleField(RasterSeries(rate, variable), nodes,
+                         domain.get_triangles(), scale=scale,
+                         samples_per_edge=samples_per_edge)
+
+
+def _rate_at(rate, t):
+    if isinstance(rate, TriangleField):
+        return rate.at(t)
+    return rate
+
+
+class RainfallOperator(Operator):
+    """
+    Add rain to the water depth at every timestep.
+
+    Parameters
+    ----------
+    domain : anuga.Domain
+        Domain.
+    rate : TriangleField or float
+        Rainfall rate (m s-1), from rate_field.
+    """
+
+    def __init__(self, domain, rate):
+
+        Operator.__init__(self, domain, description='BMI rainfall',
+                          label='rainfall')
+
+        self.rate = rate
+        self.depth = np.zeros(len(domain))
+
+
+    def __call__(self):
+
+        timestep = self.domain.get_timestep()
+        rain = _rate_at(self.rate, self.domain.get_time()) * timestep
+
+        quantities = self.domain.quantities
+        quantities['stage'].centroid_values[:] += rain
+        quantities['height'].centroid_values[:] += rain
+
+        self.depth += rain
+
+
+    def parallel_safe(self):
+        return True
+
+
+    def statistics(self):
+        return 'BMI rainfall operator'
+
+
+    def timestepping_statistics(self):
+        return 'BMI rainfall: %g m3 so far' % np.dot(self.depth,
+                                                     self.domain.areas)
+
+
+class InfiltrationOperator(Operator):
+    """
+    Remove water at the infiltration capacity, or less where there is
+    less water, at every timestep.
+
+    Parameters
+    ----------
+    domain : anuga.Domain
+        Domain.
+    rate : TriangleField or float
+        Infiltration capacity (m s-1), from rate_field.
+    active_set : ActiveSet, optional
+        Only the triangles of the set are updated (see anuga_bmi.active).
+    """
+
+    def __init__(self, domain, rate, active_set=None):
+
+        Operator.__init__(self, domain, description='BMI infiltration',
+                          label='infiltration')
+
+        self.rate = rate
+        self.active_set = active_set
+        self.depth = np.zeros(len(domain))
+        self._loss = np.zeros(len(domain))
+
+
+    def __call__(self):
+
+        timestep = self.domain.get_timestep()
+        capacity = _rate_at(self.rate, self.domain.get_time()) * timestep
+
+        quantities = self.domain.quantities
+        height = quantities['height'].centroid_values
+
+        if self.active_set is not None:
+            # dry triangles have nothing to lose
+            self._call_active(quantities, height, capacity)
+            return
+
+        loss = self._loss
+        np.minimum(np.maximum(height, 0.), capacity, out=loss)
+
+        quantities['stage'].centroid_values[:] -= loss
+        height -= loss
+
+        self.depth += loss
+
+
+    def _call_active(self, quantities, height, capacity):
+
+        indices = self.active_set.indices
+        self.active_set.record('infiltration')
+
+        if np.ndim(capacity) > 0:
+            capacity = capacity[indices]
+
+        loss = np.minimum(np.maximum(height[indices], 0.), capacity)
+
+        quantities['stage'].centroid_values[indices] -= loss
+        height[indices] -= loss
+
+        self.depth[indices] += loss
+
+
+    def parallel_safe(self):
+        return True
+
+
+    def statistics(self):
+        return 'BMI infiltration operator'
+
+
+    def timestepping_statistics(self):
+        return 'BMI infiltration: %g m3 so far' % np.dot(self.depth,
+                                                         self.domain.areas)
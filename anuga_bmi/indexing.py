@@ -0,0 +1,189 @@
+#! /usr/bin/env python
+"""
+Index plans: index sets that are checked and analysed once and then
+reused for many indexed reads and writes.
+
+A plan validates the indices against the size of the array, sorts and
+deduplicates them, and finds the runs of consecutive indices, so that
+reads and writes are done with slice copies when the set is made of a few
+long runs (e.g. the cells of a river bank numbered along the bank), and
+with a single take/put otherwise.
+"""
+
+import numpy as np
+
+
+# use slice copies when runs are on average at least this long
+_MIN_MEAN_RUN_LENGTH = 32
+
+
+class IndexPlan(object):
+    """
+    Precomputed access to an array at a set of indices.
+
+    Parameters
+    ----------
+    indices : array_like
+        Indices in the order the values are exchanged. They may be
+        unsorted and repeated.
+    size : int
+        Size of the indexed arrays.
+    """
+
+    def __init__(self, indices, size):
+
+        indices = np.asarray(indices)
+
+        if indices.size and not np.issubdtype(indices.dtype, np.integer):
+            raise TypeError('Indices must be integers, not %s' % indices.dtype)
+
+        indices = indices.astype(int).ravel()
+
+        if indices.size and (indices.min() < 0 or indices.max() >= size):
+            raise IndexError('Indices must be in [0, %d)' % size)
+
+        self.size = int(size)
+        self.requested = indices
+
+        # sorted, unique indices and where each requested index is in them
+        self.indices, self._inverse = np.unique(indices, return_inverse=True)
+        self.indices.setflags(write=False)
+
+        # for repeated indices, the last value written wins (as with
+        # array[indices] = values)
+        _, first_in_reversed = np.unique(indices[::-1], return_index=True)
+        self._last = len(indices) - 1 - first_in_reversed
+
+        self.is_identity = (len(self.indices) == len(indices) and
+                            np.array_equal(self.indices, indices))
+
+        # runs of consecutive indices, as (start, stop) in the array and
+        # offset in self.indices
+        breaks = np.flatnonzero(np.diff(self.indices) != 1) + 1
+        starts = np.concatenate(([0], breaks))
+        stops = np.concatenate((breaks, [len(self.indices)]))
+
+        self.runs = [(int(self.indices[i]), int(self.indices[j - 1]) + 1, int(i))
+                     for i, j in zip(starts, stops) if j > i]
+
+        self.use_slices = (len(self.runs) > 0 and
+                           len(self.indices) >= _MIN_MEAN_RUN_LENGTH * len(self.runs))
+
+        if len(self.runs) == 1:
+            self.selector = slice(self.runs[0][0], self.runs[0][1])
+        else:
+            self.selector = self.indices
+
+        self._buffer = None
+
+
+    def __len__(self):
+        return len(self.requested)
+
+
+    def take_unique(self, array, out):
+        """Copy array at the sorted, unique indices into out."""
+
+        if self.use_slices:
+            for start, stop, offset in self.runs:
+                out[offset:offset + stop - start] = array[start:stop]
+        else:
+            np.take(array, self.indices, out=out)
+
+        return out
+
+
+    def gather(self, array, out=None):
+        """
+        Values of an array at the requested indices.
+
+        Parameters
+        ----------
+        array : ndarray
+            Array of the planned size.
+        out : ndarray, optional
+            Array of len(self) values to fill.
+
+        Returns
+        -------
+        ndarray
+            Values, in the requested order.
+        """
+
+        if out is None:
+            out = np.empty(len(self), dtype=array.dtype)
+
+        if self.is_identity:
+            return self.take_unique(array, out)
+
+        if self._buffer is None or self._buffer.dtype != array.dtype:
+            self._buffer = np.empty(len(self.indices), dtype=array.dtype)
+
+        self.take_unique(array, self._buffer)
+        np.take(self._buffer, self._inverse, out=out)
+
+        return out
+
+
+    def unique_values(self, src):
+        """
+        Values for the sorted, unique indices from values for the
+        requested indices (the last one of each repeated index).
+        """
+
+        if np.ndim(src) == 0:
+            return src
+
+        src = np.asarray(src).ravel()
+
+        if self.is_identity:
+            return src
+
+        return src[self._last]
+
+
+    def unique_sums(self, src):
+        """
+        Values for the sorted, unique indices from values for the
+        requested indices (the sum over each repeated index). A scalar
+        is the value of every requested index, so it counts once per
+        occurrence: an index requested k times gets k times the scalar.
+        """
+
+        if np.ndim(src) == 0:
+            if len(self.indices) == len(self.requested):
+                return src
+            return src * np.bincount(self._inverse, minlength=len(self.indices))
+
+        src = np.asarray(src, dtype=float).ravel()
+
+        if self.is_identity:
+            return src
+
+        return np.bincount(self._inverse, weights=src,
+                           minlength=len(self.indices))
+
+
+    def scatter(self, array, src):
+        """
+        Write values at the requested indices of an array.
+
+        Parameters
+        ----------
+        array : ndarray
+            Array of the planned size.
+        src : array_like or float
+            Values for the requested indices, or one value for all.
+        """
+
+        src = self.unique_values(src)
+        scalar = np.ndim(src) == 0
+
+        if self.use_slices:
+            for start, stop, offset in self.runs:
+                if scalar:
+                    array[start:stop] = src
+                else:
+                    array[start:stop] = src[offset:offset + stop - start]
+        else:
+            array[self.indices] = src
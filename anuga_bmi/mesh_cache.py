@@ -0,0 +1,196 @@
+#! /usr/bin/env python
+"""Content-addressed cache of generated meshes and interpolated elevations."""
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+
+# bump when the layout of the cache entries changes
+_CACHE_VERSION = 1
+
+
+def mesh_key(bounding_polygon, interior_regions, elevation_filename,
+             boundary_tags, maximum_triangle_area):
+    """
+    Hash of everything that determines an outline mesh and its elevation.
+
+    Parameters
+    ----------
+    bounding_polygon : array_like
+        Exterior boundary node coordinates.
+    interior_regions : list or None
+        List of [polygon, maximum_triangle_area] pairs.
+    elevation_filename : str
+        Raster (.asc) or point (.pts) elevation file. Its contents are
+        hashed, not its name.
+    boundary_tags : dict
+        Boundary tag names and lists of boundary segment indices.
+    maximum_triangle_area : float
+        Maximum area of the mesh triangles.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest.
+    """
+
+    digest = hashlib.sha1()
+    digest.update(('anuga_bmi mesh v%d' % _CACHE_VERSION).encode('ascii'))
+
+    digest.update(np.ascontiguousarray(bounding_polygon, dtype=float).tobytes())
+
+    for polygon, area in (interior_regions or []):
+        digest.update(np.ascontiguousarray(polygon, dtype=float).tobytes())
+        digest.update(repr(float(area)).encode('ascii'))
+
+    tags = sorted((str(tag), [int(i) for i in segments])
+                  for tag, segments in boundary_tags.items())
+    digest.update(repr(tags).encode('ascii'))
+    digest.update(repr(float(maximum_triangle_area)).encode('ascii'))
+
+    with open(elevation_filename, 'rb') as file_obj:
+        for chunk in iter(lambda: file_obj.read(1 << 20), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class MeshCache(object):
+    """
+    Directory of cached meshes, one compressed .npz file per key.
+
+    Each entry holds the mesh nodes (relative to the geo-reference),
+    triangles, tagged boundary edges, geo-reference and the elevation
+    vertex values. Entries are evicted least recently used first when the
+    directory grows past max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes=2000000000):
+
+        self.directory = directory
+        self.max_bytes = float(max_bytes)
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+
+    def load(self, key):
+        """
+        Load a cache entry.
+
+        Returns
+        -------
+        dict or None
+            Mesh arrays (see store), or None if the key is not cached.
+        """
+
+        path = self._path(key)
+
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path) as data:
+            entry = dict((name, data[name]) for name in data.files)
+
+        # mark as recently used
+        os.utime(path, None)
+
+        entry['boundary'] = decode_boundary(entry.pop('boundary_edges'),
+                                            entry.pop('boundary_tag_ids'),
+                                            entry.pop('boundary_tag_names'))
+
+        return entry
+
+
+    def store(self, key, nodes, triangles, boundary, geo_reference, elevation):
+        """
+        Store a mesh and its elevation.
+
+        Parameters
+        ----------
+        key : str
+            Key from mesh_key.
+        nodes : ndarray
+            (N, 2) node coordinates relative to the geo-reference.
+        triangles : ndarray
+            (M, 3) node indices of the triangles.
+        boundary : dict
+            Tag of each boundary edge, keyed on (triangle, edge).
+        geo_reference : tuple
+            (zone, xllcorner, yllcorner).
+        elevation : ndarray
+            (M, 3) elevation vertex values.
+        """
+
+        edges, tag_ids, tag_names = encode_boundary(boundary)
+
+        # write to a temporary file first so that concurrent readers never
+        # see a partial entry
+        handle, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+
+        with os.fdopen(handle, 'wb') as file_obj:
+            np.savez_compressed(file_obj,
+                                nodes=np.asarray(nodes, dtype=float),
+                                triangles=np.asarray(triangles, dtype=np.int32),
+                                boundary_edges=edges,
+                                boundary_tag_ids=tag_ids,
+                                boundary_tag_names=tag_names,
+                                geo_reference=np.asarray(geo_reference,
+                                                         dtype=float),
+                                elevation=np.asarray(elevation, dtype=float))
+
+        os.rename(tmp_path, self._path(key))
+
+        self.evict()
+
+
+    def evict(self):
+        """Remove least recently used entries until under max_bytes."""
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz'):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # already evicted by another process
+                pass
+            total -= size
+
+
+def encode_boundary(boundary):
+    """Split a {(triangle, edge): tag} dict into arrays."""
+
+    tag_names = sorted(set(boundary.values()))
+    tag_index = dict((tag, i) for i, tag in enumerate(tag_names))
+
+    keys = sorted(boundary.keys())
+    edges = np.array(keys, dtype=np.int32).reshape(-1, 2)
+    tag_ids = np.array([tag_index[boundary[k]] for k in keys], dtype=np.int32)
+
+    return edges, tag_ids, np.array(tag_names)
+
+
+def decode_boundary(edges, tag_ids, tag_names):
+    """Rebuild the {(triangle, edge): tag} dict from encode_boundary."""
+
+    tag_names = [str(tag) for tag in tag_names]
+
+    return dict(((int(triangle), int(edge)), tag_names[tag_id])
+                for (triangle, edge), tag_id in zip(edges, tag_ids))
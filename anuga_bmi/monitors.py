@@ -0,0 +1,382 @@
+#! /usr/bin/env python
+"""
+Sparse output: gauge time series, regions of interest and running
+reductions over the mesh.
+
+The monitors are updated in memory by an operator that anuga calls after
+every timestep, and are written once, when the model is finalized:
+- <name>_monitors.npz: every recorded array
+- <name>_gauges.csv: the gauge time series, one column per gauge and
+  quantity
+
+Gauges are resolved once to the triangle that contains them and to the
+barycentric weights of its vertices, so sampling a gauge is a three-term
+sum over vertex values.
+
+Reductions (one value per triangle):
+- max_depth: largest water depth
+- max_speed: largest flow speed
+- arrival_time: first time the depth exceeds arrival_depth (nan if never)
+- cumulative_deposition: sum of the elevation increases (sediment
+  deposited, not counting erosion)
+"""
+
+import csv
+
+import numpy as np
+
+import anuga
+from anuga.operators.base_operator import Operator
+
+from anuga_bmi.quantities import QUANTITY_NAMES
+from anuga_bmi.spatial import SpatialIndex
+
+
+REDUCTIONS = ['max_depth', 'max_speed', 'arrival_time',
+              'cumulative_deposition']
+
+
+def read_points(points):
+    """
+    Named points from a dict of name: [x, y] or a CSV file of name, x, y
+    rows.
+
+    Returns
+    -------
+    tuple of (list of str, ndarray)
+        Point names and (n, 2) coordinates.
+    """
+
+    if isinstance(points, str):
+        with open(points, 'r') as file_obj:
+            rows = [row for row in csv.reader(file_obj) if row]
+        try:
+            float(rows[0][1])
+        except ValueError:
+            # header
+            rows = rows[1:]
+        points = dict((row[0].strip(), [float(row[1]), float(row[2])])
+                      for row in rows)
+
+    names = sorted(points.keys())
+    xy = np.array([points[name] for name in names], dtype=float).reshape(-1, 2)
+
+    return names, xy
+
+
+class Monitors(Operator):
+    """
+    Operator that records gauges, regions of interest and reductions.
+
+    Parameters
+    ----------
+    domain : anuga.Domain
+        Domain to monitor.
+    spatial_index : SpatialIndex, optional
+        Index of the domain mesh. Built if not given.
+    gauges : dict or str, optional
+        Gauge coordinates (absolute), as name: [x, y] or a CSV file.
+    gauge_quantities : list of str, optional
+        Quantities sampled at the gauges (ANUGA or BMI names).
+    gauge_interval : float, optional
+        Time between gauge samples. Samples are taken at the first
+        timestep at or after each sample time; 0 samples every timestep.
+    regions : dict, optional
+        Polygons of interest (absolute coordinates), as name: list of
+        [x, y] or a polygon file.
+    region_quantities : list of str, optional
+        Quantities recorded at the centroids inside the regions.
+    region_interval : float, optional
+        Time between region samples. 0 samples every timestep.
+    reductions : list of str, optional
+        Reductions to compute (see REDUCTIONS).
+    arrival_depth : float, optional
+        Depth that marks the arrival of the water.
+    active_set : ActiveSet, optional
+        Reductions are only updated on the triangles that were in the set
+        or were written since the last timestep (see anuga_bmi.active).
+        Dry triangles cannot raise a maximum or mark an arrival deeper
+        than the wet depth of the set.
+    """
+
+    def __init__(self, domain, spatial_index=None, gauges=None, gauge_quantities=('stage', 'height'),
+                 gauge_interval=0., regions=None, region_quantities=('height',),
+                 region_interval=0., reductions=(), arrival_depth=0.01,
+                 active_set=None):
+
+        Operator.__init__(self, domain, description='BMI monitors',
+                          label='monitors')
+
+        for name in reductions:
+            if name not in REDUCTIONS:
+                raise ValueError("Did not recognize reduction '%s'" % name)
+
+        geo_reference = domain.geo_reference
+        origin = np.array([geo_reference.get_xllcorner(),
+                           geo_reference.get_yllcorner()])
+
+        # gauges
+        self.gauge_names, self.gauge_xy = read_points(gauges or {})
+        self.gauge_quantities = list(gauge_quantities) if self.gauge_names else []
+        self.gauge_interval = float(gauge_interval)
+
+        if spatial_index is None:
+            spatial_index = SpatialIndex(domain.get_nodes(),
+                                         domain.get_triangles())
+
+        self.gauge_triangles, self.gauge_weights = spatial_index.locate(
+            self.gauge_xy - origin)
+
+        outside = [name for name, k in zip(self.gauge_names,
+                                           self.gauge_triangles) if k < 0]
+        if outside:
+            raise ValueError("Gauges outside the mesh: %s" % ', '.join(outside))
+
+        self.gauge_times = []
+        self.gauge_values = dict((name, []) for name in self.gauge_quantities)
+
+        # regions of interest
+        regions = regions or {}
+        self.region_names = sorted(regions.keys())
+        self.region_quantities = list(region_quantities) if self.region_names else []
+        self.region_interval = float(region_interval)
+
+        self.region_triangles = {}
+        for name in self.region_names:
+            polygon = regions[name]
+            if isinstance(polygon, str):
+                polygon = anuga.read_polygon(polygon)
+            self.region_triangles[name] = spatial_index.query_polygon(
+                np.asarray(polygon, dtype=float) - origin)
+
+        self.region_times = []
+        self.region_values = dict(((region, name), [])
+                                  for region in self.region_names
+                                  for name in self.region_quantities)
+
+        # reductions
+        self.reductions = list(reductions)
+        self.arrival_depth = float(arrival_depth)
+        self.active_set = active_set
+        if active_set is not None and self.reductions:
+            self._watch = active_set.watch()
+
+        n = len(domain)
+        self.values = {}
+        self._depth = np.zeros(n)
+        if 'max_depth' in self.reductions:
+            self.values['max_depth'] = np.zeros(n)
+        if 'max_speed' in self.reductions:
+            self.values['max_speed'] = np.zeros(n)
+            self._speed = np.zeros(n)
+        if 'arrival_time' in self.reductions:
+            self.values['arrival_time'] = np.full(n, np.nan)
+        if 'cumulative_deposition' in self.reductions:
+            self.values['cumulative_deposition'] = np.zeros(n)
+            self._last_elevation = domain.quantities['elevation'].centroid_values.copy()
+            self._change = np.zeros(n)
+
+        self._next_gauge_time = domain.get_time()
+        self._next_region_time = domain.get_time()
+
+        # the initial conditions
+        self.record(domain.get_time())
+
+
+    def quantity(self, name):
+        return self.domain.quantities[QUANTITY_NAMES.get(name, name)]
+
+
+    def __call__(self):
+
+        # anuga applies the operators after the conserved quantities are
+        # updated but before the time is, so the state is that at the end
+        # of the timestep
+        self.record(self.domain.get_time() + self.domain.get_timestep())
+
+
+    def record(self, now):
+        """Record the gauges, regions and reductions of the state at time now."""
+
+        domain = self.domain
+        tolerance = 1.0e-10 * max(1., abs(now))
+
+        gauges_due = (self.gauge_quantities and
+                      now >= self._next_gauge_time - tolerance)
+        regions_due = (self.region_quantities and
+                       now >= self._next_region_time - tolerance)
+
+        if gauges_due or regions_due:
+            # within a timestep only the conserved centroid values are up
+            # to date, so refresh the vertex values and the height as anuga
+            # does when it yields
+            domain.distribute_to_vertices_and_edges()
+
+        if gauges_due:
+            self.gauge_times.append(now)
+            for name in self.gauge_quantities:
+                vertex_values = self.quantity(name).vertex_values
+                self.gauge_values[name].append(
+                    np.einsum('ij,ij->i', vertex_values[self.gauge_triangles],
+                              self.gauge_weights))
+            self._next_gauge_time = _next_time(self._next_gauge_time,
+                                               self.gauge_interval, now)
+
+        if regions_due:
+            self.region_times.append(now)
+            for (region, name), values in self.region_values.items():
+                centroid_values = self.quantity(name).centroid_values
+                values.append(centroid_values[self.region_triangles[region]])
+            self._next_region_time = _next_time(self._next_region_time,
+                                                self.region_interval, now)
+
+        if not self.reductions:
+            return
+
+        if self.active_set is not None:
+            indices = self.active_set.visited(self._watch)
+            self._reduce_active(indices, now)
+            self.active_set.record('reductions', len(indices))
+            return
+
+        # the height quantity is only updated when anuga extrapolates
+        height = self._depth
+        np.subtract(domain.quantities['stage'].centroid_values,
+                    domain.quantities['elevation'].centroid_values, out=height)
+        np.maximum(height, 0., out=height)
+
+        if 'max_depth' in self.values:
+            np.maximum(self.values['max_depth'], height,
+                       out=self.values['max_depth'])
+
+        if 'max_speed' in self.values:
+            speed = self._speed
+            xmomentum = domain.quantities['xmomentum'].centroid_values
+            ymomentum = domain.quantities['ymomentum'].centroid_values
+            np.hypot(xmomentum, ymomentum, out=speed)
+            wet = height > domain.minimum_allowed_height
+            speed[wet] /= height[wet]
+            speed[~wet] = 0.
+            np.maximum(self.values['max_speed'], speed,
+                       out=self.values['max_speed'])
+
+        if 'arrival_time' in self.values:
+            arrival_time = self.values['arrival_time']
+            arrived = np.isnan(arrival_time) & (height > self.arrival_depth)
+            arrival_time[arrived] = now
+
+        if 'cumulative_deposition' in self.values:
+            elevation = domain.quantities['elevation'].centroid_values
+            np.subtract(elevation, self._last_elevation, out=self._change)
+            np.maximum(self._change, 0., out=self._change)
+            self.values['cumulative_deposition'] += self._change
+            self._last_elevation[:] = elevation
+
+
+    def _reduce_active(self, indices, now):
+        """Update the reductions on the triangles at indices only."""
+
+        domain = self.domain
+        height = np.maximum(domain.quantities['stage'].centroid_values[indices] -
+                            domain.quantities['elevation'].centroid_values[indices],
+                            0.)
+
+        if 'max_depth' in self.values:
+            max_depth = self.values['max_depth']
+            max_depth[indices] = np.maximum(max_depth[indices], height)
+
+        if 'max_speed' in self.values:
+            xmomentum = domain.quantities['xmomentum'].centroid_values[indices]
+            ymomentum = domain.quantities['ymomentum'].centroid_values[indices]
+            wet = height > domain.minimum_allowed_height
+            speed = np.zeros(len(indices))
+            speed[wet] = np.hypot(xmomentum[wet], ymomentum[wet]) / height[wet]
+            max_speed = self.values['max_speed']
+            max_speed[indices] = np.maximum(max_speed[indices], speed)
+
+        if 'arrival_time' in self.values:
+            arrival_time = self.values['arrival_time']
+            arrived = indices[np.isnan(arrival_time[indices]) &
+                              (height > self.arrival_depth)]
+            arrival_time[arrived] = now
+
+        if 'cumulative_deposition' in self.values:
+            # the bed only moves in the set (sediment transport) or where
+            # it is written, so each change is counted at the step it is made
+            elevation = domain.quantities['elevation'].centroid_values[indices]
+            change = elevation - self._last_elevation[indices]
+            self.values['cumulative_deposition'][indices] += np.maximum(change, 0.)
+            self._last_elevation[indices] = elevation
+
+
+    def results(self):
+        """
+        Recorded arrays, keyed on name:
+        - gauge_names, gauge_x, gauge_y, gauge_time and
+          gauge_<quantity> (times x gauges)
+        - region_time and <region>_triangles and <region>_<quantity>
+          (times x triangles in the region) for each region
+        - each reduction (one value per triangle)
+        """
+
+        results = dict(self.values)
+
+        if self.gauge_quantities:
+            results['gauge_names'] = np.array(self.gauge_names)
+            results['gauge_x'] = self.gauge_xy[:, 0]
+            results['gauge_y'] = self.gauge_xy[:, 1]
+            results['gauge_time'] = np.array(self.gauge_times)
+            for name, values in self.gauge_values.items():
+                results['gauge_' + name] = np.array(values)
+
+        if self.region_quantities:
+            results['region_time'] = np.array(self.region_times)
+            for region in self.region_names:
+                results[region + '_triangles'] = self.region_triangles[region]
+            for (region, name), values in self.region_values.items():
+                results[region + '_' + name] = np.array(values)
+
+        return results
+
+
+    def write(self, filename_root):
+        """Write the npz file and, if there are gauges, the gauge CSV file."""
+
+        results = self.results()
+        np.savez_compressed(filename_root + '_monitors.npz', **results)
+
+        if not self.gauge_quantities:
+            return
+
+        header = ['time'] + ['%s_%s' % (gauge, name)
+                             for name in self.gauge_quantities
+                             for gauge in self.gauge_names]
+        columns = [results['gauge_time'][:, None]] + [
+            results['gauge_' + name] for name in self.gauge_quantities]
+
+        np.savetxt(filename_root + '_gauges.csv', np.hstack(columns),
+                   delimiter=',', header=','.join(header), comments='',
+                   fmt='%.10g')
+
+
+    def parallel_safe(self):
+        return False
+
+
+    def statistics(self):
+        return 'BMI monitors: %d gauges, %d regions, reductions %s' % (
+            len(self.gauge_names), len(self.region_names), self.reductions)
+
+
+    def timestepping_statistics(self):
+        return 'BMI monitors at time %g' % self.domain.get_time()
+
+
+def _next_time(last, interval, now):
+    """Next sample time after now, on the grid last + k * interval."""
+
+    if interval <= 0.:
+        return now
+
+    return last + interval * (np.floor((now - last) / interval) + 1)
+
@@ -0,0 +1,489 @@
+#! /usr/bin/env python
+"""
+Output of model snapshots outside the stepping loop.
+
+A sink knows what to capture from the domain and how to write it:
+- capture(domain) returns the arrays of one snapshot
+- write(time, arrays) appends the snapshot to the output file
+- close() finishes the file
+
+Sinks:
+- SWWSink appends to the SWW file that anuga created for the domain;
+  with an active set it only recomputes the vertex values of the
+  triangles that were active or written since the last snapshot
+- NetCDF4Sink writes centroid values to a compressed, chunked NetCDF4 file
+
+Writers drive a sink from the stepping loop. DirectWriter writes each
+snapshot right away. BackgroundWriter copies it into a preallocated ring
+buffer and lets a background thread hand it to the sink, so the stepping
+loop only pays for the copy.
+"""
+
+import sys
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import numpy as np
+import scipy.sparse
+
+
+class DirectWriter(object):
+    """
+    Write snapshots to a sink from the stepping loop.
+
+    Parameters
+    ----------
+    sink : object
+        Output sink (see module docstring).
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+
+
+    def store_timestep(self, domain):
+        """Write the current state of the domain."""
+        self.sink.write(domain.get_time(), self.sink.capture(domain))
+
+
+    def flush(self):
+        pass
+
+
+    def close(self):
+        self.sink.close()
+
+
+class BackgroundWriter(object):
+    """
+    Write snapshots to a sink from a background thread.
+
+    Memory is bounded by the n_slots snapshots of the ring buffer. When all
+    of them are waiting to be written, submit blocks until the writer
+    thread frees one (backpressure).
+
+    Parameters
+    ----------
+    sink : object
+        Output sink (see module docstring).
+    n_slots : int, optional
+        Number of snapshots in the ring buffer.
+    """
+
+    def __init__(self, sink, n_slots=4):
+
+        assert n_slots >= 1, "The output buffer needs at least one slot."
+
+        self.sink = sink
+        self.n_slots = int(n_slots)
+
+        self._slots = None
+        self._free = queue.Queue()
+        self._pending = queue.Queue()
+        self._error = None
+
+        for slot in range(self.n_slots):
+            self._free.put(slot)
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def store_timestep(self, domain):
+        """Capture the current state of the domain and queue it for writing."""
+        self.submit(domain.get_time(), self.sink.capture(domain))
+
+
+    def submit(self, time, arrays):
+        """
+        Queue a snapshot for writing.
+
+        Parameters
+        ----------
+        time : float
+            Model time of the snapshot.
+        arrays : dict
+            Arrays of the snapshot. They are copied, so the caller can
+            reuse them as soon as submit returns.
+        """
+
+        self._raise_error()
+
+        if self._slots is None:
+            self._slots = [dict((name, np.empty_like(value))
+                                for name, value in arrays.items())
+                           for _ in range(self.n_slots)]
+
+        slot = self._free.get()
+
+        for name, value in arrays.items():
+            np.copyto(self._slots[slot][name], value)
+
+        self._pending.put((slot, time))
+
+
+    def flush(self):
+        """Wait until every queued snapshot is written."""
+
+        self._pending.join()
+        self._raise_error()
+
+
+    def close(self):
+        """Write every queued snapshot, stop the thread and close the sink."""
+
+        self._pending.put(None)
+        self._thread.join()
+
+        self.sink.close()
+        self._raise_error()
+
+
+    def _run(self):
+
+        while True:
+
+            item = self._pending.get()
+
+            if item is None:
+                self._pending.task_done()
+                break
+
+            slot, time = item
+
+            try:
+                if self._error is None:
+                    self.sink.write(time, self._slots[slot])
+            except Exception:
+                self._error = sys.exc_info()
+            finally:
+                self._free.put(slot)
+                self._pending.task_done()
+
+
+    def _raise_error(self):
+
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError('Background output writer failed: %s: %s' %
+                               (error[0].__name__, error[1]))
+
+
+class SWWSink(object):
+    """
+    Append snapshots to the SWW file that anuga created for the domain.
+
+    Captures the same quantities as anuga's SWW_file.store_timestep
+    (vertex values of the dynamic quantities, with no water shallower
+    than minimum_storable_height, and the centroid values it stores) and
+    writes them with its Write_sww writer.
+
+    With an active set, the vertex values of a snapshot are those of the
+    last one, recomputed on the triangles that were in the set or were
+    written since (and, for smoothed values, on their nodes). This
+    includes the triangles that left the set since the last snapshot, so
+    a triangle that dries is written dry. The other triangles are dry, so
+    they only differ by water shallower than the wet depth.
+
+    Parameters
+    ----------
+    domain : anuga.Domain
+        Domain whose storage was initialized (domain.writer exists).
+    active_set : ActiveSet, optional
+        Wet/dry active set of the domain (see anuga_bmi.active).
+    """
+
+    def __init__(self, domain, active_set=None):
+
+        self._sww = domain.writer
+        self.filename = self._sww.filename
+        self.precision = self._sww.precision
+        self.minimum_storable_height = self._sww.minimum_storable_height
+        self.names = list(self._sww.writer.dynamic_quantities)
+
+        self.centroid_names = list(getattr(self._sww.writer,
+                                           'dynamic_c_quantities', None) or [])
+        if not self.centroid_names and getattr(self._sww, 'store_centroids', False):
+            self.centroid_names = [name + '_c' for name in self.names]
+
+        # SWW files store times relative to the start time of the domain
+        self._starttime = domain.get_time() - domain.get_relative_time()
+
+        # the elevation is needed to mask out shallow water
+        self._vertex_names = list(self.names)
+        if 'stage' in self.names and 'elevation' not in self.names:
+            self._vertex_names.append('elevation')
+
+        self.active_set = active_set
+        self._vertex_values = None
+
+        if active_set is not None:
+            self._watch = active_set.watch()
+            self._triangles = domain.get_triangles()
+            self._averages = _node_averages(domain)
+
+
+    def capture(self, domain):
+
+        if self._vertex_values is None:
+            vertex_values = self._capture_all(domain)
+        else:
+            vertex_values = self._capture_active(domain)
+
+        arrays = dict((name, vertex_values[name].astype(self.precision))
+                      for name in self.names)
+
+        if 'stage' in self.names:
+            elevation = vertex_values['elevation']
+            dry = (vertex_values['stage'] - elevation <
+                   self.minimum_storable_height)
+            arrays['stage'][dry] = elevation[dry]
+            for name in ['xmomentum', 'ymomentum']:
+                if name in arrays:
+                    arrays[name][dry] = 0.
+
+        for name in self.centroid_names:
+            arrays[name] = domain.quantities[name[:-2]].centroid_values
+
+        return arrays
+
+
+    def _capture_all(self, domain):
+
+        vertex_values = {}
+
+        for name in self._vertex_names:
+            quantity = domain.quantities[name]
+            vertex_values[name], _ = quantity.get_vertex_values(xy=False)
+
+        if self.active_set is not None:
+            self.active_set.visited(self._watch)
+            self._vertex_values = vertex_values
+
+        return vertex_values
+
+
+    def _capture_active(self, domain):
+
+        indices = self.active_set.visited(self._watch)
+        self.active_set.record('output', len(indices))
+
+        if self._averages is not None:
+            nodes = np.unique(self._triangles[indices])
+            nodes = nodes[nodes < self._averages.shape[0]]
+            averages = self._averages[nodes]
+
+        for name in self._vertex_names:
+            quantity = domain.quantities[name]
+            values = self._vertex_values[name]
+            if self._averages is None:
+                values.reshape(-1, 3)[indices] = quantity.vertex_values[indices]
+            elif self._averages.shape[1] == len(quantity.centroid_values):
+                values[nodes] = averages.dot(quantity.centroid_values)
+            else:
+                values[nodes] = averages.dot(quantity.vertex_values.ravel())
+
+        return self._vertex_values
+
+
+    def write(self, time, arrays):
+
+        from anuga.config import netcdf_mode_a
+        from anuga.file.netcdf import NetCDFFile
+
+        fid = NetCDFFile(self.filename, netcdf_mode_a)
+
+        try:
+            slice_index = self._sww.writer.store_quantities(
+                fid, time=time - self._starttime, sww_precision=self.precision,
+                **dict((name, arrays[name]) for name in self.names))
+
+            if self.centroid_names:
+                self._sww.writer.store_quantities_centroid(
+                    fid, slice_index=slice_index, sww_precision=self.precision,
+                    **dict((name, arrays[name]) for name in self.centroid_names))
+        finally:
+            fid.close()
+
+
+    def close(self):
+        pass
+
+
+class NetCDF4Sink(object):
+    """
+    Write the centroid values of the stored quantities to a compressed,
+    chunked NetCDF4 file.
+
+    Quantities stored at level 1 are written once, with the first
+    snapshot, as (cell) variables. Quantities stored at level 2 are
+    (time, cell) variables whose chunks are long in time and narrow in
+    space, so reading the time series of one cell touches few chunks.
+
+    Parameters
+    ----------
+    filename : str
+        Output file.
+    domain : anuga.Domain
+        Domain to write.
+    stored_quantities : dict
+        Storage level (1 or 2) of each quantity, as for SWW files.
+    complevel : int, optional
+        zlib compression level (0 to 9). 0 disables compression.
+    shuffle : bool, optional
+        Apply the HDF5 shuffle filter before compression.
+    precision : str, optional
+        Floating point type of the stored values.
+    chunks : dict, optional
+        (time, cell) chunk shape of each level 2 quantity. Defaults to
+        default_chunks.
+    least_significant_digit : dict, optional
+        Number of decimal digits to keep for each quantity (lossy
+        quantization that makes compression far more effective).
+    default_chunks : tuple, optional
+        (time, cell) chunk shape of the quantities not in chunks.
+    """
+
+    def __init__(self, filename, domain, stored_quantities, complevel=4,
+                 shuffle=True, precision='float32', chunks=None,
+                 least_significant_digit=None, default_chunks=(64, 1024)):
+
+        import netCDF4
+
+        chunks = chunks or {}
+        least_significant_digit = least_significant_digit or {}
+
+        self.filename = filename
+        self.static_names = sorted(name for name, level
+                                   in stored_quantities.items() if level == 1)
+        self.dynamic_names = sorted(name for name, level
+                                    in stored_quantities.items() if level == 2)
+
+        self._index = 0
+        self._static_written = False
+
+        n_cells = len(domain)
+        geo_reference = domain.geo_reference
+
+        self._dataset = dataset = netCDF4.Dataset(filename, 'w',
+                                                  format='NETCDF4')
+
+        dataset.xllcorner = geo_reference.get_xllcorner()
+        dataset.yllcorner = geo_reference.get_yllcorner()
+        dataset.zone = geo_reference.get_zone()
+
+        dataset.createDimension('time', None)
+        dataset.createDimension('cell', n_cells)
+        dataset.createDimension('node', len(domain.get_nodes()))
+        dataset.createDimension('vertex', 3)
+
+        self._time = dataset.createVariable('time', 'f8', ('time',))
+        self._time.units = 's'
+
+        # mesh, for post-processing
+        nodes = domain.get_nodes()
+        centroids = domain.centroid_coordinates
+        for name, values, dimensions in [('x', centroids[:, 0], ('cell',)),
+                                         ('y', centroids[:, 1], ('cell',)),
+                                         ('node_x', nodes[:, 0], ('node',)),
+                                         ('node_y', nodes[:, 1], ('node',))]:
+            variable = dataset.createVariable(name, 'f8', dimensions,
+                                              zlib=complevel > 0,
+                                              complevel=max(complevel, 1))
+            variable[:] = values
+
+        triangles = dataset.createVariable('triangles', 'i4', ('cell', 'vertex'),
+                                           zlib=complevel > 0,
+                                           complevel=max(complevel, 1))
+        triangles[:] = domain.get_triangles()
+
+        self._variables = {}
+
+        for name in self.static_names + self.dynamic_names:
+
+            options = {'zlib': complevel > 0,
+                       'complevel': max(complevel, 1),
+                       'shuffle': shuffle}
+
+            if name in least_significant_digit:
+                options['least_significant_digit'] = least_significant_digit[name]
+
+            if name in self.dynamic_names:
+                chunk_time, chunk_cells = chunks.get(name, default_chunks)
+                chunk_cells = min(int(chunk_cells), n_cells)
+                variable = dataset.createVariable(
+                    name, precision, ('time', 'cell'),
+                    chunksizes=(int(chunk_time), chunk_cells), **options)
+
+                # keep a full row of chunks in memory so that each chunk is
+                # compressed once, when it is complete
+                row_bytes = (int(chunk_time) * n_cells *
+                             np.dtype(precision).itemsize)
+                variable.set_var_chunk_cache(size=max(row_bytes, 1 << 20))
+            else:
+                variable = dataset.createVariable(name, precision, ('cell',),
+                                                  **options)
+
+            self._variables[name] = variable
+
+
+    def capture(self, domain):
+
+        names = self.dynamic_names
+        if not self._static_written:
+            names = names + self.static_names
+
+        return dict((name, domain.quantities[name].centroid_values)
+                    for name in names)
+
+
+    def write(self, time, arrays):
+
+        if not self._static_written:
+            for name in self.static_names:
+                self._variables[name][:] = arrays[name]
+            self._static_written = True
+
+        self._time[self._index] = time
+        for name in self.dynamic_names:
+            self._variables[name][self._index, :] = arrays[name]
+
+        self._index += 1
+
+
+    def close(self):
+        self._dataset.close()
+
+
+def _node_averages(domain):
+    """
+    Sparse matrix that averages the values of the triangles around each
+    node, as get_vertex_values does for smoothed values (None when the
+    domain is not smoothed).
+    """
+
+    if not getattr(domain, 'smooth', False):
+        return None
+
+    triangles = domain.get_triangles()
+    n_nodes = domain.number_of_full_nodes
+    nodes = triangles.ravel()
+
+    if domain.get_using_centroid_averaging():
+        columns = np.repeat(np.arange(len(triangles)), 3)
+        n_columns = len(triangles)
+    else:
+        columns = np.arange(nodes.size)
+        n_columns = nodes.size
+
+    counts = np.bincount(nodes)
+    full = nodes < n_nodes
+
+    return scipy.sparse.csr_matrix(
+        (1. / counts[nodes[full]], (nodes[full], columns[full])),
+        shape=(n_nodes, n_columns))
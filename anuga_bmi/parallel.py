@@ -0,0 +1,212 @@
+#! /usr/bin/env python
+"""
+Gather and scatter of centroid values across a distributed ANUGA domain.
+
+In parallel mode every MPI process runs the same driver and holds one
+BmiAnuga. The mesh is partitioned with anuga.distribute, and the BMI
+keeps exposing the full, global centroid arrays:
+- get_value and get_value_ref gather the full triangles of every
+  process into a global array on every process
+- set_value and set_value_at_indices take global arrays and indices,
+  which must be the same on every process, and each process picks out
+  its own triangles (ghosts included) without any communication
+"""
+
+import numpy as np
+
+import anuga
+
+from anuga_bmi.indexing import IndexPlan
+from anuga_bmi.quantities import QuantityViews
+
+
+class DomainDecomposition(object):
+    """
+    Mapping between the triangles of a distributed domain and the global
+    mesh.
+
+    Parameters
+    ----------
+    domain : anuga Parallel_domain
+        Domain returned by anuga.distribute.
+    """
+
+    def __init__(self, domain):
+
+        self.myid = anuga.myid
+        self.numprocs = anuga.numprocs
+
+        # global id of every local triangle, ghosts included
+        self.global_ids = np.asarray(domain.tri_l2g, dtype=int)
+
+        # local triangles owned by this process
+        self.full = np.flatnonzero(np.asarray(domain.tri_full_flag) == 1)
+
+        self.number_of_global_triangles = int(domain.number_of_global_triangles)
+
+        # process 0 keeps the global ids owned by every process
+        full_global_ids = self.global_ids[self.full]
+
+        if self.myid == 0:
+            self._owned = [full_global_ids]
+            for p in range(1, self.numprocs):
+                self._owned.append(anuga.receive(p))
+        else:
+            anuga.send(full_global_ids, 0)
+            self._owned = None
+
+
+    def gather(self, local, out=None):
+        """
+        Assemble the global array of a centroid quantity on every process.
+
+        Parameters
+        ----------
+        local : ndarray
+            Centroid values of the local triangles.
+        out : ndarray, optional
+            Global array to fill.
+
+        Returns
+        -------
+        ndarray
+            Global centroid values.
+        """
+
+        if out is None:
+            out = np.empty(self.number_of_global_triangles, dtype=local.dtype)
+
+        if self.myid == 0:
+            out[self._owned[0]] = local[self.full]
+            for p in range(1, self.numprocs):
+                out[self._owned[p]] = anuga.receive(p)
+            for p in range(1, self.numprocs):
+                anuga.send(out, p)
+        else:
+            anuga.send(np.ascontiguousarray(local[self.full]), 0)
+            out[:] = anuga.receive(0)
+
+        return out
+
+
+    def sum(self, value):
+        """Sum of a number over all processes, on every process."""
+
+        if self.myid == 0:
+            total = np.array([value], dtype=float)
+            for p in range(1, self.numprocs):
+                total += anuga.receive(p)
+            for p in range(1, self.numprocs):
+                anuga.send(total, p)
+        else:
+            anuga.send(np.array([value], dtype=float), 0)
+            total = anuga.receive(0)
+
+        return total[0]
+
+
+    def localize(self, src, indices=None):
+        """
+        Pick the values of the local triangles out of global values.
+
+        Parameters
+        ----------
+        src : array_like or float
+            Global values, or values at the global indices.
+        indices : array_like, optional
+            Global triangle indices of src. A repeated index takes its
+            last value.
+
+        Returns
+        -------
+        tuple of (ndarray or float, ndarray or None)
+            Local values and the local indices they go to (None for all
+            local triangles).
+        """
+
+        if indices is None:
+            if np.ndim(src) == 0:
+                return src, None
+            return np.asarray(src)[self.global_ids], None
+
+        indices = np.asarray(indices, dtype=int).ravel()
+        order = np.argsort(indices, kind='mergesort')
+        sorted_indices = indices[order]
+
+        # the last value of a repeated index wins, as in IndexPlan: the
+        # sort is stable, so that is the rightmost match
+        position = np.searchsorted(sorted_indices, self.global_ids,
+                                   side='right') - 1
+        position[position < 0] = 0
+        local = np.flatnonzero(sorted_indices[position] == self.global_ids)
+
+        if np.ndim(src) == 0:
+            return src, local
+
+        return np.asarray(src).ravel()[order[position[local]]], local
+
+
+class ParallelQuantityViews(QuantityViews):
+    """QuantityViews that exposes global arrays of a distributed domain."""
+
+    def __init__(self, solver, decomposition):
+
+        super(ParallelQuantityViews, self).__init__(solver)
+
+        self.decomposition = decomposition
+        self._buffers = {}
+
+
+    def ref(self, var_name):
+        """
+        Global values of a BMI variable.
+
+        The values are gathered into a buffer that is reused between calls.
+        Writing into it does not change the model; use write instead.
+        """
+
+        local = self.local_ref(var_name)
+
+        if var_name not in self._buffers:
+            self._buffers[var_name] = np.empty(
+                self.decomposition.number_of_global_triangles, dtype=local.dtype)
+
+        return self.decomposition.gather(local, out=self._buffers[var_name])
+
+
+    def write_many(self, values, indices=None):
+        """
+        Write global values of BMI variables (see QuantityViews.write_many).
+        """
+
+        if not values:
+            return
+
+        if isinstance(indices, IndexPlan):
+            values = dict((var_name, indices.unique_values(src))
+                          for var_name, src in values.items())
+            indices = indices.indices
+
+        local = {}
+        for var_name, src in values.items():
+            local[var_name], local_indices = self.decomposition.localize(src,
+                                                                         indices)
+
+        super(ParallelQuantityViews, self).write_many(local, local_indices)
+
+
+    def add_elevation(self, delta, indices=None, change=None):
+        """
+        Shift the bed at global indices (see QuantityViews.add_elevation).
+        """
+
+        if indices is not None:
+            if not isinstance(indices, IndexPlan):
+                indices = IndexPlan(indices,
+                                    self.decomposition.number_of_global_triangles)
+            delta = indices.unique_sums(delta)
+            indices = indices.indices
+
+        delta, indices = self.decomposition.localize(delta, indices)
+
+        super(ParallelQuantityViews, self).add_elevation(delta, indices, change)
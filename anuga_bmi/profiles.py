@@ -0,0 +1,185 @@
+#! /usr/bin/env python
+"""
+Analytic elevation profiles for rectangular domains.
+
+A profile is a function z = f(x, y) of arrays of point coordinates that
+only uses whole-array operations. Profiles are looked up by name from the
+'elevation_profile' parameter; new ones can be added with:
+
+    from anuga_bmi.profiles import register_profile
+
+    @register_profile('my profile')
+    def my_profile(x, y):
+        return -x / 20.
+"""
+
+import numpy as np
+
+
+PROFILES = {}
+
+
+def register_profile(name, function=None):
+    """
+    Register an elevation profile under a name.
+
+    Can be used as a function, register_profile(name, function), or as a
+    decorator, @register_profile(name).
+    """
+
+    def register(function):
+        PROFILES[name] = function
+        return function
+
+    if function is None:
+        return register
+    else:
+        return register(function)
+
+
+def get_profile(name):
+    """Elevation profile registered under name."""
+
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError("Elevation profile '%s' is not recognized. "
+                         "Valid profiles are %s." % (name, sorted(PROFILES)))
+
+
+def _first_at_or_after(x, x0):
+    """Smallest coordinate >= x0."""
+    return np.min(x[x >= x0])
+
+
+def _first_after(x, x0):
+    """Smallest coordinate > x0."""
+    return np.min(x[x > x0])
+
+
+def _midpoint_line(x):
+    """Coordinate of the first grid line just past the middle of x."""
+
+    xmax = np.max(x)
+    minx = np.floor(xmax / 2)
+    maxx = np.ceil(xmax / 2 + 1)
+
+    return np.min(x[(x >= minx) & (x <= maxx)])
+
+
+def _step(x, fraction):
+    """Ramp with a step of fraction times its relief past the middle."""
+
+    z = -x / 10.
+    stepz = fraction * (np.max(z) - np.min(z))
+    z[x > _midpoint_line(x)] += stepz
+
+    return z
+
+
+def _cylinder(x, y, fraction):
+    """Ramp with a flat-topped cylinder in the middle."""
+
+    z = -x / 10.
+    radius = fraction * (np.max(y) - np.min(y))
+
+    inside = ((x - _midpoint_line(x))**2 +
+              (y - _midpoint_line(y))**2 < radius**2)
+    z[inside] = np.max(z)
+
+    return z
+
+
+def _dyke(x, y, x0, dist, side):
+    """Mask of a one-cell-wide dyke starting at x0 on one side of the domain."""
+
+    x1 = _first_at_or_after(x, x0)
+    x2 = _first_after(x, x1)
+
+    if side == 'bottom':
+        across = y < dist
+    else:
+        across = y > np.max(y) - dist
+
+    return (x >= x1) & (x <= x2) & across
+
+
+@register_profile('shallow linear ramp')
+def shallow_linear_ramp(x, y):
+    return -x / 5.
+
+
+@register_profile('steep linear ramp')
+def steep_linear_ramp(x, y):
+    return -x / 10.
+
+
+@register_profile('tall step down')
+def tall_step_down(x, y):
+    return _step(x, -0.6)
+
+
+@register_profile('short step down')
+def short_step_down(x, y):
+    return _step(x, -0.2)
+
+
+@register_profile('step up')
+def step_up(x, y):
+    return _step(x, 0.3)
+
+
+@register_profile('dam')
+def dam(x, y):
+
+    z = -x / 10.
+    xmax = np.max(x)
+    minx = np.floor(xmax / 2)
+    maxx = np.ceil(xmax / 2)
+
+    if np.count_nonzero((x >= minx) & (x <= maxx)) < 5:
+        maxx = np.ceil(xmax / 2 + 1)
+
+    z[(x >= minx) & (x <= maxx)] = 0.9 * np.max(z)
+
+    return z
+
+
+@register_profile('thin cylinder')
+def thin_cylinder(x, y):
+    return _cylinder(x, y, 0.1)
+
+
+@register_profile('thick cylinder')
+def thick_cylinder(x, y):
+    return _cylinder(x, y, 0.4)
+
+
+@register_profile('wing dams')
+def wing_dams(x, y):
+
+    z = -x / 10.
+    dist = 0.2 * (np.max(y) - np.min(y))
+    x0 = np.floor(np.max(x) / 2)
+
+    z[_dyke(x, y, x0, dist, 'bottom') | _dyke(x, y, x0, dist, 'top')] += 1
+
+    return z
+
+
+@register_profile('alternating dykes')
+def alternating_dykes(x, y):
+
+    z = -x / 10.
+    xmax = np.max(x)
+    dist = 0.3 * (np.max(y) - np.min(y))
+
+    z[_dyke(x, y, np.floor(xmax / 4), dist, 'bottom')] += 1
+    z[_dyke(x, y, np.floor(xmax / 2), dist, 'top')] += 1
+    z[_dyke(x, y, np.floor(3 * xmax / 4), dist, 'bottom')] += 1
+
+    return z
+
+
+# spelling used by the WMT parameter choices
+register_profile('alternating dikes', alternating_dykes)
@@ -0,0 +1,242 @@
+#! /usr/bin/env python
+"""Live views of the ANUGA domain quantities exposed through the BMI."""
+
+import numpy as np
+
+from anuga_bmi.indexing import IndexPlan
+
+
+# ANUGA quantity behind each BMI variable
+QUANTITY_NAMES = {
+    'manning_n_parameter': 'friction',
+    'land_surface__elevation': 'elevation',
+    'land_surface_water_surface__elevation': 'stage',
+    'land_surface_water__depth': 'height',
+    'land_surface_water_flow__x_component_of_momentum': 'xmomentum',
+    'land_surface_water_flow__y_component_of_momentum': 'ymomentum',
+    'land_surface_water_flow__shear_stress': 'shear_stress',
+    'land_surface_water_sediment_suspended__volume_concentration': 'concentration',
+    'land_vegetation__stem_spacing': 'veg_spacing',
+    'land_vegetation__stem_diameter': 'veg_diameter',
+}
+
+
+class QuantityViews(object):
+    """
+    Zero-copy access to the centroid values of the domain quantities.
+
+    References are looked up in domain.quantities on every call, so they
+    stay valid when ANUGA replaces a quantity or its arrays. Writes go
+    straight into the centroid values and are followed by the smallest
+    update that keeps the domain consistent:
+    - stage and height are kept in step with the elevation
+      (height = stage - elevation, or stage = elevation + height when
+      the depth is written)
+    - vertex and edge values of the written quantities are extrapolated
+      (first order) from the centroids, only at the written indices
+    """
+
+    def __init__(self, solver):
+
+        self._solver = solver
+
+
+    @property
+    def domain(self):
+        return self._solver.domain
+
+
+    def quantity(self, var_name):
+        """ANUGA quantity behind a BMI variable."""
+        return self.domain.quantities[QUANTITY_NAMES[var_name]]
+
+
+    def ref(self, var_name):
+        """Reference to the values of a BMI variable."""
+        return self.local_ref(var_name)
+
+
+    def local_ref(self, var_name):
+        """Reference to the values of a BMI variable on this domain."""
+
+        if var_name in QUANTITY_NAMES:
+            return self.domain.quantities[QUANTITY_NAMES[var_name]].centroid_values
+        else:
+            return getattr(self._solver, var_name)
+
+
+    def write(self, var_name, src, indices=None):
+        """
+        Write values of a BMI variable in place and update the quantities
+        that depend on it.
+
+        Parameters
+        ----------
+        var_name : str
+            Name of variable as CSDMS Standard Name.
+        src : array_like or float
+            New values.
+        indices : array_like or IndexPlan, optional
+            Centroid indices to write to. All centroids by default.
+        """
+
+        self.write_many({var_name: src}, indices)
+
+
+    def write_many(self, values, indices=None):
+        """
+        Write values of several BMI variables in place, then update the
+        quantities that depend on them once for the whole group.
+
+        Parameters
+        ----------
+        values : dict
+            New values (array_like or float), keyed on variable name.
+        indices : array_like or IndexPlan, optional
+            Centroid indices to write to, the same for every variable.
+            All centroids by default.
+        """
+
+        for var_name, src in values.items():
+
+            dst = self.local_ref(var_name)
+
+            if indices is None:
+                np.copyto(dst, src, casting='unsafe')
+            elif isinstance(indices, IndexPlan):
+                indices.scatter(dst, src)
+            else:
+                dst[indices] = src
+
+        if isinstance(indices, IndexPlan):
+            indices = indices.selector
+
+        self.sync(values.keys(), indices)
+        self._touch(indices)
+
+
+    def add_elevation(self, delta, indices=None, change=None):
+        """
+        Shift the bed by delta and the water surface with it, so that the
+        water depth is unchanged.
+
+        The centroid, vertex and edge values of elevation and stage are
+        shifted at the changed triangles only, which keeps the slopes
+        within each triangle.
+
+        Parameters
+        ----------
+        delta : array_like or float
+            Elevation change of each indexed centroid, or of all of them.
+        indices : array_like or IndexPlan, optional
+            Centroid indices to change. Repeated indices get the sum of
+            their changes (k * delta for a scalar delta and an index
+            listed k times). All centroids by default.
+        change : ndarray, optional
+            Running sum of the changes, updated in place.
+        """
+
+        if indices is None:
+            selector = slice(None)
+        else:
+            if not isinstance(indices, IndexPlan):
+                indices = IndexPlan(indices, len(self.domain))
+            delta = indices.unique_sums(delta)
+            selector = indices.selector
+
+        if np.ndim(delta) == 0:
+            corner_delta = delta
+        else:
+            delta = np.asarray(delta, dtype=float).ravel()
+            corner_delta = delta[:, np.newaxis]
+
+        quantities = self.domain.quantities
+
+        for name in ['elevation', 'stage']:
+            quantity = quantities[name]
+            quantity.centroid_values[selector] += delta
+            quantity.vertex_values[selector] += corner_delta
+            quantity.edge_values[selector] += corner_delta
+
+        if change is not None:
+            change[selector] += delta
+
+        self._touch(selector)
+
+
+    def _touch(self, indices):
+        """Tell the active set, if any, which triangles were written."""
+
+        if self._solver.active_set is not None:
+            self._solver.active_set.touch(indices)
+
+
+    def sync(self, var_names, indices=None):
+        """
+        Update the quantities that depend on a group of written variables.
+
+        Parameters
+        ----------
+        var_names : iterable of str
+            Names of the variables that were written.
+        indices : array_like or slice, optional
+            Centroid indices that were written. All centroids by default.
+        """
+
+        written = set(QUANTITY_NAMES[name] for name in var_names
+                      if name in QUANTITY_NAMES)
+
+        if not written:
+            return
+
+        quantities = self.domain.quantities
+
+        if written & set(['stage', 'height', 'elevation']):
+
+            elevation = quantities['elevation'].centroid_values
+            stage = quantities['stage'].centroid_values
+            height = quantities['height'].centroid_values
+
+            if 'height' in written and 'stage' not in written:
+                _combine(np.add, elevation, height, stage, indices)
+                written.add('stage')
+            else:
+                _combine(np.subtract, stage, elevation, height, indices)
+                written.add('height')
+
+        for name in written:
+            extrapolate_first_order(quantities[name], indices)
+
+
+def _combine(ufunc, a, b, out, indices):
+    """out = ufunc(a, b), in place, on all or some centroids."""
+
+    if indices is None:
+        ufunc(a, b, out=out)
+    else:
+        out[indices] = ufunc(a[indices], b[indices])
+
+
+def extrapolate_first_order(quantity, indices=None):
+    """
+    Set vertex and edge values of a quantity to its centroid values.
+
+    Parameters
+    ----------
+    quantity : anuga.Quantity
+        Quantity to update.
+    indices : array_like, optional
+        Triangles to update. All triangles by default.
+    """
+
+    centroids = quantity.centroid_values
+
+    if indices is None:
+        for i in range(3):
+            quantity.vertex_values[:, i] = centroids
+            quantity.edge_values[:, i] = centroids
+    else:
+        values = centroids[indices]
+        for i in range(3):
+            quantity.vertex_values[indices, i] = values
+            quantity.edge_values[indices, i] = values
@@ -0,0 +1,323 @@
+#! /usr/bin/env python
+"""
+Raster fields mapped onto the triangles of the mesh.
+
+A raster is mapped once, through a sparse matrix of area weights: entry
+(k, c) is the fraction of the area of triangle k that lies in raster cell
+c. The value of a raster on the triangles is then one sparse
+matrix-vector product, W.dot(values.ravel()).
+
+Rasters are ESRI ASCII grids (.asc, one frame) or NetCDF files (.nc) with
+1D x and y cell-centre coordinates, an optional time variable, and a
+(time, y, x) or (y, x) data variable. NetCDF frames are read one at a
+time, when they are needed, so long forcing series never sit in memory.
+"""
+
+import numpy as np
+import scipy.sparse
+
+
+# triangles mapped per chunk, to bound the memory of the sample points
+_CHUNK_SIZE = 100000
+
+
+class RasterGrid(object):
+    """
+    Geometry of a raster, from the coordinates of its cell centres.
+
+    Parameters
+    ----------
+    x : array_like
+        x coordinates of the columns (increasing or decreasing, regular).
+    y : array_like
+        y coordinates of the rows (increasing or decreasing, regular).
+    """
+
+    def __init__(self, x, y):
+
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.shape = (len(self.y), len(self.x))
+
+        self._dx = self.x[1] - self.x[0] if len(self.x) > 1 else 1.
+        self._dy = self.y[1] - self.y[0] if len(self.y) > 1 else 1.
+
+
+    @property
+    def size(self):
+        return self.shape[0] * self.shape[1]
+
+
+    @property
+    def key(self):
+        """Geometry of the raster, equal for rasters on the same cells."""
+        return (self.shape, float(self.x[0]), float(self.y[0]),
+                float(self._dx), float(self._dy))
+
+
+    def cell_index(self, points):
+        """
+        Flat index of the cell that contains each point (-1 outside the
+        raster).
+        """
+
+        col = np.floor((points[:, 0] - self.x[0]) / self._dx + 0.5).astype(int)
+        row = np.floor((points[:, 1] - self.y[0]) / self._dy + 0.5).astype(int)
+
+        inside = ((col >= 0) & (col < self.shape[1]) &
+                  (row >= 0) & (row < self.shape[0]))
+
+        return np.where(inside, row * self.shape[1] + col, -1)
+
+
+def read_asc(filename):
+    """
+    Read an ESRI ASCII grid.
+
+    Returns
+    -------
+    tuple of (RasterGrid, ndarray)
+        Grid and (nrows, ncols) values, with nan for nodata.
+    """
+
+    header = {}
+    with open(filename, 'r') as file_obj:
+        for n_header, line in enumerate(file_obj):
+            # keys and values may be separated by any whitespace
+            fields = line.split()
+            try:
+                float(fields[0])
+                break
+            except ValueError:
+                header[fields[0].lower()] = float(fields[1])
+
+    values = np.loadtxt(filename, skiprows=n_header, ndmin=2)
+
+    ncols = int(header['ncols'])
+    nrows = int(header['nrows'])
+    cellsize = header['cellsize']
+
+    if 'xllcenter' in header:
+        x0 = header['xllcenter']
+        y0 = header['yllcenter']
+    else:
+        x0 = header['xllcorner'] + 0.5 * cellsize
+        y0 = header['yllcorner'] + 0.5 * cellsize
+
+    if 'nodata_value' in header:
+        values[values == header['nodata_value']] = np.nan
+
+    # the first row is the northernmost
+    grid = RasterGrid(x0 + cellsize * np.arange(ncols),
+                      y0 + cellsize * np.arange(nrows - 1, -1, -1))
+
+    return grid, values.reshape(nrows, ncols)
+
+
+def _sample_points(k):
+    """
+    Barycentric coordinates of the centroids of the k * k equal-area
+    sub-triangles of a triangle.
+    """
+
+    samples = []
+    for i in range(k):
+        for j in range(k - i):
+            samples.append(((i + 1. / 3) / k, (j + 1. / 3) / k))
+            if j < k - i - 1:
+                samples.append(((i + 2. / 3) / k, (j + 2. / 3) / k))
+
+    samples = np.array(samples)
+
+    return np.column_stack((1. - samples.sum(axis=1), samples))
+
+
+def area_weights(grid, nodes, triangles, samples_per_edge=4):
+    """
+    Sparse matrix of the fraction of each triangle in each raster cell.
+
+    The fractions are estimated from samples_per_edge**2 equal-area
+    sample points per triangle. Rows of triangles that are partly
+    outside the raster sum to less than one.
+
+    Parameters
+    ----------
+    grid : RasterGrid
+        Raster geometry.
+    nodes : ndarray
+        (N, 2) node coordinates, in the frame of the raster.
+    triangles : ndarray
+        (M, 3) node indices of the triangles.
+    samples_per_edge : int, optional
+        Resolution of the estimate.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        (M, number of raster cells) weights.
+    """
+
+    barycentric = _sample_points(int(samples_per_edge))
+    n_samples = len(barycentric)
+
+    rows = []
+    cols = []
+
+    for start in range(0, len(triangles), _CHUNK_SIZE):
+
+        corners = nodes[triangles[start:start + _CHUNK_SIZE]]
+
+        # (triangles, samples, 2)
+        points = np.einsum('sv,tvd->tsd', barycentric, corners)
+        cells = grid.cell_index(points.reshape(-1, 2))
+
+        inside = cells >= 0
+        rows.append(start + np.flatnonzero(inside) // n_samples)
+        cols.append(cells[inside])
+
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=int)
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=int)
+
+    weights = scipy.sparse.csr_matrix(
+        (np.full(len(rows), 1. / n_samples), (rows, cols)),
+        shape=(len(triangles), grid.size))
+    weights.sum_duplicates()
+
+    return weights
+
+
+class RasterSeries(object):
+    """
+    Raster frames over time, read lazily.
+
+    Frame i applies from times[i] until times[i + 1]; the last frame
+    applies from its time on.
+
+    Parameters
+    ----------
+    filename : str
+        ESRI ASCII (one frame at time 0) or NetCDF file.
+    variable : str, optional
+        NetCDF data variable. Defaults to the only variable with two or
+        three dimensions.
+    """
+
+    def __init__(self, filename, variable=None):
+
+        self.filename = filename
+        self._dataset = None
+
+        if filename.endswith('.nc'):
+
+            import netCDF4
+
+            self._dataset = dataset = netCDF4.Dataset(filename, 'r')
+
+            if not variable:
+                candidates = [name for name, var in dataset.variables.items()
+                              if var.ndim in (2, 3)]
+                if len(candidates) != 1:
+                    raise ValueError("Cannot tell the data variable of '%s' "
+                                     "from %s" % (filename, candidates))
+                variable = candidates[0]
+
+            self._variable = dataset.variables[variable]
+            self.grid = RasterGrid(dataset.variables['x'][:],
+                                   dataset.variables['y'][:])
+
+            if self._variable.ndim == 3:
+                self.times = np.asarray(dataset.variables['time'][:], dtype=float)
+            else:
+                self.times = np.zeros(1)
+
+            self._frame = None
+        else:
+            self.grid, frame = read_asc(filename)
+            self.times = np.zeros(1)
+            self._frame = frame
+
+
+    def __len__(self):
+        return len(self.times)
+
+
+    def frame_index(self, t):
+        """Index of the frame that applies at time t (-1 before the first)."""
+        return int(np.searchsorted(self.times, t, side='right')) - 1
+
+
+    def values(self, i):
+        """Values of frame i, flattened, with nan for nodata."""
+
+        if self._dataset is None:
+            values = self._frame
+        elif self._variable.ndim == 3:
+            values = self._variable[i]
+        else:
+            values = self._variable[:]
+
+        return np.ma.filled(np.ma.asarray(values, dtype=float), np.nan).ravel()
+
+
+    def frame(self, i):
+        """Values of frame i, flattened, with nan (nodata) set to zero."""
+
+        values = self.values(i)
+
+        return np.where(np.isfinite(values), values, 0.)
+
+
+    def close(self):
+        if self._dataset is not None:
+            self._dataset.close()
+            self._dataset = None
+
+
+class TriangleField(object):
+    """
+    Time-varying raster field on the triangles of a mesh.
+
+    The area weights are computed once. The field on the triangles is
+    updated with one sparse matrix-vector product when a new frame starts
+    to apply, and reused until then.
+
+    Parameters
+    ----------
+    series : RasterSeries
+        Raster frames.
+    nodes : ndarray
+        (N, 2) node coordinates, in the frame of the raster.
+    triangles : ndarray
+        (M, 3) node indices of the triangles.
+    scale : float, optional
+        Factor applied to the raster values (e.g. unit conversion).
+    samples_per_edge : int, optional
+        Resolution of the area weights.
+    """
+
+    def __init__(self, series, nodes, triangles, scale=1.,
+                 samples_per_edge=4):
+
+        self.series = series
+        self.scale = float(scale)
+        self.weights = area_weights(series.grid, nodes, triangles,
+                                    samples_per_edge)
+
+        self.values = np.zeros(len(triangles))
+        self._index = None
+
+
+    def at(self, t):
+        """Values on the triangles at time t (zero before the first frame)."""
+
+        i = self.series.frame_index(t)
+
+        if i != self._index:
+            self._index = i
+            if i < 0:
+                self.values[:] = 0.
+            else:
+                self.values[:] = self.weights.dot(self.series.frame(i))
+                self.values *= self.scale
+
+        return self.values
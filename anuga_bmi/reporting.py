@@ -0,0 +1,137 @@
+#! /usr/bin/env python
+"""Progress reporting and timestepping counters for the ANUGA solver."""
+
+import logging
+import time
+
+
+LEVELS = {'off': 0,
+          'summary': 1,
+          'verbose': 2}
+
+
+class ProgressReporter(object):
+    """
+    Collect timestepping counters and optionally report progress.
+
+    Counters are always kept in memory. Messages are only built when the
+    reporting level asks for them and the rate limit allows it, so the
+    default level ('off') costs a few additions per yield.
+
+    Levels:
+    - off: no messages
+    - summary: one line per update
+    - verbose: ANUGA's timestepping statistics at every yield
+
+    Messages go to callback(message, statistics) if a callback is set and
+    to the 'anuga_bmi' logger otherwise.
+    """
+
+    def __init__(self, level='off', interval=0., callback=None, logger=None):
+
+        self.set_level(level)
+        self.interval = float(interval)
+        self.callback = callback
+        self.logger = logger or logging.getLogger('anuga_bmi')
+
+        self._last_report = None
+        self._statistics = {'advances': 0,
+                            'yields': 0,
+                            'steps': 0,
+                            'wall_time': 0.,
+                            'min_timestep': float('inf'),
+                            'max_timestep': 0.,
+                            'last_steps': 0,
+                            'last_wall_time': 0.,
+                            'last_model_time': 0.,
+                            'last_min_timestep': float('inf'),
+                            'last_max_timestep': 0.,
+                            'last_mean_timestep': 0.}
+
+        # timestep range of the advance in progress
+        self._advance_min = float('inf')
+        self._advance_max = 0.
+
+
+    def set_level(self, level):
+        """Set the reporting level ('off', 'summary' or 'verbose')."""
+
+        # YAML reads an unquoted off as False
+        if level is None or level is False:
+            level = 'off'
+
+        assert str(level).lower() in LEVELS, (
+            "Progress level must be one of %s. Level '%s' is not "
+            "recognized." % (sorted(LEVELS.keys()), level))
+
+        self.level = LEVELS[str(level).lower()]
+
+
+    @property
+    def statistics(self):
+        """Copy of the timestepping counters."""
+        return dict(self._statistics)
+
+
+    def record_yield(self, domain):
+        """Record the internal steps taken since the previous yield."""
+
+        stats = self._statistics
+        stats['yields'] += 1
+
+        if domain.number_of_steps > 0:
+            stats['steps'] += domain.number_of_steps
+            stats['min_timestep'] = min(stats['min_timestep'],
+                                        domain.recorded_min_timestep)
+            stats['max_timestep'] = max(stats['max_timestep'],
+                                        domain.recorded_max_timestep)
+            self._advance_min = min(self._advance_min,
+                                    domain.recorded_min_timestep)
+            self._advance_max = max(self._advance_max,
+                                    domain.recorded_max_timestep)
+
+        if self.level >= LEVELS['verbose'] and self._due():
+            self._report(domain.timestepping_statistics())
+
+
+    def record_advance(self, n_steps, wall_time, model_time, elapsed=0.):
+        """Record one call to AnugaSolver.advance_to, of elapsed model time."""
+
+        stats = self._statistics
+        stats['advances'] += 1
+        stats['wall_time'] += wall_time
+        stats['last_steps'] = n_steps
+        stats['last_wall_time'] = wall_time
+        stats['last_model_time'] = model_time
+        stats['last_min_timestep'] = self._advance_min
+        stats['last_max_timestep'] = self._advance_max
+        stats['last_mean_timestep'] = elapsed / n_steps if n_steps else 0.
+
+        self._advance_min = float('inf')
+        self._advance_max = 0.
+
+        if self.level == LEVELS['summary'] and self._due():
+            self._report('Time = %.4f, steps = %d, wall time = %.3f s' %
+                         (model_time, n_steps, wall_time))
+
+
+    def _due(self):
+        """Whether the rate limit allows a new message."""
+
+        if self.interval <= 0.:
+            return True
+
+        now = time.time()
+        if self._last_report is None or now - self._last_report >= self.interval:
+            self._last_report = now
+            return True
+
+        return False
+
+
+    def _report(self, message):
+
+        if self.callback is not None:
+            self.callback(message, self.statistics)
+        else:
+            self.logger.info(message)
@@ -0,0 +1,229 @@
+#! /usr/bin/env python
+"""
+Point and polygon lookups on the triangle mesh.
+
+SpatialIndex sorts the triangles into a uniform grid of square bins, each
+bin listing the triangles whose bounding box overlaps it. A point is then
+only tested against the few triangles of its bin, and every lookup is
+vectorized over the points.
+"""
+
+import numpy as np
+
+
+# relative tolerance for points on an edge or a vertex
+_EDGE_TOLERANCE = 1.0e-10
+
+
+def points_in_polygon(points, polygon):
+    """
+    Mask of the points inside a polygon (even-odd rule).
+
+    Parameters
+    ----------
+    points : ndarray
+        (n, 2) coordinates.
+    polygon : array_like
+        (m, 2) vertices of the polygon.
+
+    Returns
+    -------
+    ndarray of bool
+        True for the points inside.
+    """
+
+    polygon = np.asarray(polygon, dtype=float)
+    x = points[:, 0]
+    y = points[:, 1]
+
+    inside = np.zeros(len(points), dtype=bool)
+
+    for (x0, y0), (x1, y1) in zip(polygon, np.roll(polygon, -1, axis=0)):
+        if y0 == y1:
+            continue
+        crosses = (y0 > y) != (y1 > y)
+        x_cross = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+        inside ^= crosses & (x < x_cross)
+
+    return inside
+
+
+class SpatialIndex(object):
+    """
+    Uniform bin grid over the triangles of a mesh.
+
+    Parameters
+    ----------
+    nodes : array_like
+        (N, 2) node coordinates.
+    triangles : array_like
+        (M, 3) node indices of the triangles.
+    """
+
+    def __init__(self, nodes, triangles):
+
+        nodes = np.asarray(nodes, dtype=float)
+        triangles = np.asarray(triangles, dtype=int)
+
+        corners = nodes[triangles]
+        self._origin = corners[:, 0].copy()
+        self._u = corners[:, 1] - self._origin
+        self._v = corners[:, 2] - self._origin
+        self._det = (self._u[:, 0] * self._v[:, 1] -
+                     self._u[:, 1] * self._v[:, 0])
+        self.centroids = corners.mean(axis=1)
+
+        low = corners.min(axis=1)
+        high = corners.max(axis=1)
+
+        self.lower = nodes.min(axis=0)
+        upper = nodes.max(axis=0)
+
+        # bins about the size of a typical triangle
+        extent = (high - low).max(axis=1)
+        self.bin_size = float(np.median(extent)) if len(extent) else 1.
+        if self.bin_size <= 0.:
+            self.bin_size = max(float((upper - self.lower).max()), 1.)
+
+        # but no more than a few bins per triangle on graded meshes
+        span = upper - self.lower
+        max_bins = 4 * max(len(triangles), 1)
+        if np.prod(span / self.bin_size + 1) > max_bins:
+            self.bin_size = max(float(np.sqrt(span[0] * span[1] / max_bins)),
+                                float(span.max()) / max_bins)
+
+        self.shape = tuple(np.floor(span / self.bin_size).astype(int) + 1)
+
+        first = self._bin_coordinates(low)
+        last = self._bin_coordinates(high)
+        counts = np.prod(last - first + 1, axis=1)
+
+        # one (bin, triangle) pair per bin overlapped by each triangle
+        ids = np.repeat(np.arange(len(triangles)), counts)
+        rank = np.arange(len(ids)) - np.repeat(np.cumsum(counts) - counts,
+                                               counts)
+        width = np.repeat(last[:, 0] - first[:, 0] + 1, counts)
+        bx = np.repeat(first[:, 0], counts) + rank % width
+        by = np.repeat(first[:, 1], counts) + rank // width
+        bins = bx * self.shape[1] + by
+
+        order = np.argsort(bins, kind='mergesort')
+        self.bin_triangles = ids[order]
+        self.bin_start = np.searchsorted(bins[order],
+                                         np.arange(self.shape[0] *
+                                                   self.shape[1] + 1))
+
+
+    def _bin_coordinates(self, points):
+        """(i, j) bin of each point, clipped to the grid."""
+
+        ij = np.floor((points - self.lower) / self.bin_size).astype(int)
+        np.clip(ij[:, 0], 0, self.shape[0] - 1, out=ij[:, 0])
+        np.clip(ij[:, 1], 0, self.shape[1] - 1, out=ij[:, 1])
+
+        return ij
+
+
+    def _candidates(self, bins):
+        """(position, triangle) pairs for the triangles of each bin."""
+
+        start = self.bin_start[bins]
+        counts = self.bin_start[bins + 1] - start
+
+        position = np.repeat(np.arange(len(bins)), counts)
+        offsets = np.arange(len(position)) - np.repeat(np.cumsum(counts) - counts,
+                                                       counts)
+
+        return position, self.bin_triangles[np.repeat(start, counts) + offsets]
+
+
+    def locate(self, points):
+        """
+        Triangle that contains each point and the barycentric weights of
+        its vertices.
+
+        Parameters
+        ----------
+        points : array_like
+            (n, 2) coordinates.
+
+        Returns
+        -------
+        tuple of (ndarray, ndarray)
+            Triangle of each point (-1 outside the mesh) and (n, 3)
+            weights (zero outside the mesh). Values at the points are
+            sum(weights * vertex_values[triangles], axis=1).
+        """
+
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+
+        ids = np.full(len(points), -1, dtype=int)
+        weights = np.zeros((len(points), 3))
+
+        if len(points) == 0:
+            return ids, weights
+
+        ij = np.floor((points - self.lower) / self.bin_size).astype(int)
+        in_grid = np.flatnonzero((ij[:, 0] >= 0) & (ij[:, 0] < self.shape[0]) &
+                                 (ij[:, 1] >= 0) & (ij[:, 1] < self.shape[1]))
+
+        position, candidates = self._candidates(ij[in_grid, 0] * self.shape[1] +
+                                                ij[in_grid, 1])
+        position = in_grid[position]
+
+        d = points[position] - self._origin[candidates]
+        u = self._u[candidates]
+        v = self._v[candidates]
+        det = self._det[candidates]
+
+        w1 = (d[:, 0] * v[:, 1] - d[:, 1] * v[:, 0]) / det
+        w2 = (u[:, 0] * d[:, 1] - u[:, 1] * d[:, 0]) / det
+        w0 = 1. - w1 - w2
+
+        tolerance = -_EDGE_TOLERANCE
+        hit = np.flatnonzero((w0 >= tolerance) & (w1 >= tolerance) &
+                             (w2 >= tolerance))
+
+        # first containing triangle of each point (points on an edge are
+        # in two triangles)
+        position = position[hit]
+        first = np.flatnonzero(np.diff(position, prepend=-1) != 0)
+        hit = hit[first]
+        position = position[first]
+
+        ids[position] = candidates[hit]
+        weights[position, 0] = w0[hit]
+        weights[position, 1] = w1[hit]
+        weights[position, 2] = w2[hit]
+
+        return ids, weights
+
+
+    def query_polygon(self, polygon):
+        """
+        Triangles whose centroid is inside a polygon.
+
+        Parameters
+        ----------
+        polygon : array_like
+            (m, 2) vertices of the polygon.
+
+        Returns
+        -------
+        ndarray of int
+            Sorted triangle ids.
+        """
+
+        polygon = np.asarray(polygon, dtype=float).reshape(-1, 2)
+
+        first = self._bin_coordinates(polygon.min(axis=0)[np.newaxis])[0]
+        last = self._bin_coordinates(polygon.max(axis=0)[np.newaxis])[0]
+
+        bx, by = np.meshgrid(np.arange(first[0], last[0] + 1),
+                             np.arange(first[1], last[1] + 1), indexing='ij')
+        _, candidates = self._candidates((bx * self.shape[1] + by).ravel())
+        candidates = np.unique(candidates)
+
+        inside = points_in_polygon(self.centroids[candidates], polygon)
+
+        return candidates[inside]
@@ -0,0 +1,84 @@
+#! /usr/bin/env python
+"""Connectivity of the ANUGA triangle mesh, in the BMI unstructured-grid form."""
+
+import numpy as np
+
+
+def _frozen(array, dtype):
+    """Contiguous, read-only copy of an array."""
+
+    array = np.array(array, dtype=dtype, order='C')
+    array.setflags(write=False)
+
+    return array
+
+
+class MeshTopology(object):
+    """
+    Node, edge and face connectivity of a triangle mesh.
+
+    All arrays are built once, stored contiguous and read-only, and handed
+    out without copying.
+
+    Edges follow ANUGA's numbering within a triangle: edge i of a face is
+    the one opposite its vertex i, so face_edges[k, i] is the edge that
+    carries edge_values[k, i] of the domain quantities.
+
+    Parameters
+    ----------
+    nodes : array_like
+        (N, 2) node coordinates.
+    triangles : array_like
+        (M, 3) node indices of the triangles.
+    """
+
+    def __init__(self, nodes, triangles):
+
+        nodes = np.asarray(nodes, dtype=float)
+        triangles = np.asarray(triangles)
+
+        self.node_x = _frozen(nodes[:, 0], float)
+        self.node_y = _frozen(nodes[:, 1], float)
+
+        n_faces = len(triangles)
+
+        self.face_nodes = _frozen(triangles, np.int32)
+        self.nodes_per_face = _frozen(np.full(n_faces, 3), np.int32)
+
+        # end of each face in the flattened face_nodes (BMI 1 offsets)
+        self.offsets = _frozen(np.arange(3, 3 * n_faces + 1, 3), np.int32)
+
+        # edge i of each triangle joins the two vertices other than i
+        first = triangles[:, [1, 2, 0]].ravel()
+        second = triangles[:, [2, 0, 1]].ravel()
+
+        low = np.minimum(first, second).astype(np.int64)
+        high = np.maximum(first, second).astype(np.int64)
+
+        keys, inverse = np.unique(low * len(nodes) + high, return_inverse=True)
+
+        self.edge_nodes = _frozen(np.column_stack((keys // len(nodes),
+                                                   keys % len(nodes))),
+                                  np.int32)
+        self.face_edges = _frozen(inverse.reshape(n_faces, 3), np.int32)
+
+        # edge midpoints
+        self.edge_x = _frozen(0.5 * (self.node_x[self.edge_nodes[:, 0]] +
+                                     self.node_x[self.edge_nodes[:, 1]]), float)
+        self.edge_y = _frozen(0.5 * (self.node_y[self.edge_nodes[:, 0]] +
+                                     self.node_y[self.edge_nodes[:, 1]]), float)
+
+
+    @property
+    def node_count(self):
+        return len(self.node_x)
+
+
+    @property
+    def edge_count(self):
+        return len(self.edge_nodes)
+
+
+    @property
+    def face_count(self):
+        return len(self.face_nodes)
@@ -0,0 +1,109 @@
+"""
+Compares ways of changing the bed elevation of a subset of cells at every
+coupling step:
+- domain.set_quantity('elevation', ..., location='centroids') on the
+  full array
+- set_value('land_surface__elevation', ...) on the full array
+- set_value_at_indices on the changed cells
+- add_elevation_change on the changed cells, with an index plan
+
+Usage:
+
+    $ python bench_elevation.py [number_of_updates] [fraction_of_cells]
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import yaml
+
+from anuga_bmi import BmiAnuga
+
+from bench_update import make_config
+
+
+ELEVATION = 'land_surface__elevation'
+
+
+def make_large_config(directory, name):
+
+    filename = make_config(directory, name)
+
+    with open(filename, 'r') as file_obj:
+        params = yaml.safe_load(file_obj)
+    params['shape'] = [200, 100]
+    params['size'] = [200., 100.]
+    with open(filename, 'w') as file_obj:
+        yaml.dump(params, file_obj)
+
+    return filename
+
+
+def time_updates(bmi, update, n_updates):
+
+    start = time.time()
+    for _ in range(n_updates):
+        update()
+    return (time.time() - start) / n_updates
+
+
+if __name__ == '__main__':
+
+    n_updates = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    fraction = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+
+    # anuga writes the output files to the working directory
+    cwd = os.getcwd()
+    directory = tempfile.mkdtemp()
+    os.chdir(directory)
+
+    try:
+        bmi = BmiAnuga()
+        bmi.initialize(make_large_config(directory, 'elevation'))
+
+        domain = bmi._anuga.domain
+        n_cells = bmi.get_grid_size(0)
+        indices = np.random.RandomState(0).choice(
+            n_cells, max(int(fraction * n_cells), 1), replace=False)
+        delta = np.full(len(indices), 1.e-4)
+        plan = bmi.create_index_plan(indices)
+
+        def set_quantity():
+            elevation = bmi.get_value(ELEVATION)
+            elevation[indices] += delta
+            domain.set_quantity('elevation', elevation, location='centroids')
+
+        def set_value():
+            elevation = bmi.get_value(ELEVATION)
+            elevation[indices] += delta
+            bmi.set_value(ELEVATION, elevation)
+
+        def set_value_at_indices():
+            elevation = bmi.get_value_at_indices(ELEVATION, indices)
+            bmi.set_value_at_indices(ELEVATION, elevation + delta, indices)
+
+        def add_elevation_change():
+            bmi.add_elevation_change(delta, plan)
+
+        results = [(name, time_updates(bmi, update, n_updates))
+                   for name, update in [('set_quantity', set_quantity),
+                                        ('set_value', set_value),
+                                        ('set_value_at_indices',
+                                         set_value_at_indices),
+                                        ('add_elevation_change',
+                                         add_elevation_change)]]
+
+        bmi.finalize()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory)
+
+    print('cells: %d, changed per update: %d' % (n_cells, len(indices)))
+    for name, seconds in results:
+        print('%-22s %10.1f us/update' % (name, 1.e6 * seconds))
@@ -0,0 +1,82 @@
+"""
+Times the startup cost of the BMI in fresh interpreters: importing
+anuga_bmi and querying the model metadata, which must not load the solver
+stack (anuga, yaml), against importing the solver itself.
+
+Usage:
+
+    $ python bench_import.py [number_of_runs] [results_file]
+
+If a results file is given, a JSON line with the package version and the
+median times is appended to it, to track startup over releases.
+"""
+
+from __future__ import print_function
+
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+METADATA = """
+import sys
+import anuga_bmi
+bmi = anuga_bmi.BmiAnuga()
+bmi.get_component_name()
+bmi.get_output_var_names()
+for name in bmi.get_input_var_names():
+    bmi.get_var_units(name)
+    bmi.get_var_grid(name)
+loaded = [name for name in ('anuga', 'yaml') if name in sys.modules]
+assert not loaded, 'metadata queries imported %s' % ', '.join(loaded)
+"""
+
+SOLVER = """
+from anuga_bmi.anuga_solver import AnugaSolver
+"""
+
+
+def time_python(code, n_runs):
+    """Median wall time of running code in fresh interpreters."""
+
+    times = []
+    for _ in range(n_runs):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', code])
+        times.append(time.time() - start)
+
+    return float(np.median(times))
+
+
+def package_version():
+
+    try:
+        import pkg_resources
+        return pkg_resources.get_distribution('anugaBMI').version
+    except Exception:
+        return 'unknown'
+
+
+if __name__ == '__main__':
+
+    n_runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    baseline = time_python('pass', n_runs)
+    metadata = time_python(METADATA, n_runs)
+    solver = time_python(SOLVER, n_runs)
+
+    print('interpreter startup:         %.3f s' % baseline)
+    print('import + metadata queries:   %.3f s' % metadata)
+    print('import of the solver stack:  %.3f s' % solver)
+
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], 'a') as file_obj:
+            file_obj.write(json.dumps({'version': package_version(),
+                                       'date': time.strftime('%Y-%m-%d'),
+                                       'python': sys.version.split()[0],
+                                       'interpreter': baseline,
+                                       'metadata': metadata,
+                                       'solver': solver}) + '\n')
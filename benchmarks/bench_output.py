@@ -0,0 +1,125 @@
+"""
+Compares the SWW output with the compressed, chunked NetCDF4 output on
+the example domain (examples/anuga.yaml, built on examples/data/raster.asc):
+time spent in the run, size of the output file and time to read the time
+series of one cell back.
+
+Usage:
+
+    $ python bench_output.py [run_time] [output_timestep]
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import yaml
+
+from anuga_bmi import BmiAnuga
+
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'examples')
+
+
+def make_config(directory, name, output_timestep, **options):
+
+    with open(os.path.join(EXAMPLES, 'anuga.yaml'), 'r') as file_obj:
+        params = yaml.safe_load(file_obj)
+
+    params['output_filename'] = os.path.join(directory, name)
+    params['output_timestep'] = output_timestep
+    params.update(options)
+
+    filename = os.path.join(directory, name + '.yaml')
+    with open(filename, 'w') as file_obj:
+        yaml.safe_dump(params, file_obj)
+
+    return filename
+
+
+def time_run(filename, run_time):
+
+    bmi = BmiAnuga()
+    bmi.initialize(filename)
+
+    start = time.time()
+    bmi.update_until(run_time)
+    bmi.finalize()
+
+    return time.time() - start
+
+
+def time_read_cell(filename, name, cell):
+
+    import netCDF4
+
+    start = time.time()
+    with netCDF4.Dataset(filename, 'r') as dataset:
+        values = dataset.variables[name][:, cell]
+    elapsed = time.time() - start
+
+    return elapsed, len(values)
+
+
+if __name__ == '__main__':
+
+    run_time = float(sys.argv[1]) if len(sys.argv) > 1 else 100.
+    output_timestep = float(sys.argv[2]) if len(sys.argv) > 2 else 1.
+
+    directory = tempfile.mkdtemp()
+    cwd = os.getcwd()
+
+    cases = [('sww', 'sww', {'output_format': 'sww'}, '.sww', 'stage_c'),
+             ('netcdf4', 'netcdf4', {'output_format': 'netcdf4'},
+              '.nc', 'stage'),
+             ('netcdf4, 3 digits', 'netcdf4_lsd',
+              {'output_format': 'netcdf4',
+               'output_least_significant_digit': {'stage': 3,
+                                                  'xmomentum': 3,
+                                                  'ymomentum': 3}},
+              '.nc', 'stage'),
+             ('netcdf4, async', 'netcdf4_async',
+              {'output_format': 'netcdf4', 'output_mode': 'async'},
+              '.nc', 'stage')]
+
+    results = []
+
+    try:
+        # the example input file uses paths relative to examples
+        os.chdir(EXAMPLES)
+
+        for label, name, options, extension, variable in cases:
+
+            filename = make_config(directory, name, output_timestep, **options)
+            elapsed = time_run(filename, run_time)
+
+            output = os.path.join(directory, name + extension)
+            size = os.path.getsize(output)
+
+            try:
+                read, n_times = time_read_cell(output, variable, 0)
+            except (ImportError, KeyError):
+                # no netCDF4, or an SWW file without centroid values
+                read, n_times = float('nan'), 0
+
+            results.append((label, elapsed, size, read, n_times))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory)
+
+    print('run time:         %g s, output every %g s' % (run_time,
+                                                        output_timestep))
+    print('%-20s %10s %12s %12s' % ('format', 'run (s)', 'size (MB)',
+                                    'cell read (s)'))
+    for label, elapsed, size, read, n_times in results:
+        print('%-20s %10.3f %12.3f %12.4f' % (label, elapsed, size / 1.e6, read))
+
+    sww_size = np.float64(results[0][2])
+    for label, elapsed, size, read, n_times in results[1:]:
+        print('%s: %.1fx smaller than sww' % (label, sww_size / size))
@@ -0,0 +1,239 @@
+"""
+Times the analytic elevation profiles of rectangular domains on the
+centroid coordinates of BmiAnuga rectangular domains of increasing size,
+against the per-node loops of the original set_elevation_rectangular. The
+time per triangle of the vectorized profiles should stay roughly constant
+as the mesh grows. The loops are only timed up to a smaller size.
+
+Usage:
+
+    $ python bench_profiles.py [largest_number_of_cells] [largest_looped_cells]
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import yaml
+
+from anuga_bmi import BmiAnuga
+from anuga_bmi.profiles import PROFILES
+
+
+def make_config(directory, n_cells):
+    """Input file of a 2:1 rectangular cross domain with ~n_cells triangles."""
+
+    # rectangular_cross_domain splits each of m x n cells into 4 triangles
+    n = max(int(np.sqrt(n_cells / 8.)), 2)
+    m = 2 * n
+
+    params = {'domain_type': 'rectangular',
+              'shape': [m, n],
+              'size': [float(m), float(n)],
+              'output_format': 'none',
+              'output_filename': 'profiles_%d' % n_cells,
+              'boundary_conditions': {'left': 'Reflective',
+                                      'right': 'Reflective',
+                                      'top': 'Reflective',
+                                      'bottom': 'Reflective'}}
+
+    filename = os.path.join(directory, 'profiles_%d.yaml' % n_cells)
+    with open(filename, 'w') as file_obj:
+        yaml.dump(params, file_obj)
+
+    return filename
+
+
+def centroid_coordinates(directory, n_cells):
+    """x and y of the centroids of a BmiAnuga domain with ~n_cells triangles."""
+
+    bmi = BmiAnuga()
+    bmi.initialize(make_config(directory, n_cells))
+
+    coordinates = bmi._anuga.domain.centroid_coordinates
+    x = np.array(coordinates[:, 0])
+    y = np.array(coordinates[:, 1])
+
+    bmi.finalize()
+
+    return x, y
+
+
+# the per-node loops of the original set_elevation_rectangular, with the
+# coordinates passed in
+
+def _step_loop(x, y, fraction):
+
+    z = -x/10
+    N = len(x)
+    minx = np.floor(np.max(x)/2)
+    maxx = np.ceil(np.max(x)/2 + 1)
+    stepx = np.min(x[(x >= minx) & (x <= maxx)])
+    stepz = fraction * (np.max(z) - np.min(z))
+
+    for i in range(N):
+        if x[i] > stepx:
+            z[i] += stepz
+
+    return z
+
+
+def _dam_loop(x, y):
+
+    z = -x/10.
+    N = len(x)
+    minx = np.floor(np.max(x)/2)
+    maxx = np.ceil(np.max(x)/2)
+    maxz = 0.9 * np.max(z)
+
+    if len(x[(x >= minx) & (x <= maxx)]) < 5:
+        maxx = np.ceil(np.max(x)/2 + 1)
+
+    for i in range(N):
+        if minx <= x[i] <= maxx:
+            z[i] = maxz
+
+    return z
+
+
+def _cylinder_loop(x, y, fraction):
+
+    z = -x/10
+    N = len(x)
+
+    minx = np.floor(np.max(x)/2)
+    maxx = np.ceil(np.max(x)/2 + 1)
+    stepx = np.min(x[(x >= minx) & (x <= maxx)])
+
+    miny = np.floor(np.max(y)/2)
+    maxy = np.ceil(np.max(y)/2 + 1)
+    stepy = np.min(y[(y >= miny) & (y <= maxy)])
+
+    radius = fraction * (np.max(y) - np.min(y))
+
+    for i in range(N):
+        if (x[i]-stepx)**2 + (y[i]-stepy)**2 < radius**2:
+            z[i] = np.max(z)
+
+    return z
+
+
+def _wing_dams_loop(x, y):
+
+    z = -x/10
+    N = len(x)
+    minx = np.floor(np.max(x)/2)
+    stepx1 = np.min(x[(x >= minx)])
+    stepx2 = np.min(x[(x > stepx1)])
+    dist = 0.2 * (np.max(y) - np.min(y))
+
+    for i in range(N):
+        if stepx1 <= x[i] <= stepx2:
+            if (y[i] < dist) or (y[i] > np.max(y) - dist):
+                z[i] += 1
+
+    return z
+
+
+def _alternating_dykes_loop(x, y):
+
+    z = -x/10
+    N = len(x)
+
+    minx = np.floor(np.max(x)/4)
+    stepx1 = np.min(x[(x >= minx)])
+    stepx2 = np.min(x[(x > stepx1)])
+
+    minx = np.floor(np.max(x)/2)
+    stepx3 = np.min(x[(x >= minx)])
+    stepx4 = np.min(x[(x > stepx3)])
+
+    minx = np.floor(3*np.max(x)/4)
+    stepx5 = np.min(x[(x >= minx)])
+    stepx6 = np.min(x[(x > stepx5)])
+
+    dist = 0.3 * (np.max(y) - np.min(y))
+
+    for i in range(N):
+        if stepx1 <= x[i] <= stepx2:
+            if (y[i] < dist):
+                z[i] += 1
+
+        if stepx3 <= x[i] <= stepx4:
+            if (y[i] > np.max(y) - dist):
+                z[i] += 1
+
+        if stepx5 <= x[i] <= stepx6:
+            if (y[i] < dist):
+                z[i] += 1
+
+    return z
+
+
+LOOPS = {
+    'shallow linear ramp': lambda x, y: -x/5.,
+    'steep linear ramp': lambda x, y: -x/10.,
+    'tall step down': lambda x, y: _step_loop(x, y, -0.6),
+    'short step down': lambda x, y: _step_loop(x, y, -0.2),
+    'step up': lambda x, y: _step_loop(x, y, 0.3),
+    'dam': _dam_loop,
+    'thin cylinder': lambda x, y: _cylinder_loop(x, y, 0.1),
+    'thick cylinder': lambda x, y: _cylinder_loop(x, y, 0.4),
+    'wing dams': _wing_dams_loop,
+    'alternating dykes': _alternating_dykes_loop,
+    'alternating dikes': _alternating_dykes_loop,
+}
+
+
+def time_per_cell(profile, x, y):
+
+    start = time.time()
+    profile(x, y)
+    return (time.time() - start) / x.size
+
+
+if __name__ == '__main__':
+
+    largest = int(float(sys.argv[1])) if len(sys.argv) > 1 else 2000000
+    largest_looped = int(float(sys.argv[2])) if len(sys.argv) > 2 else 100000
+
+    sizes = [largest // 64, largest // 16, largest // 4, largest]
+
+    # anuga writes its files to the working directory
+    cwd = os.getcwd()
+    directory = tempfile.mkdtemp()
+    os.chdir(directory)
+
+    try:
+        coordinates = [centroid_coordinates(directory, n) for n in sizes]
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory)
+
+    print('%-26s' % 'profile' +
+          ''.join('%14s' % ('%d cells' % x.size) for x, _ in coordinates))
+
+    for name in sorted(PROFILES):
+
+        row = '%-26s' % name
+        for x, y in coordinates:
+            row += '%11.1f ns' % (1.e9 * time_per_cell(PROFILES[name], x, y))
+        print(row)
+
+        if name not in LOOPS:
+            continue
+
+        row = '%-26s' % '  original loop'
+        for x, y in coordinates:
+            if x.size <= largest_looped:
+                row += '%11.1f ns' % (1.e9 * time_per_cell(LOOPS[name], x, y))
+            else:
+                row += '%14s' % '-'
+        print(row)
+
+    print('(time per triangle, on the centroid coordinates)')
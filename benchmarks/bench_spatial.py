@@ -0,0 +1,92 @@
+"""
+Times the spatial index (anuga_bmi.spatial) on a synthetic rectangular
+cross mesh, the layout of anuga.rectangular_cross_domain: index build,
+point location and polygon queries, checked against brute force on a
+sample of the points.
+
+Usage:
+
+    $ python bench_spatial.py [number_of_triangles] [number_of_points]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+import numpy as np
+
+from anuga_bmi.spatial import SpatialIndex, points_in_polygon
+
+
+def cross_mesh(n, m, length=1000., width=500.):
+    """Nodes and triangles of an n x m rectangular cross mesh."""
+
+    xs = np.linspace(0., length, n + 1)
+    ys = np.linspace(0., width, m + 1)
+
+    corners = np.array(np.meshgrid(xs, ys, indexing='ij')).reshape(2, -1).T
+    centres = np.array(np.meshgrid(0.5 * (xs[1:] + xs[:-1]),
+                                   0.5 * (ys[1:] + ys[:-1]),
+                                   indexing='ij')).reshape(2, -1).T
+    nodes = np.vstack((corners, centres))
+
+    i, j = [a.ravel() for a in np.meshgrid(np.arange(n), np.arange(m),
+                                           indexing='ij')]
+    c = len(corners) + i * m + j
+    a = i * (m + 1) + j
+    b = (i + 1) * (m + 1) + j
+    d = i * (m + 1) + j + 1
+    e = (i + 1) * (m + 1) + j + 1
+
+    triangles = np.vstack((np.column_stack((c, a, b)),
+                           np.column_stack((c, b, e)),
+                           np.column_stack((c, e, d)),
+                           np.column_stack((c, d, a))))
+
+    return nodes, triangles
+
+
+if __name__ == '__main__':
+
+    n_triangles = int(float(sys.argv[1])) if len(sys.argv) > 1 else 1000000
+    n_points = int(float(sys.argv[2])) if len(sys.argv) > 2 else 100000
+
+    n = max(int(np.sqrt(n_triangles / 8.)), 1)
+    nodes, triangles = cross_mesh(2 * n, n)
+
+    start = time.time()
+    index = SpatialIndex(nodes, triangles)
+    build = time.time() - start
+
+    points = np.random.RandomState(0).rand(n_points, 2) * [1000., 500.]
+
+    # warm up
+    index.locate(points[:1000])
+
+    start = time.time()
+    ids, weights = index.locate(points)
+    locate = time.time() - start
+
+    # brute force check on a sample
+    sample = points[:20]
+    corners = nodes[triangles]
+    for point, k, w in zip(sample, ids[:20], weights[:20]):
+        assert np.allclose(w.dot(corners[k]), point)
+
+    polygon = [[100., 100.], [400., 120.], [300., 400.], [120., 300.]]
+
+    start = time.time()
+    selected = index.query_polygon(polygon)
+    query = time.time() - start
+
+    centroids = corners.mean(axis=1)
+    assert np.array_equal(selected,
+                          np.flatnonzero(points_in_polygon(centroids, polygon)))
+
+    print('triangles:            %d' % len(triangles))
+    print('bins:                 %d x %d' % index.shape)
+    print('build:                %.3f s' % build)
+    print('locate %d points: %.3f s (%.2f us/point)' %
+          (n_points, locate, 1.e6 * locate / n_points))
+    print('polygon query:        %.3f s (%d triangles)' % (query, len(selected)))
@@ -0,0 +1,120 @@
+"""
+Compares the cost of advancing ANUGA through the BMI with the persistent
+evolve generator against re-entering domain.evolve at every coupling step.
+
+The re-entering path is the baseline BmiAnuga.update: it advances the BMI
+time by one coupling step and calls domain.evolve up to it, printing the
+timestepping statistics at every yield (to os.devnull here). Both models
+write their output at every coupling step, as the baseline did.
+
+Usage:
+
+    $ python bench_update.py [number_of_steps] [coupling_step]
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import yaml
+
+from anuga_bmi import BmiAnuga
+
+
+def make_config(directory, name, dt=1.):
+    """
+    Write the YAML input file of a 40 m x 20 m channel, coupled and written
+    every dt seconds. The output file is named relative to the working
+    directory.
+    """
+
+    params = {'domain_type': 'rectangular',
+              'shape': [40, 20],
+              'size': [40., 20.],
+              'output_filename': name,
+              'output_timestep': dt,
+              'coupling_timestep': dt,
+              'boundary_tags': {'left': [], 'right': [],
+                                'top': [], 'bottom': []},
+              'boundary_conditions': {'left': ['Dirichlet', 1., 0., 0.],
+                                      'right': 'Transmissive',
+                                      'top': 'Reflective',
+                                      'bottom': 'Reflective'},
+              'initial_flow_depth': 0.1,
+              'Mannings_n_parameter': 0.03}
+
+    filename = os.path.join(directory, name + '.yaml')
+    with open(filename, 'w') as file_obj:
+        yaml.dump(params, file_obj)
+
+    return filename
+
+
+def time_persistent(filename, n_steps):
+
+    bmi = BmiAnuga()
+    bmi.initialize(filename)
+
+    start = time.time()
+    for _ in range(n_steps):
+        bmi.update()
+    elapsed = time.time() - start
+
+    bmi.finalize()
+    return elapsed
+
+
+def baseline_update(bmi, log):
+    """BmiAnuga.update before the persistent generator."""
+
+    solver = bmi._anuga
+
+    bmi._time += bmi.get_time_step()
+    solver._time = bmi._time
+
+    for t in solver.domain.evolve(yieldstep = bmi.get_time_step(),
+                                  finaltime = solver._time):
+        print(solver.domain.timestepping_statistics(), file=log)
+
+
+def time_restart(filename, n_steps):
+
+    bmi = BmiAnuga()
+    bmi.initialize(filename)
+
+    with open(os.devnull, 'w') as log:
+        start = time.time()
+        for _ in range(n_steps):
+            baseline_update(bmi, log)
+        elapsed = time.time() - start
+
+    bmi.finalize()
+    return elapsed
+
+
+if __name__ == '__main__':
+
+    n_steps = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    dt = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+
+    # anuga writes the output files to the working directory
+    cwd = os.getcwd()
+    directory = tempfile.mkdtemp()
+    os.chdir(directory)
+
+    try:
+        restart = time_restart(make_config(directory, 'restart', dt), n_steps)
+        persistent = time_persistent(make_config(directory, 'persistent', dt),
+                                     n_steps)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory)
+
+    print('coupling steps:        %d x %g s' % (n_steps, dt))
+    print('evolve per call:       %.3f s' % restart)
+    print('persistent generator:  %.3f s' % persistent)
+    print('speedup:               %.2fx' % (restart / persistent))
@@ -0,0 +1,53 @@
+"""
+Times a long BmiAnuga.update_until against the equivalent loop of update()
+calls and reports the wall time and internal solver steps of each.
+
+Usage:
+
+    $ python bench_update_until.py [duration] [coupling_step]
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+
+from anuga_bmi import BmiAnuga
+from bench_update import make_config
+
+
+if __name__ == '__main__':
+
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 100.
+    dt = float(sys.argv[2]) if len(sys.argv) > 2 else 1.
+
+    # anuga writes the output files to the working directory
+    cwd = os.getcwd()
+    directory = tempfile.mkdtemp()
+    os.chdir(directory)
+
+    try:
+        looped = BmiAnuga()
+        looped.initialize(make_config(directory, 'looped'))
+        looped._anuga.time_step = dt
+        while looped.get_current_time() < duration:
+            looped.update()
+        loop_stats = looped.get_stepping_statistics()
+        looped.finalize()
+
+        single = BmiAnuga()
+        single.initialize(make_config(directory, 'single'))
+        single.update_until(duration)
+        single_stats = single.get_stepping_statistics()
+        single.finalize()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory)
+
+    print('%-24s %10s %10s %10s' % ('', 'updates', 'steps', 'wall (s)'))
+    for name, stats in [('update() x %g s' % dt, loop_stats),
+                        ('update_until(%g)' % duration, single_stats)]:
+        print('%-24s %10d %10d %10.3f' % (name, stats['advances'],
+                                          stats['steps'], stats['wall_time']))
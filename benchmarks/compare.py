@@ -0,0 +1,108 @@
+"""
+Compares two result files of suite.py, case by case (domain and target
+number of triangles), and flags the metrics that got worse by more than
+a threshold. Times (_s, _us) are better when lower, throughputs (_per_s)
+when higher.
+
+Usage:
+
+    $ python compare.py baseline.json new.json [threshold]
+
+The threshold is a relative change (default 0.1, 10%). The exit status
+is 1 if any metric regressed, so the script can gate a CI job.
+"""
+
+from __future__ import print_function
+
+import json
+import sys
+
+
+def load_cases(filename):
+
+    with open(filename, 'r') as file_obj:
+        results = json.load(file_obj)
+
+    cases = dict(((result['domain'], result['target_triangles']), result)
+                 for result in results['results'])
+
+    return results['metadata'], cases
+
+
+def higher_is_better(metric):
+    return metric.endswith('_per_s')
+
+
+def is_timing(metric):
+    return higher_is_better(metric) or metric.endswith(('_s', '_us'))
+
+
+def compare(baseline, new, threshold):
+    """
+    Relative change of each timing metric of the cases in both files.
+
+    Returns
+    -------
+    list of tuple
+        (case, metric, baseline, new, change, regressed), where change
+        is positive when the metric got better.
+    """
+
+    rows = []
+
+    for case in sorted(set(baseline) & set(new)):
+        for metric in sorted(set(baseline[case]) & set(new[case])):
+
+            if not is_timing(metric):
+                continue
+
+            old_value = float(baseline[case][metric])
+            new_value = float(new[case][metric])
+
+            if old_value <= 0. or new_value <= 0.:
+                continue
+
+            if higher_is_better(metric):
+                change = new_value / old_value - 1.
+            else:
+                change = old_value / new_value - 1.
+
+            rows.append((case, metric, old_value, new_value, change,
+                         change < -threshold))
+
+    return rows
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(2)
+
+    threshold = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+
+    baseline_metadata, baseline = load_cases(sys.argv[1])
+    new_metadata, new = load_cases(sys.argv[2])
+
+    for key in ['version', 'anuga', 'numpy', 'python', 'platform']:
+        if baseline_metadata.get(key) != new_metadata.get(key):
+            print('%-10s %s -> %s' % (key, baseline_metadata.get(key),
+                                      new_metadata.get(key)))
+
+    for case in sorted(set(baseline) ^ set(new)):
+        print('only in one file: %s, %d triangles' % case)
+
+    rows = compare(baseline, new, threshold)
+
+    print('%-12s %9s  %-32s %12s %12s %8s' % ('domain', 'triangles', 'metric',
+                                             'baseline', 'new', 'change'))
+    for (domain, n_triangles), metric, old_value, new_value, change, regressed in rows:
+        print('%-12s %9d  %-32s %12.4g %12.4g %+7.1f%%%s' %
+              (domain, n_triangles, metric, old_value, new_value,
+               100. * change, '  REGRESSION' if regressed else ''))
+
+    n_regressed = sum(1 for row in rows if row[-1])
+    print('%d of %d metrics regressed by more than %g%%' %
+          (n_regressed, len(rows), 100. * threshold))
+
+    sys.exit(1 if n_regressed else 0)
@@ -0,0 +1,423 @@
+"""
+Benchmark suite of the hot paths of the BMI wrapper, on synthetic
+rectangular and outline domains of several sizes:
+- mesh generation and elevation interpolation, timed on their own
+- initialize(), end to end
+- stepping throughput through update() (cell updates per second)
+- latency of the exchanges: get_value (copy and reference), set_value,
+  and get/set at 1% of the cells through an index plan
+- output write throughput of the SWW and NetCDF4 sinks
+
+Results are written as JSON, to be compared between versions of anuga
+or of the wrapper with compare.py.
+
+Usage:
+
+    $ python suite.py [--sizes 1e4,1e5,1e6,2e6] [--domains rectangular,outline]
+                      [--steps 5] [--repeat 20] [--output results.json]
+
+The sizes are target numbers of triangles; the actual number of each
+domain is in the results.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import yaml
+
+from anuga_bmi import BmiAnuga
+
+from bench_import import package_version
+
+
+DOMAINS = ['rectangular', 'outline']
+
+SIZES = [1.e4, 1.e5, 1.e6, 2.e6]
+
+STAGE = 'land_surface_water_surface__elevation'
+
+EXCHANGE_VARIABLES = ['land_surface_water_surface__elevation',
+                      'land_surface_water__depth',
+                      'land_surface_water_flow__x_component_of_momentum']
+
+# extent of the synthetic domains (m)
+LENGTH = 2000.
+WIDTH = 1000.
+
+# bed slope of the synthetic domains
+SLOPE = 0.001
+
+# projection of the synthetic elevation rasters
+PROJECTION = """Projection    UTM
+Zone          56
+Datum         WGS84
+Zunits        NO
+Units         METERS
+Spheroid      WGS84
+Xshift        0.0000000000
+Yshift        10000000.0000000000
+Parameters
+"""
+
+
+def median_time(function, n_repeat):
+    """Median wall time of calls to function."""
+
+    times = []
+    for _ in range(n_repeat):
+        start = time.time()
+        function()
+        times.append(time.time() - start)
+
+    return float(np.median(times))
+
+
+def rectangular_params(n_triangles):
+    """Parameters of a rectangular cross domain of about n_triangles."""
+
+    # 4 triangles per cell, twice as many columns as rows
+    m = max(int(round(np.sqrt(n_triangles / 8.))), 1)
+
+    return {'domain_type': 'rectangular',
+            'shape': [2 * m, m],
+            'size': [LENGTH, WIDTH],
+            'boundary_tags': {'left': [], 'right': [],
+                              'top': [], 'bottom': []},
+            'boundary_conditions': {'left': ['Dirichlet', 1., 0., 0.],
+                                    'right': 'Transmissive',
+                                    'top': 'Reflective',
+                                    'bottom': 'Reflective'}}
+
+
+def outline_polygon():
+    """Irregular hexagon inside the LENGTH x WIDTH box."""
+
+    return np.array([[0., 0.3], [0.45, 0.], [1., 0.15],
+                     [0.95, 0.8], [0.5, 1.], [0.05, 0.9]]) * [LENGTH, WIDTH]
+
+
+def polygon_area(polygon):
+
+    x, y = polygon[:, 0], polygon[:, 1]
+    return float(0.5 * abs(np.dot(x, np.roll(y, -1)) -
+                           np.dot(y, np.roll(x, -1))))
+
+
+def write_outline_data(directory, n_triangles):
+    """
+    Outline polygon (CSV) and elevation raster (ESRI ASCII, with the
+    projection file that anuga.asc2dem reads) with about one raster cell
+    per triangle, capped at 2000 x 1000 cells.
+    """
+
+    polygon = outline_polygon()
+
+    boundary_filename = os.path.join(directory, 'outline.csv')
+    np.savetxt(boundary_filename, polygon, delimiter=',', fmt='%.5f')
+
+    cellsize = max(np.sqrt(LENGTH * WIDTH / n_triangles), LENGTH / 2000.)
+    ncols = int(np.ceil(LENGTH / cellsize)) + 1
+    nrows = int(np.ceil(WIDTH / cellsize)) + 1
+
+    x = (np.arange(ncols) + 0.5) * cellsize
+    y = (np.arange(nrows)[::-1] + 0.5) * cellsize
+    xx, yy = np.meshgrid(x, y)
+    elevation = (SLOPE * (LENGTH - xx) +
+                 0.2 * np.sin(xx / 97.) * np.cos(yy / 61.))
+
+    elevation_filename = os.path.join(directory, 'elevation.asc')
+    header = ('ncols %d\nnrows %d\nxllcorner 0.0\nyllcorner 0.0\n'
+              'cellsize %.10g\nNODATA_value -9999' % (ncols, nrows, cellsize))
+    np.savetxt(elevation_filename, elevation, fmt='%.4f', header=header,
+               comments='')
+
+    with open(elevation_filename[:-4] + '.prj', 'w') as file_obj:
+        file_obj.write(PROJECTION)
+
+    return boundary_filename, elevation_filename
+
+
+def outline_params(directory, n_triangles):
+    """Parameters of an outline domain of about n_triangles."""
+
+    boundary_filename, elevation_filename = write_outline_data(directory,
+                                                               n_triangles)
+
+    # triangle areas are about half of the maximum
+    max_area = 2. * polygon_area(outline_polygon()) / n_triangles
+
+    return {'domain_type': 'outline',
+            'boundary_filename': boundary_filename,
+            'elevation_filename': elevation_filename,
+            'maximum_triangle_area': max_area,
+            'boundary_tags': {'inflow': [5], 'outflow': [2],
+                              'side': [0, 1, 3, 4]},
+            'boundary_conditions': {'inflow': ['Dirichlet', 3., 0., 0., 0.],
+                                    'outflow': 'Transmissive',
+                                    'side': 'Reflective'}}
+
+
+def make_config(directory, name, params, **options):
+
+    params = dict(params)
+    params.update({'output_filename': os.path.join(directory, name),
+                   'output_timestep': 1.,
+                   'initial_flow_depth': 0.1,
+                   'Mannings_n_parameter': 0.03})
+    params.update(options)
+
+    filename = os.path.join(directory, name + '.yaml')
+    with open(filename, 'w') as file_obj:
+        yaml.safe_dump(params, file_obj)
+
+    return filename
+
+
+def time_components(domain_type, params):
+    """Mesh generation and elevation interpolation, timed on their own."""
+
+    import anuga
+
+    from anuga_bmi.profiles import get_profile
+
+    if domain_type == 'rectangular':
+
+        start = time.time()
+        domain = anuga.rectangular_cross_domain(params['shape'][0],
+                                                params['shape'][1],
+                                                len1 = params['size'][0],
+                                                len2 = params['size'][1])
+        mesh_generation = time.time() - start
+
+        start = time.time()
+        domain.set_quantity('elevation', get_profile('shallow linear ramp'))
+        elevation = time.time() - start
+
+    else:
+
+        root = params['elevation_filename'][:-4]
+        mesh_filename = root + '.msh'
+
+        start = time.time()
+        anuga.pmesh.mesh_interface.create_mesh_from_regions(
+            bounding_polygon = anuga.read_polygon(params['boundary_filename']),
+            boundary_tags = params['boundary_tags'],
+            maximum_triangle_area = params['maximum_triangle_area'],
+            filename = mesh_filename)
+        domain = anuga.Domain(mesh_filename)
+        mesh_generation = time.time() - start
+
+        start = time.time()
+        anuga.asc2dem(root + '.asc')
+        anuga.dem2pts(root + '.dem')
+        domain.set_quantity('elevation', filename = root + '.pts')
+        elevation = time.time() - start
+
+    return {'mesh_generation_s': mesh_generation,
+            'elevation_s': elevation}
+
+
+def time_stepping(bmi, n_steps):
+    """Wall time and cell updates per second of n_steps calls to update()."""
+
+    n_cells = bmi.get_grid_size(0)
+    steps_before = bmi.get_stepping_statistics()['steps']
+
+    start = time.time()
+    for _ in range(n_steps):
+        bmi.update()
+    elapsed = time.time() - start
+
+    n_internal = bmi.get_stepping_statistics()['steps'] - steps_before
+
+    return {'update_s': elapsed / n_steps,
+            'internal_steps': int(n_internal),
+            'cell_updates_per_s': n_cells * n_internal / elapsed}
+
+
+def time_exchanges(bmi, n_repeat):
+    """Median latency (us) of the BMI exchanges."""
+
+    n_cells = bmi.get_grid_size(0)
+    out = np.empty(n_cells)
+    stage = bmi.get_value(STAGE)
+
+    indices = np.random.RandomState(0).choice(n_cells, max(n_cells // 100, 1),
+                                              replace=False)
+    plan = bmi.create_index_plan(indices)
+    out_at_indices = np.empty(len(indices))
+    stage_at_indices = stage[indices]
+
+    buffers = dict((name, np.empty(n_cells)) for name in EXCHANGE_VARIABLES)
+
+    exchanges = [
+        ('get_value', lambda: bmi.get_value(STAGE, out=out)),
+        ('get_value_ref', lambda: bmi.get_value_ref(STAGE)),
+        ('set_value', lambda: bmi.set_value(STAGE, stage)),
+        ('get_values', lambda: bmi.get_values(EXCHANGE_VARIABLES, out=buffers)),
+        ('get_value_at_indices',
+         lambda: bmi.get_value_at_indices(STAGE, plan, out=out_at_indices)),
+        ('set_value_at_indices',
+         lambda: bmi.set_value_at_indices(STAGE, stage_at_indices, plan)),
+    ]
+
+    return dict((name + '_us', 1.e6 * median_time(exchange, n_repeat))
+                for name, exchange in exchanges)
+
+
+def time_output(bmi, directory, name, n_repeat):
+    """Snapshots and MB per second written by the output sinks."""
+
+    from anuga_bmi.output import DirectWriter, NetCDF4Sink, SWWSink
+
+    domain = bmi._anuga.domain
+    stored_quantities = bmi._anuga._stored_quantities
+
+    def sww_sink():
+        domain.set_name(name + '_sww')
+        domain.set_datadir(directory)
+        domain.initialise_storage()
+        return SWWSink(domain)
+
+    def netcdf4_sink():
+        return NetCDF4Sink(os.path.join(directory, name + '.nc'), domain,
+                           stored_quantities)
+
+    results = {}
+
+    for label, create_sink in [('sww', sww_sink), ('netcdf4', netcdf4_sink)]:
+
+        try:
+            writer = DirectWriter(create_sink())
+        except ImportError:
+            # no netCDF4
+            continue
+
+        n_bytes = sum(np.asarray(value).nbytes
+                      for value in writer.sink.capture(domain).values())
+
+        # the first write includes the static quantities
+        writer.store_timestep(domain)
+
+        elapsed = median_time(lambda: writer.store_timestep(domain), n_repeat)
+        writer.close()
+
+        results[label + '_snapshots_per_s'] = 1. / elapsed
+        results[label + '_mb_per_s'] = n_bytes / elapsed / 1.e6
+
+    return results
+
+
+def run_case(directory, domain_type, n_triangles, n_steps, n_repeat):
+
+    name = '%s_%d' % (domain_type, n_triangles)
+    case_directory = os.path.join(directory, name)
+    os.mkdir(case_directory)
+
+    if domain_type == 'rectangular':
+        params = rectangular_params(n_triangles)
+    else:
+        params = outline_params(case_directory, n_triangles)
+
+    result = {'domain': domain_type, 'target_triangles': int(n_triangles)}
+    result.update(time_components(domain_type, params))
+
+    filename = make_config(case_directory, name, params, output_format='none')
+
+    bmi = BmiAnuga()
+
+    start = time.time()
+    bmi.initialize(filename)
+    result['initialize_s'] = time.time() - start
+    result['triangles'] = int(bmi.get_grid_size(0))
+
+    # the first update starts the evolve generator
+    bmi.update()
+
+    result.update(time_stepping(bmi, n_steps))
+    result.update(time_exchanges(bmi, n_repeat))
+    result.update(time_output(bmi, case_directory, name, max(n_repeat // 4, 3)))
+
+    bmi.finalize()
+
+    return result
+
+
+def metadata():
+
+    try:
+        import anuga
+        anuga_version = getattr(anuga, '__version__', 'unknown')
+    except ImportError:
+        anuga_version = 'unknown'
+
+    return {'version': package_version(),
+            'anuga': anuga_version,
+            'numpy': np.__version__,
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'date': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def parse_args():
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default=','.join('%g' % n for n in SIZES),
+                        help='target numbers of triangles, comma separated')
+    parser.add_argument('--domains', default=','.join(DOMAINS),
+                        help='domain types, comma separated')
+    parser.add_argument('--steps', type=int, default=5,
+                        help='coupling steps of 1 s timed per domain')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='repeats of each exchange')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='JSON results file')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    args = parse_args()
+
+    sizes = [float(size) for size in args.sizes.split(',')]
+    domains = args.domains.split(',')
+
+    for domain_type in domains:
+        assert domain_type in DOMAINS, (
+            "Domain must be one of %s, not '%s'" % (DOMAINS, domain_type))
+
+    results = {'metadata': metadata(), 'results': []}
+
+    directory = tempfile.mkdtemp()
+
+    try:
+        for domain_type in domains:
+            for n_triangles in sizes:
+
+                result = run_case(directory, domain_type, int(n_triangles),
+                                  args.steps, args.repeat)
+                results['results'].append(result)
+
+                print('%-12s %9d triangles: initialize %8.2f s, '
+                      '%10.3g cell updates/s, get_value %8.1f us' %
+                      (domain_type, result['triangles'],
+                       result['initialize_s'], result['cell_updates_per_s'],
+                       result['get_value_us']))
+    finally:
+        shutil.rmtree(directory)
+
+    with open(args.output, 'w') as file_obj:
+        json.dump(results, file_obj, indent=2, sort_keys=True)
+
+    print('results written to %s' % args.output)
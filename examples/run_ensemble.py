@@ -0,0 +1,25 @@
+"""
+Runs an ensemble of ANUGA models over a range of Manning's n values
+"""
+
+from __future__ import print_function
+
+import numpy as np
+
+from anuga_bmi.ensemble import Ensemble
+
+
+if __name__ == '__main__':
+
+    overrides = [{'Mannings_n_parameter': n}
+                 for n in np.linspace(0.02, 0.05, 8)]
+
+    ensemble = Ensemble('anuga.yaml', overrides, n_workers=4)
+
+    depth = ensemble.run(np.arange(10., 110., 10.),
+                         ['land_surface_water__depth'])['land_surface_water__depth']
+
+    ensemble.finalize()
+
+    print('depth samples:', depth.shape)
+    print('throughput: %.1f member-seconds per second' % ensemble.throughput)
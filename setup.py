@@ -11,7 +11,7 @@ setup(name='anugaBMI',
       license='MIT',
       description="Add-on package to use ANUGA within WMT",
       long_description=open('README.md').read(), dependency_links=['https://github.com/mperignon/anuga_core/tarball/master#egg=anuga'],
-      packages=find_packages(exclude=['*.test*']),
+      packages=find_packages(exclude=['tests', '*.test*']),
 setup_requires=['numpy', 'Cython'],
       url='https://github.com/mperignon/anuga_BMI',
       install_requires=['basic-modeling-interface',
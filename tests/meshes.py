@@ -0,0 +1,57 @@
+"""Small triangle meshes for the tests."""
+
+import numpy as np
+
+
+def rectangle_mesh(nx, ny, jitter=0., seed=0):
+    """
+    Mesh of a [0, nx] x [0, ny] rectangle, with each unit cell split in
+    two triangles.
+
+    Parameters
+    ----------
+    nx, ny : int
+        Number of cells along x and y.
+    jitter : float, optional
+        Largest random shift of the interior nodes.
+    seed : int, optional
+        Seed of the shifts.
+
+    Returns
+    -------
+    tuple of (ndarray, ndarray, ndarray)
+        (N, 2) nodes, (M, 3) counterclockwise triangles and (M, 3)
+        neighbours (the triangle across the edge opposite each vertex,
+        -1 on the boundary), as anuga domains have them.
+    """
+
+    x, y = np.meshgrid(np.arange(nx + 1.), np.arange(ny + 1.))
+    nodes = np.column_stack([x.ravel(), y.ravel()])
+
+    interior = ((nodes[:, 0] > 0) & (nodes[:, 0] < nx) &
+                (nodes[:, 1] > 0) & (nodes[:, 1] < ny))
+    shift = np.random.RandomState(seed).uniform(-jitter, jitter,
+                                                (interior.sum(), 2))
+    nodes[interior] += shift
+
+    j, i = np.divmod(np.arange(nx * ny), nx)
+    a = j * (nx + 1) + i
+    b = a + 1
+    c = a + nx + 1
+    d = c + 1
+    triangles = np.concatenate([np.column_stack([a, b, d]),
+                                np.column_stack([a, d, c])])
+
+    edges = {}
+    for t, (p, q, r) in enumerate(triangles):
+        for k, edge in enumerate([(q, r), (r, p), (p, q)]):
+            edges.setdefault(tuple(sorted(edge)), []).append((t, k))
+
+    neighbours = np.full(triangles.shape, -1, dtype=int)
+    for sides in edges.values():
+        if len(sides) == 2:
+            (t0, k0), (t1, k1) = sides
+            neighbours[t0, k0] = t1
+            neighbours[t1, k1] = t0
+
+    return nodes, triangles, neighbours
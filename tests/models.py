@@ -0,0 +1,47 @@
+"""Small BmiAnuga models for the tests."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from anuga_bmi import BmiAnuga
+
+
+# a flood entering a 100 m x 80 m ramp from the left
+RECTANGLE = {'domain_type': 'rectangular',
+             'shape': [10, 8],
+             'size': [100., 80.],
+             'output_filename': 'rectangle',
+             'output_timestep': 5.,
+             'boundary_conditions': {'left': ['Dirichlet', 1., 0., 0.],
+                                     'right': 'Reflective',
+                                     'top': 'Reflective',
+                                     'bottom': 'Reflective'},
+             'initial_flow_depth': 0.}
+
+
+class ModelTestCase(unittest.TestCase):
+    """Test case that runs in a temporary directory, for the output files."""
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        shutil.rmtree(self.directory)
+
+
+    def model(self, **params):
+        """Initialized model of RECTANGLE, with some parameters changed."""
+
+        config = dict(RECTANGLE)
+        config.update(params)
+
+        bmi = BmiAnuga()
+        bmi._initialize_model(config)
+
+        return bmi
@@ -0,0 +1,241 @@
+"""Tests of anuga_bmi.active."""
+
+import unittest
+
+import numpy as np
+
+from anuga_bmi.active import ActiveSet, restrict_to_active_set
+
+from .meshes import rectangle_mesh
+from .models import ModelTestCase
+
+
+def brute_force_mask(neighbours, wet, halo):
+    """Wet triangles grown by halo rings of neighbours."""
+
+    mask = wet.copy()
+    for _ in range(halo):
+        grown = mask.copy()
+        for k in range(neighbours.shape[1]):
+            inside = neighbours[:, k] >= 0
+            grown[inside] |= mask[neighbours[inside, k]]
+        mask = grown
+    return mask
+
+
+class TestActiveSet(unittest.TestCase):
+
+    def setUp(self):
+        _, _, self.neighbours = rectangle_mesh(15, 10)
+        self.rng = np.random.RandomState(24)
+
+
+    def flip(self, height, n):
+        """Wet dry triangles and dry wet ones, at n random triangles."""
+        changed = self.rng.choice(len(height), n, replace=False)
+        height[changed] = np.where(height[changed] > 0.01, 0., 0.5)
+
+
+    def check(self, active_set, height):
+
+        wet = height > active_set.wet_depth
+        counts = active_set._reach.dot(wet.astype(float))
+
+        np.testing.assert_array_equal(active_set.wet, wet)
+        np.testing.assert_array_equal(active_set._counts, counts)
+        np.testing.assert_array_equal(active_set.mask, counts > 0)
+        np.testing.assert_array_equal(active_set.indices,
+                                      np.flatnonzero(counts > 0))
+        np.testing.assert_array_equal(
+            active_set.mask,
+            brute_force_mask(self.neighbours, wet, active_set.halo))
+
+
+    def test_incremental_counts(self):
+
+        for halo in [0, 1, 2]:
+            active_set = ActiveSet(self.neighbours, 0.01, halo=halo)
+            height = np.zeros(len(self.neighbours))
+
+            # few flips are counted incrementally, many are recounted
+            for n in [1, 3, 10, 5, 100, 2, 250, 1, 7]:
+                self.flip(height, n)
+                self.assertTrue(active_set.update(height))
+                self.check(active_set, height)
+
+            self.assertFalse(active_set.update(height))
+
+
+    def test_visited(self):
+
+        active_set = ActiveSet(self.neighbours, 0.01)
+        height = np.zeros(len(self.neighbours))
+        key = active_set.watch()
+        other = active_set.watch()
+        seen = active_set.mask.copy()
+        seen_by_other = active_set.mask.copy()
+
+        for step in range(20):
+            self.flip(height, 4)
+            active_set.update(height)
+            seen |= active_set.mask
+            seen_by_other |= active_set.mask
+
+            if step % 3 == 0:
+                written = self.rng.choice(active_set.size, 2)
+                active_set.touch(written)
+                seen[written] = True
+                seen_by_other[written] = True
+
+            if step % 4 == 3:
+                np.testing.assert_array_equal(active_set.visited(key),
+                                              np.flatnonzero(seen))
+                seen = active_set.mask.copy()
+
+        # each watcher has its own tracking
+        np.testing.assert_array_equal(active_set.visited(other),
+                                      np.flatnonzero(seen_by_other))
+
+        active_set.touch()
+        self.assertEqual(len(active_set.visited(key)), active_set.size)
+        np.testing.assert_array_equal(active_set.visited(key),
+                                      active_set.indices)
+
+
+    def test_statistics(self):
+
+        active_set = ActiveSet(self.neighbours, 0.01)
+        height = np.zeros(len(self.neighbours))
+        height[:30] = 1.
+        active_set.update(height)
+
+        active_set.record('infiltration')
+        active_set.record('infiltration', active_set.size)
+
+        statistics = active_set.statistics
+        self.assertEqual(statistics['active_cells'], len(active_set))
+        self.assertEqual(statistics['active_set_updates'], 1)
+        self.assertAlmostEqual(statistics['skipped_infiltration'],
+                               0.5 * (1. - len(active_set) /
+                                      float(active_set.size)))
+
+
+class Quantity(object):
+
+    def __init__(self, n):
+        self.centroid_values = np.zeros(n)
+
+
+class Domain(object):
+
+    def __init__(self, n):
+        self.quantities = {'shear_stress': Quantity(n)}
+
+
+class RegionOperator(object):
+    """Region-like operator that sets the shear stress at its indices."""
+
+    def __init__(self, domain, value=1.):
+        self.domain = domain
+        self.indices = None
+        self.value = value
+
+    def __call__(self):
+        indices = slice(None) if self.indices is None else self.indices
+        self.domain.quantities['shear_stress'].centroid_values[indices] = self.value
+
+
+class TestRestrictToActiveSet(unittest.TestCase):
+
+    def setUp(self):
+        _, _, self.neighbours = rectangle_mesh(15, 10)
+        self.active_set = ActiveSet(self.neighbours, 0.01)
+        self.domain = Domain(len(self.neighbours))
+
+
+    def test_restricted_calls(self):
+
+        rng = np.random.RandomState(24)
+        height = np.zeros(len(self.neighbours))
+        values = self.domain.quantities['shear_stress'].centroid_values
+
+        operator = restrict_to_active_set(RegionOperator, 'sediment',
+                                          reset=['shear_stress'])(
+            self.domain, self.active_set, value=2.)
+
+        for step in range(10):
+            changed = rng.choice(len(height), 15, replace=False)
+            height[changed] = np.where(height[changed] > 0.01, 0., 0.5)
+            self.active_set.update(height)
+            operator()
+
+            # set on the active triangles, reset where they left the set
+            np.testing.assert_array_equal(values > 0, self.active_set.mask)
+
+        self.assertIn('skipped_sediment', self.active_set.statistics)
+
+
+    def test_empty_set(self):
+
+        operator = restrict_to_active_set(RegionOperator, 'vegetation')(
+            self.domain, self.active_set)
+        operator()
+
+        np.testing.assert_array_equal(
+            self.domain.quantities['shear_stress'].centroid_values, 0.)
+        self.assertEqual(self.active_set.statistics['skipped_vegetation'], 1.)
+
+
+    def test_not_a_region(self):
+
+        class Operator(object):
+            def __init__(self, domain):
+                pass
+
+        self.assertRaises(AssertionError,
+                          restrict_to_active_set(Operator, 'other'),
+                          self.domain, self.active_set)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestActiveSetModel(ModelTestCase):
+
+    def run_model(self, name, **params):
+        """Stage of each SWW frame of a flood run."""
+
+        import netCDF4
+
+        bmi = self.model(output_filename=name, reductions=['max_depth'],
+                         **params)
+        for time in [5., 10., 15., 20.]:
+            bmi.update_until(time)
+
+        # dry a wet area through the BMI
+        depth = bmi.get_value('land_surface_water__depth')
+        bmi.set_value_at_indices('land_surface_water__depth', 0.,
+                                 np.flatnonzero(depth > 0.)[:20])
+        bmi.update_until(25.)
+
+        max_depth = bmi._anuga.monitors.values['max_depth'].copy()
+        bmi.finalize()
+
+        with netCDF4.Dataset(name + '.sww') as dataset:
+            return np.array(dataset.variables['stage'][:]), max_depth
+
+
+    def test_output_matches_full_run(self):
+
+        for output_mode in ['sync', 'async']:
+            full, full_max = self.run_model('full_' + output_mode,
+                                            output_mode=output_mode)
+            active, active_max = self.run_model('active_' + output_mode,
+                                                output_mode=output_mode,
+                                                active_set=True,
+                                                wet_depth=1.0e-3)
+
+            self.assertEqual(full.shape, active.shape)
+            np.testing.assert_allclose(active, full, atol=1.0e-3)
+            np.testing.assert_allclose(active_max, full_max, atol=1.0e-3)
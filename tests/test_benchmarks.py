@@ -0,0 +1,120 @@
+"""Tests of the benchmark suite and of the comparison of its results."""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from .models import ModelTestCase
+
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'benchmarks')
+
+
+def run_script(name, *args):
+    """Exit status and output of a benchmark script."""
+
+    process = subprocess.Popen([sys.executable,
+                                os.path.join(BENCHMARKS, name)] +
+                               [str(arg) for arg in args],
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    output = process.communicate()[0].decode()
+
+    return process.returncode, output
+
+
+def write_results(filename, cases):
+
+    results = {'metadata': {'version': '1.0', 'anuga': '2.0'},
+               'results': [dict(case) for case in cases]}
+
+    with open(filename, 'w') as file_obj:
+        json.dump(results, file_obj)
+
+
+CASE = {'domain': 'rectangular', 'target_triangles': 10000,
+        'triangles': 10000, 'initialize_s': 2.,
+        'cell_updates_per_s': 1.e6, 'get_value_us': 10.}
+
+
+class TestCompare(ModelTestCase):
+
+    def test_no_regression(self):
+
+        faster = dict(CASE, initialize_s=1., cell_updates_per_s=2.e6)
+        write_results('baseline.json', [CASE])
+        write_results('new.json', [faster])
+
+        status, output = run_script('compare.py', 'baseline.json', 'new.json')
+
+        self.assertEqual(status, 0, output)
+        self.assertIn('0 of 3 metrics regressed', output)
+        self.assertNotIn('REGRESSION', output)
+
+
+    def test_regression(self):
+
+        # 2 s -> 2.1 s is within the threshold, half the throughput is not
+        slower = dict(CASE, initialize_s=2.1, cell_updates_per_s=5.e5)
+        write_results('baseline.json', [CASE])
+        write_results('new.json', [slower])
+
+        status, output = run_script('compare.py', 'baseline.json', 'new.json',
+                                    0.1)
+
+        self.assertEqual(status, 1, output)
+        self.assertIn('1 of 3 metrics regressed', output)
+
+        regressions = [line for line in output.splitlines()
+                       if 'REGRESSION' in line]
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('cell_updates_per_s', regressions[0])
+
+
+    def test_cases_in_one_file(self):
+
+        other = dict(CASE, target_triangles=100000)
+        write_results('baseline.json', [CASE, other])
+        write_results('new.json', [CASE])
+
+        status, output = run_script('compare.py', 'baseline.json', 'new.json')
+
+        self.assertEqual(status, 0, output)
+        self.assertIn('only in one file: rectangular, 100000 triangles',
+                      output)
+
+
+class TestSuite(ModelTestCase):
+
+    def test_small_run(self):
+
+        status, output = run_script('suite.py', '--sizes', '500',
+                                    '--domains', 'rectangular,outline',
+                                    '--steps', 2, '--repeat', 3,
+                                    '--output', 'results.json')
+
+        self.assertEqual(status, 0, output)
+
+        with open('results.json', 'r') as file_obj:
+            results = json.load(file_obj)
+
+        self.assertEqual(sorted(result['domain']
+                                for result in results['results']),
+                         ['outline', 'rectangular'])
+
+        for result in results['results']:
+            self.assertEqual(result['target_triangles'], 500)
+            self.assertGreater(result['triangles'], 0)
+            self.assertGreater(result['cell_updates_per_s'], 0.)
+
+        # a run compared with itself has no regression
+        status, output = run_script('compare.py', 'results.json',
+                                    'results.json', 0.)
+
+        self.assertEqual(status, 0, output)
+
+
+if __name__ == '__main__':
+    unittest.main()
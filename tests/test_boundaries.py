@@ -0,0 +1,86 @@
+"""Tests of anuga_bmi.boundaries."""
+
+import unittest
+
+import numpy as np
+
+from anuga_bmi.boundaries import TimeSeries
+
+
+class TestTimeSeries(unittest.TestCase):
+
+    def setUp(self):
+        self.times = np.array([0., 10., 15., 40., 41., 100.])
+        self.stage = np.array([1., 3., 2., 2.5, 0., 4.])
+        self.discharge = np.array([0., 5., 7., 1., 1., -2.])
+        self.series = TimeSeries(self.times, {'stage': self.stage,
+                                              'discharge': self.discharge})
+
+
+    def expected(self, t):
+        return [np.interp(t, self.times, self.discharge),
+                np.interp(t, self.times, self.stage)]
+
+
+    def check(self, times):
+        for t in times:
+            np.testing.assert_allclose(self.series.interpolate(t),
+                                       self.expected(t), err_msg='t = %g' % t)
+
+
+    def test_columns(self):
+        self.assertEqual(self.series.names, ['discharge', 'stage'])
+        self.assertEqual(self.series.index('stage'), 1)
+
+
+    def test_forward(self):
+        # small steps move the cursor by at most one interval
+        self.check(np.arange(0., 100.5, 0.5))
+
+
+    def test_jumps(self):
+        # large steps forward and back move it by several
+        self.check([2., 99., 12., 40.5, 0.5, 41., 15., 70., 10.])
+
+
+    def test_backward(self):
+        self.check(np.arange(100., -0.5, -0.5))
+
+
+    def test_out_of_range(self):
+
+        self.series.interpolate(50.)
+        np.testing.assert_array_equal(self.series.interpolate(-5.), [0., 1.])
+        np.testing.assert_array_equal(self.series.interpolate(500.), [-2., 4.])
+
+        # the cursor is still usable after out-of-range times
+        self.check([45., 12., 41.5])
+
+
+    def test_times_on_nodes(self):
+        self.check(self.times)
+        self.check(self.times[::-1])
+
+
+    def test_out(self):
+
+        out = np.empty(2)
+        self.assertIs(self.series.interpolate(12.5, out), out)
+        np.testing.assert_allclose(out, self.expected(12.5))
+
+
+    def test_single_time(self):
+
+        series = TimeSeries([5.], {'stage': [2.]})
+        for t in [0., 5., 10.]:
+            np.testing.assert_array_equal(series.interpolate(t), [2.])
+
+
+    def test_invalid_times(self):
+        self.assertRaises(ValueError, TimeSeries, [], {'stage': []})
+        self.assertRaises(ValueError, TimeSeries, [0., 1., 1.],
+                          {'stage': [0., 1., 2.]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""Tests of anuga_bmi.checkpoint."""
+
+import numpy as np
+
+from anuga_bmi import BmiAnuga
+
+from .models import ModelTestCase
+
+
+NAMES = ['land_surface_water_surface__elevation',
+         'land_surface_water_flow__x_component_of_momentum',
+         'land_surface_water_flow__y_component_of_momentum',
+         'land_surface__elevation']
+
+
+class TestCheckpoint(ModelTestCase):
+
+    def run_and_save(self, time, **params):
+
+        bmi = self.model(reductions=['max_depth', 'arrival_time'], **params)
+        bmi.update_until(time)
+        bmi.save_state('snapshot')
+
+        return bmi
+
+
+    def test_round_trip(self):
+
+        bmi = self.run_and_save(12.5)
+        saved = dict((name, bmi.get_value(name).copy()) for name in NAMES)
+        saved_reductions = dict((name, values.copy()) for name, values
+                                in bmi._anuga.monitors.values.items())
+        bmi.finalize()
+
+        restarted = BmiAnuga()
+        restarted.load_state('snapshot')
+
+        self.assertEqual(restarted.get_current_time(), 12.5)
+        self.assertEqual(restarted._anuga.domain.get_time(), 12.5)
+        for name in NAMES:
+            np.testing.assert_array_equal(restarted.get_value(name),
+                                          saved[name], err_msg=name)
+
+        # the reductions carry on from the snapshot
+        for name, values in saved_reductions.items():
+            np.testing.assert_array_equal(
+                restarted._anuga.monitors.values[name], values, err_msg=name)
+
+        self.assertEqual(restarted._anuga.domain.get_name(),
+                         'rectangle_restart_12p500')
+        restarted.finalize()
+
+
+    def test_restart_continues_the_run(self):
+
+        reference = self.model(output_filename='reference',
+                               reductions=['max_depth'])
+        reference.update_until(20.)
+
+        self.run_and_save(10.).finalize()
+        restarted = BmiAnuga()
+        restarted.load_state('snapshot')
+        restarted.update_until(20.)
+
+        for name in NAMES:
+            np.testing.assert_allclose(restarted.get_value(name),
+                                       reference.get_value(name),
+                                       atol=1.0e-6, err_msg=name)
+        np.testing.assert_allclose(restarted._anuga.monitors.values['max_depth'],
+                                   reference._anuga.monitors.values['max_depth'],
+                                   atol=1.0e-6)
+
+        reference.finalize()
+        restarted.finalize()
+
+
+    def test_restart_names(self):
+
+        # restarts close in time keep their own output files
+        names = set()
+        for time in [1000000.2, 1000000.4]:
+            bmi = self.model(output_timestep=1000000.)
+            bmi._anuga.domain.set_time(time)
+            bmi.save_state('snapshot_%g' % len(names))
+            bmi.finalize()
+
+            restarted = BmiAnuga()
+            restarted.load_state('snapshot_%g' % len(names))
+            names.add(restarted._anuga.domain.get_name())
+            restarted.finalize()
+
+        self.assertEqual(names, set(['rectangle_restart_1000000p200',
+                                     'rectangle_restart_1000000p400']))
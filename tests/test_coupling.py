@@ -0,0 +1,122 @@
+"""Tests of anuga_bmi.coupling and the adaptive coupling of the BMI."""
+
+import unittest
+
+from anuga_bmi.coupling import CouplingController
+
+from .models import ModelTestCase
+
+
+class TestCouplingController(unittest.TestCase):
+
+    def setUp(self):
+        self.controller = CouplingController(1., 0.1, 10., target_steps=50.,
+                                             max_wet_change=0.05, growth=2.)
+
+
+    def test_timestep_limit(self):
+
+        # 100 steps in 1 s: 50 steps take 0.5 s
+        self.assertEqual(self.controller.record(1., 100, None), 0.5)
+        self.assertEqual(self.controller.limit, 'timestep')
+
+
+    def test_growth_limit(self):
+
+        self.assertEqual(self.controller.record(1., 1, None), 2.)
+        self.assertEqual(self.controller.record(2., 1, None), 4.)
+        self.assertEqual(self.controller.limit, 'growth')
+
+
+    def test_wet_change_limit(self):
+
+        self.controller.record(1., 10, 1000)
+
+        # 10 % more wet cells in 1 s: 5 % take 0.5 s
+        self.assertEqual(self.controller.record(1., 10, 1100), 0.5)
+        self.assertEqual(self.controller.limit, 'wet_change')
+        self.assertEqual(self.controller.statistics['wet_cells'], 1100)
+
+
+    def test_uncounted_wet_cells(self):
+
+        self.assertEqual(self.controller.record(1., 10, 1000), 2.)
+        self.assertEqual(self.controller.record(2., 10, None), 4.)
+
+        # no previous count to compare with
+        self.assertEqual(self.controller.record(4., 40, 5000), 5.)
+        self.assertEqual(self.controller.limit, 'timestep')
+
+
+    def test_bounds(self):
+
+        self.assertEqual(self.controller.record(1., 10000, None), 0.1)
+        self.assertEqual(self.controller.limit, 'min_interval')
+
+        for _ in range(10):
+            self.controller.record(self.controller.interval, 1, None)
+        self.assertEqual(self.controller.interval, 10.)
+        self.assertEqual(self.controller.limit, 'max_interval')
+
+        # nothing to learn from an empty update
+        self.assertEqual(self.controller.record(0., 0, None), 10.)
+
+        self.assertRaises(AssertionError, CouplingController, 1., 2., 1.)
+        self.assertRaises(AssertionError, CouplingController, 1., 0.1, 10.,
+                          growth=1.)
+
+
+class TestCouplingModes(ModelTestCase):
+
+    def count_wet_cell_counts(self, bmi):
+
+        solver = bmi._anuga
+        solver.wet_cell_counts = 0
+        wet_cell_count = solver.wet_cell_count
+
+        def counted():
+            solver.wet_cell_counts += 1
+            return wet_cell_count()
+
+        solver.wet_cell_count = counted
+
+        return solver
+
+
+    def test_fixed(self):
+
+        bmi = self.model(coupling_timestep=1.)
+        solver = self.count_wet_cell_counts(bmi)
+
+        for _ in range(3):
+            bmi.update()
+
+        self.assertEqual(bmi.get_current_time(), 3.)
+        self.assertEqual(bmi.get_time_step(), 1.)
+        self.assertEqual(solver.wet_cell_counts, 0)
+        self.assertIsNone(bmi.get_stepping_statistics()['wet_cells'])
+
+
+    def test_adaptive(self):
+
+        bmi = self.model(coupling_timestep=1., coupling_mode='adaptive',
+                         coupling_min_timestep=0.5,
+                         coupling_max_timestep=4.)
+        solver = self.count_wet_cell_counts(bmi)
+
+        times = [bmi.get_current_time()]
+        for _ in range(4):
+            bmi.update()
+            times.append(bmi.get_current_time())
+
+            # update() follows the recommended interval
+            self.assertEqual(bmi.get_time_step(),
+                             bmi.get_recommended_time_step())
+            self.assertTrue(0.5 <= bmi.get_time_step() <= 4.)
+
+        self.assertEqual(solver.wet_cell_counts, 4)
+
+        statistics = bmi.get_stepping_statistics()
+        self.assertEqual(statistics['wet_cells'], solver.wet_cell_count())
+        self.assertGreater(statistics['wet_cells'], 0)
+        self.assertEqual(times[1], 1.)
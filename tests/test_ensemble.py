@@ -0,0 +1,89 @@
+"""Tests of anuga_bmi.ensemble."""
+
+import numpy as np
+import yaml
+
+from anuga_bmi.ensemble import Ensemble
+
+from .models import RECTANGLE, ModelTestCase
+
+
+STAGE = 'land_surface_water_surface__elevation'
+FRICTION = 'manning_n_parameter'
+
+
+class TestEnsemble(ModelTestCase):
+
+    def setUp(self):
+
+        super(TestEnsemble, self).setUp()
+
+        with open('rectangle.yaml', 'w') as file_obj:
+            yaml.safe_dump(RECTANGLE, file_obj)
+
+        # members 0 and 2 are the same model
+        self.ensemble = Ensemble('rectangle.yaml',
+                                 [{'Mannings_n_parameter': 0.01},
+                                  {'Mannings_n_parameter': np.float64(0.1)},
+                                  {'Mannings_n_parameter': 0.01}],
+                                 n_workers=2, directory='ensemble')
+
+
+    def tearDown(self):
+        self.ensemble.finalize()
+        super(TestEnsemble, self).tearDown()
+
+
+    def test_members(self):
+
+        self.assertEqual(len(self.ensemble), 3)
+
+        friction = self.ensemble.get_value(FRICTION)
+        n_cells = len(self.model().get_value(FRICTION))
+        self.assertEqual(friction.shape, (3, n_cells))
+        np.testing.assert_allclose(friction[:, 0], [0.01, 0.1, 0.01])
+
+        self.ensemble.update_until(5.)
+        stage = self.ensemble.get_value(STAGE)
+
+        np.testing.assert_array_equal(stage[0], stage[2])
+        self.assertTrue(np.any(stage[0] != stage[1]))
+        self.assertGreater(self.ensemble.throughput, 0.)
+
+
+    def test_set_value(self):
+
+        stage = self.ensemble.get_value(STAGE)
+        stage[1] += 0.5
+        self.ensemble.set_value(STAGE, stage)
+
+        np.testing.assert_array_equal(self.ensemble.get_value(STAGE), stage)
+
+
+    def test_run(self):
+
+        samples = self.ensemble.run([1., 2., 3.], [STAGE, FRICTION])
+
+        self.assertEqual(sorted(samples), sorted([STAGE, FRICTION]))
+        self.assertEqual(samples[STAGE].shape[:2], (3, 3))
+        np.testing.assert_array_equal(samples[STAGE][:, -1],
+                                      self.ensemble.get_value(STAGE))
+        np.testing.assert_array_equal(samples[STAGE][0], samples[STAGE][2])
+
+
+    def test_worker_errors(self):
+
+        self.assertRaises(RuntimeError, self.ensemble.get_value, 'no_such_name')
+
+        # the workers keep serving after an error
+        self.assertEqual(self.ensemble.get_value(FRICTION).shape[0], 3)
+
+
+class TestEnsembleInput(ModelTestCase):
+
+    def test_no_members(self):
+
+        with open('rectangle.yaml', 'w') as file_obj:
+            yaml.safe_dump(RECTANGLE, file_obj)
+
+        self.assertRaises(ValueError, Ensemble, 'rectangle.yaml', [])
@@ -0,0 +1,190 @@
+"""Tests of anuga_bmi.fields."""
+
+import unittest
+
+import numpy as np
+
+from anuga_bmi.fields import (LandCover, ResamplerCache, read_land_cover_table,
+                              read_raster)
+from anuga_bmi.raster import RasterGrid
+
+from .meshes import rectangle_mesh
+from .models import ModelTestCase
+
+
+# 2 x 2 raster of 50 m cells over RECTANGLE (100 m x 80 m), with a nodata
+# cell at the bottom right
+LAND_COVER = """ncols 2
+nrows 2
+xllcorner 0.
+yllcorner 0.
+cellsize 50.
+NODATA_value -9999
+1 2
+1 -9999
+"""
+
+
+class TestLandCoverTable(ModelTestCase):
+
+    def test_dict(self):
+
+        codes, columns = read_land_cover_table(
+            {2: {'manning_n': 0.1, 'stem_spacing': 0.5},
+             1: {'manning_n': 0.03}})
+
+        np.testing.assert_array_equal(codes, [1., 2.])
+        self.assertEqual(sorted(columns), ['manning_n', 'stem_spacing'])
+        np.testing.assert_array_equal(columns['manning_n'], [0.03, 0.1])
+        np.testing.assert_array_equal(columns['stem_spacing'], [np.nan, 0.5])
+
+
+    def test_csv(self):
+
+        with open('table.csv', 'w') as file_obj:
+            file_obj.write('code, Manning_n, stem_diameter\n'
+                           '2,0.1,0.01\n'
+                           '1,0.03,\n'
+                           '\n')
+
+        codes, columns = read_land_cover_table('table.csv')
+
+        np.testing.assert_array_equal(codes, [1., 2.])
+        np.testing.assert_array_equal(columns['manning_n'], [0.03, 0.1])
+        np.testing.assert_array_equal(columns['stem_diameter'], [np.nan, 0.01])
+
+
+    def test_unknown_column(self):
+        self.assertRaises(ValueError, read_land_cover_table,
+                          {1: {'manning': 0.03}})
+
+
+class TestLandCover(unittest.TestCase):
+
+    def test_lookup(self):
+
+        land_cover = LandCover([3., 1., np.nan, 3., 7.])
+
+        np.testing.assert_array_equal(land_cover.classes, [1., 3., 7.])
+
+        # class 7 is not in the table, class 1 has no value
+        values = land_cover.lookup(np.array([1., 2., 3.]),
+                                   np.array([np.nan, 5., 6.]),
+                                   fill=np.arange(5.))
+
+        np.testing.assert_array_equal(values, [6., 1., 2., 6., 4.])
+
+
+    def test_empty_table(self):
+
+        land_cover = LandCover([1., 2.])
+
+        values = land_cover.lookup(np.array([]), np.array([]),
+                                   fill=np.array([8., 9.]))
+
+        np.testing.assert_array_equal(values, [8., 9.])
+
+
+class TestResamplerCache(unittest.TestCase):
+
+    def test_one_resampler_per_geometry(self):
+
+        nodes, triangles, _ = rectangle_mesh(4, 4)
+        cache = ResamplerCache(nodes, triangles)
+
+        grid = RasterGrid(np.array([1., 3.]), np.array([3., 1.]))
+        same = RasterGrid(np.array([1., 3.]), np.array([3., 1.]))
+        finer = RasterGrid(np.arange(0.5, 4., 1.), np.arange(3.5, 0., -1.))
+
+        resampler = cache.get(grid)
+
+        self.assertIs(cache.get(same), resampler)
+        self.assertEqual(len(cache), 1)
+        self.assertIsNot(cache.get(finer), resampler)
+        self.assertEqual(len(cache), 2)
+
+        # a constant raster is the same constant on every triangle
+        values = resampler.area_mean(np.full(4, 0.5),
+                                     fill=np.zeros(len(triangles)))
+        np.testing.assert_allclose(values, 0.5)
+
+
+class TestFields(ModelTestCase):
+
+    def setUp(self):
+
+        ModelTestCase.setUp(self)
+
+        with open('land_cover.asc', 'w') as file_obj:
+            file_obj.write(LAND_COVER)
+
+
+    def test_manning_raster(self):
+
+        with open('manning.asc', 'w') as file_obj:
+            file_obj.write(LAND_COVER.replace('1 2\n1 -9999',
+                                              '0.02 0.04\n0.02 -9999'))
+
+        bmi = self.model(Mannings_n_parameter='manning.asc')
+
+        x, y = bmi._anuga.domain.centroid_coordinates.T
+        friction = bmi.get_value('manning_n_parameter')
+
+        # the triangles of the nodata cell keep the default friction, 0
+        expected = np.where(x < 50., 0.02, np.where(y > 50., 0.04, 0.))
+        np.testing.assert_allclose(friction, expected)
+
+        bmi.finalize()
+
+
+    def test_land_cover(self):
+
+        bmi = self.model(Mannings_n_parameter=0.05,
+                         land_cover_filename='land_cover.asc',
+                         land_cover_table={1: {'manning_n': 0.03},
+                                           2: {'manning_n': 0.1}})
+
+        x, y = bmi._anuga.domain.centroid_coordinates.T
+        code = np.where(x < 50., 1, np.where(y > 50., 2, 0))
+
+        expected = np.choose(code, [0.05, 0.03, 0.1])
+        np.testing.assert_allclose(bmi.get_value('manning_n_parameter'),
+                                   expected)
+
+        # a new scenario reuses the classes of the triangles; class 2 has
+        # no value in it and keeps its friction
+        with open('scenario.csv', 'w') as file_obj:
+            file_obj.write('code,manning_n\n1,0.06\n')
+
+        bmi.set_land_cover('scenario.csv')
+
+        expected = np.choose(code, [0.05, 0.06, 0.1])
+        np.testing.assert_allclose(bmi.get_value('manning_n_parameter'),
+                                   expected)
+
+        self.assertEqual(list(bmi._anuga._land_covers), ['land_cover.asc'])
+        self.assertEqual(len(bmi._anuga.resamplers), 1)
+
+        bmi.finalize()
+
+
+    def test_land_cover_needs_a_raster(self):
+
+        bmi = self.model()
+
+        self.assertRaises(AssertionError, bmi.set_land_cover,
+                          {1: {'manning_n': 0.03}})
+
+        bmi.finalize()
+
+
+    def test_read_raster(self):
+
+        grid, values = read_raster('land_cover.asc')
+
+        np.testing.assert_array_equal(grid.x, [25., 75.])
+        np.testing.assert_array_equal(values, [1., 2., 1., np.nan])
+
+
+if __name__ == '__main__':
+    unittest.main()
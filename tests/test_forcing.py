@@ -0,0 +1,80 @@
+"""Tests of anuga_bmi.forcing."""
+
+import numpy as np
+
+from anuga_bmi.forcing import RATE_UNITS, TriangleField, rate_field
+
+from .models import ModelTestCase
+
+
+CLOSED = {'left': 'Reflective', 'right': 'Reflective',
+          'top': 'Reflective', 'bottom': 'Reflective'}
+
+
+def volume(bmi):
+    domain = bmi._anuga.domain
+    return np.dot(domain.quantities['height'].centroid_values, domain.areas)
+
+
+class TestRates(ModelTestCase):
+
+    def test_units(self):
+
+        domain = self.model()._anuga.domain
+
+        self.assertAlmostEqual(rate_field(domain, 36., 'mm/hr'), 1.e-5)
+        self.assertAlmostEqual(rate_field(domain, 86.4, 'mm/day'), 1.e-6)
+        self.assertAlmostEqual(rate_field(domain, 1., 'in/hr'),
+                               RATE_UNITS['in/hr'])
+        self.assertRaises(ValueError, rate_field, domain, 1., 'mm/week')
+
+
+    def test_raster_rate(self):
+
+        # 50 m cells on the 100 m x 80 m domain, which the triangle
+        # edges do not cross
+        with open('rain.asc', 'w') as file_obj:
+            file_obj.write('ncols 2\nnrows 2\nxllcorner 0\nyllcorner -20\n'
+                           'cellsize 50\n1 2\n3 4\n')
+
+        domain = self.model()._anuga.domain
+        rate = rate_field(domain, 'rain.asc', 'mm/s')
+
+        self.assertIsInstance(rate, TriangleField)
+
+        x = domain.centroid_coordinates[:, 0]
+        y = domain.centroid_coordinates[:, 1]
+        expected = np.where(y > 30., np.where(x < 50., 1., 2.),
+                            np.where(x < 50., 3., 4.)) * 1.e-3
+        np.testing.assert_allclose(rate.at(0.), expected)
+
+
+class TestOperators(ModelTestCase):
+
+    def test_rainfall_volume(self):
+
+        bmi = self.model(boundary_conditions=CLOSED, rainfall_rate=360.)
+        area = bmi._anuga.domain.areas.sum()
+
+        bmi.update_until(20.)
+
+        # 360 mm/hr for 20 s
+        self.assertAlmostEqual(volume(bmi), 2.e-3 * area)
+        self.assertAlmostEqual(np.dot(bmi._anuga.rainfall.depth,
+                                      bmi._anuga.domain.areas), 2.e-3 * area)
+
+
+    def test_infiltration_volume(self):
+
+        bmi = self.model(boundary_conditions=CLOSED, initial_flow_depth=0.01,
+                         infiltration_rate=3600.)
+        initial = volume(bmi)
+
+        bmi.update_until(5.)
+        lost = np.dot(bmi._anuga.infiltration.depth, bmi._anuga.domain.areas)
+
+        # at most 1 mm/s for 5 s
+        self.assertAlmostEqual(volume(bmi), initial - lost)
+        self.assertLessEqual(lost, 5.e-3 * bmi._anuga.domain.areas.sum() + 1.e-9)
+        self.assertTrue(np.all(
+            bmi._anuga.domain.quantities['height'].centroid_values >= 0.))
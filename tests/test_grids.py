@@ -0,0 +1,60 @@
+"""Tests of the grids of BmiAnuga."""
+
+import numpy as np
+
+from .models import ModelTestCase
+
+
+class TestGrids(ModelTestCase):
+
+    def setUp(self):
+        ModelTestCase.setUp(self)
+        self.bmi = self.model()
+
+
+    def tearDown(self):
+        self.bmi.finalize()
+        ModelTestCase.tearDown(self)
+
+
+    def test_coordinates_match_sizes(self):
+
+        for grid_id in range(3):
+            size = self.bmi.get_grid_size(grid_id)
+            self.assertEqual(len(self.bmi.get_grid_x(grid_id)), size)
+            self.assertEqual(len(self.bmi.get_grid_y(grid_id)), size)
+            self.assertEqual(len(self.bmi.get_grid_z(grid_id)), size)
+
+
+    def test_values_are_at_the_centroids(self):
+
+        bmi = self.bmi
+        name = 'land_surface__elevation'
+        grid_id = bmi.get_var_grid(name)
+
+        self.assertEqual(grid_id, 0)
+        self.assertEqual(bmi.get_grid_size(grid_id), len(bmi.get_value(name)))
+        np.testing.assert_array_equal(bmi.get_grid_x(grid_id),
+                                      bmi.get_grid_face_x(grid_id))
+        np.testing.assert_array_equal(bmi.get_grid_z(grid_id),
+                                      bmi.get_value(name))
+
+        # the centroids are the means of the nodes of each face
+        face_nodes = bmi.get_grid_face_nodes(grid_id).reshape(-1, 3)
+        np.testing.assert_allclose(bmi.get_grid_x(grid_id),
+                                   bmi.get_grid_node_x(grid_id)[face_nodes].mean(axis=1))
+        np.testing.assert_allclose(bmi.get_grid_y(grid_id),
+                                   bmi.get_grid_node_y(grid_id)[face_nodes].mean(axis=1))
+
+
+    def test_node_and_edge_grids(self):
+
+        bmi = self.bmi
+        np.testing.assert_array_equal(bmi.get_grid_x(1), bmi.get_grid_node_x(1))
+        np.testing.assert_array_equal(bmi.get_grid_y(1), bmi.get_grid_node_y(1))
+
+        edge_nodes = bmi.get_grid_edge_nodes(2).reshape(-1, 2)
+        np.testing.assert_allclose(bmi.get_grid_x(2),
+                                   bmi.get_grid_node_x(2)[edge_nodes].mean(axis=1))
+        np.testing.assert_allclose(bmi.get_grid_z(2),
+                                   bmi.get_grid_z(1)[edge_nodes].mean(axis=1))
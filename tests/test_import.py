@@ -0,0 +1,56 @@
+"""Tests of the startup cost of anuga_bmi."""
+
+import subprocess
+import sys
+import unittest
+
+
+def loaded_modules(code, modules=('anuga', 'yaml', 'netCDF4', 'scipy')):
+    """Modules imported by running code in a fresh interpreter."""
+
+    code += ('\nimport sys\nprint(" ".join(name for name in %r '
+             'if name in sys.modules))' % (modules,))
+
+    output = subprocess.check_output([sys.executable, '-c', code])
+
+    return output.decode().split()
+
+
+class TestLazyImport(unittest.TestCase):
+
+    def test_import(self):
+        self.assertEqual(loaded_modules('import anuga_bmi'), [])
+
+
+    def test_metadata(self):
+
+        code = '\n'.join([
+            'from anuga_bmi import BmiAnuga',
+            'bmi = BmiAnuga()',
+            'bmi.get_component_name()',
+            'bmi.get_start_time()',
+            'for name in bmi.get_input_var_names() + bmi.get_output_var_names():',
+            '    grid = bmi.get_var_grid(name)',
+            '    bmi.get_var_units(name)',
+            '    bmi.get_var_location(name)',
+            '    bmi.get_grid_type(grid)',
+        ])
+
+        self.assertEqual(loaded_modules(code), [])
+
+
+    def test_solver_is_loaded_on_initialize(self):
+
+        code = '\n'.join([
+            'import os, tempfile',
+            'from anuga_bmi import BmiAnuga',
+            'from tests.models import RECTANGLE',
+            'os.chdir(tempfile.mkdtemp())',
+            'BmiAnuga()._initialize_model(dict(RECTANGLE))',
+        ])
+
+        self.assertIn('anuga', loaded_modules(code, modules=('anuga',)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+"""Tests of anuga_bmi.indexing."""
+
+import unittest
+
+import numpy as np
+
+from anuga_bmi.indexing import IndexPlan
+
+from .models import ModelTestCase
+
+
+class TestIndexPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.RandomState(17)
+
+
+    def index_sets(self):
+        """Unsorted and repeated indices, scattered or in long runs."""
+
+        size = 500
+        yield size, [7]
+        yield size, [3, 3, 3]
+        yield size, self.rng.randint(0, size, 200)
+        yield size, self.rng.permutation(size)[:100]
+        yield size, np.r_[np.arange(300, 400), np.arange(10, 80), [350, 12, 12]]
+        yield size, np.arange(size)
+
+
+    def test_gather(self):
+
+        for size, indices in self.index_sets():
+            array = self.rng.rand(size)
+            plan = IndexPlan(indices, size)
+
+            np.testing.assert_array_equal(plan.gather(array), array[indices])
+
+            out = np.empty(len(indices))
+            self.assertIs(plan.gather(array, out), out)
+            np.testing.assert_array_equal(out, array[indices])
+
+
+    def test_scatter(self):
+
+        for size, indices in self.index_sets():
+            values = self.rng.rand(len(indices))
+            plan = IndexPlan(indices, size)
+
+            # the last of repeated indices wins, as with fancy indexing
+            expected = np.zeros(size)
+            expected[indices] = values
+            array = np.zeros(size)
+            plan.scatter(array, values)
+            np.testing.assert_array_equal(array, expected)
+
+            expected[indices] = 2.5
+            plan.scatter(array, 2.5)
+            np.testing.assert_array_equal(array, expected)
+
+
+    def test_unique_sums(self):
+
+        for size, indices in self.index_sets():
+            values = self.rng.rand(len(indices))
+            plan = IndexPlan(indices, size)
+
+            expected = np.zeros(size)
+            np.add.at(expected, indices, values)
+            np.testing.assert_allclose(plan.unique_sums(values),
+                                       expected[plan.indices])
+
+            # a scalar applies once per requested index
+            expected = np.zeros(size)
+            np.add.at(expected, indices, 0.5)
+            np.testing.assert_allclose(plan.unique_sums(0.5) * np.ones(len(plan.indices)),
+                                       expected[plan.indices])
+
+
+    def test_selector(self):
+
+        plan = IndexPlan([5, 3, 4, 4], 10)
+        self.assertEqual(plan.selector, slice(3, 6))
+        np.testing.assert_array_equal(plan.indices, [3, 4, 5])
+
+        plan = IndexPlan([8, 1, 1], 10)
+        np.testing.assert_array_equal(plan.selector, [1, 8])
+
+
+    def test_invalid_indices(self):
+
+        self.assertRaises(IndexError, IndexPlan, [0, 10], 10)
+        self.assertRaises(IndexError, IndexPlan, [-1], 10)
+        self.assertRaises(TypeError, IndexPlan, [0.5], 10)
+
+
+class TestElevationChange(ModelTestCase):
+
+    def test_scalar_with_repeated_indices(self):
+
+        bmi = self.model(initial_flow_depth=0.5)
+        elevation = bmi.get_value('land_surface__elevation')
+        stage = bmi.get_value('land_surface_water_surface__elevation')
+
+        # a scalar counts once per occurrence: 3 and 7 change by 0.75 and 0.5
+        for indices in [[3, 7, 3, 3, 7], bmi.create_index_plan([3, 7, 3, 3, 7])]:
+            bmi.add_elevation_change(0.25, indices)
+
+        expected = np.zeros(len(elevation))
+        expected[[3, 7]] = [1.5, 1.]
+
+        np.testing.assert_allclose(
+            bmi.get_value('land_surface__elevation') - elevation, expected)
+        np.testing.assert_allclose(
+            bmi.get_value('land_surface_water_surface__elevation') - stage,
+            expected)
+        np.testing.assert_allclose(bmi.get_cumulative_elevation_change(),
+                                   expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+"""Tests of anuga_bmi.mesh_cache."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from anuga_bmi.mesh_cache import (MeshCache, decode_boundary, encode_boundary,
+                                  mesh_key)
+
+from .meshes import rectangle_mesh
+from .models import ModelTestCase
+
+
+POLYGON = [[0., 0.], [10., 0.], [10., 5.], [0., 5.]]
+TAGS = {'bottom': [0], 'right': [1], 'top': [2], 'left': [3]}
+
+# projection of the elevation rasters, which anuga reads with them
+PRJ = '''Projection    UTM
+Zone          56
+Datum         WGS84
+Zunits        NO
+Units         METERS
+Spheroid      WGS84
+Xshift        0.0000000000
+Yshift        10000000.0000000000
+Parameters
+'''
+
+
+class TestMeshCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.elevation = os.path.join(self.directory, 'elevation.asc')
+        self.write_elevation('1 2\n3 4\n')
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def write_elevation(self, text, filename=None):
+        with open(filename or self.elevation, 'w') as file_obj:
+            file_obj.write('ncols 2\nnrows 2\nxllcorner 0\nyllcorner 0\n'
+                           'cellsize 5\n' + text)
+
+
+    def key(self, **changes):
+
+        args = {'bounding_polygon': POLYGON,
+                'interior_regions': [[[[1., 1.], [2., 1.], [2., 2.]], 0.5]],
+                'elevation_filename': self.elevation,
+                'boundary_tags': TAGS,
+                'maximum_triangle_area': 1.}
+        args.update(changes)
+
+        return mesh_key(**args)
+
+
+    def test_key(self):
+
+        key = self.key()
+        self.assertEqual(self.key(), key)
+
+        # equal inputs in another order or another file give the same key
+        self.assertEqual(self.key(boundary_tags=dict(reversed(list(TAGS.items())))),
+                         key)
+        copy = os.path.join(self.directory, 'copy.asc')
+        shutil.copy(self.elevation, copy)
+        self.assertEqual(self.key(elevation_filename=copy), key)
+
+        # anything that changes the mesh or the elevation changes the key
+        others = [self.key(maximum_triangle_area=2.),
+                  self.key(interior_regions=None),
+                  self.key(bounding_polygon=np.array(POLYGON) * 2.),
+                  self.key(boundary_tags={'exterior': [0, 1, 2, 3]})]
+        self.write_elevation('1 2\n3 5\n')
+        others.append(self.key())
+
+        self.assertEqual(len(set(others + [key])), len(others) + 1)
+
+
+    def test_round_trip(self):
+
+        nodes, triangles, _ = rectangle_mesh(3, 2)
+        boundary = {(0, 2): 'bottom', (1, 2): 'bottom', (8, 0): 'top',
+                    (5, 1): 'exterior'}
+        elevation = np.random.RandomState(0).rand(len(triangles), 3)
+
+        cache = MeshCache(os.path.join(self.directory, 'cache'))
+        self.assertIsNone(cache.load('abc'))
+
+        cache.store('abc', nodes, triangles, boundary, (56, 100., 200.),
+                    elevation)
+        entry = cache.load('abc')
+
+        np.testing.assert_array_equal(entry['nodes'], nodes)
+        np.testing.assert_array_equal(entry['triangles'], triangles)
+        np.testing.assert_array_equal(entry['geo_reference'], [56, 100., 200.])
+        np.testing.assert_array_equal(entry['elevation'], elevation)
+        self.assertEqual(entry['boundary'], boundary)
+
+        # no temporary files are left behind
+        self.assertEqual(os.listdir(cache.directory), ['abc.npz'])
+
+
+    def test_least_recently_used_are_evicted(self):
+
+        nodes, triangles, _ = rectangle_mesh(20, 20)
+        elevation = np.random.RandomState(0).rand(len(triangles), 3)
+
+        cache = MeshCache(os.path.join(self.directory, 'cache'))
+        for i, key in enumerate(['a', 'b', 'c']):
+            cache.store(key, nodes, triangles, {}, (0, 0., 0.), elevation)
+            os.utime(cache._path(key), (1000. * (i + 1),) * 2)
+
+        size = os.path.getsize(cache._path('a'))
+
+        # loading marks an entry as recently used
+        cache.load('a')
+
+        cache.max_bytes = 2.5 * size
+        cache.evict()
+
+        self.assertEqual(sorted(os.listdir(cache.directory)),
+                         ['a.npz', 'c.npz'])
+
+        cache.max_bytes = 0.
+        cache.evict()
+        self.assertEqual(os.listdir(cache.directory), [])
+
+
+    def test_boundary_encoding(self):
+
+        boundary = {(3, 0): 'left', (1, 2): 'right', (0, 1): 'left'}
+        edges, tag_ids, tag_names = encode_boundary(boundary)
+
+        self.assertEqual(list(tag_names), ['left', 'right'])
+        self.assertEqual(decode_boundary(edges, tag_ids, tag_names), boundary)
+        self.assertEqual(decode_boundary(*encode_boundary({})), {})
+
+
+class TestOutlineModel(ModelTestCase):
+
+    def outline_model(self, **params):
+
+        config = {'domain_type': 'outline',
+                  'boundary_filename': 'outline.csv',
+                  'elevation_filename': 'elevation.asc',
+                  'boundary_tags': {'exterior': [0, 1, 2, 3]},
+                  'boundary_conditions': {'exterior': 'Reflective'},
+                  'maximum_triangle_area': 20.,
+                  'mesh_cache_directory': 'cache'}
+        config.update(params)
+
+        return self.model(**config)
+
+
+    def write_elevation(self, rows):
+
+        with open('elevation.asc', 'w') as file_obj:
+            file_obj.write('ncols 4\nnrows 2\nxllcorner -10\nyllcorner -10\n'
+                           'cellsize 40\nNODATA_value -9999\n' + rows)
+        with open('elevation.prj', 'w') as file_obj:
+            file_obj.write(PRJ)
+
+
+    def test_warm_start(self):
+
+        with open('outline.csv', 'w') as file_obj:
+            file_obj.write('0,0\n100,0\n100,50\n0,50\n')
+        self.write_elevation('1 2 3 4\n5 6 7 8\n')
+
+        cold = self.outline_model(output_filename='cold')
+        self.assertEqual(len(os.listdir('cache')), 1)
+
+        # the mesh and elevation now come from the cache
+        os.remove('elevation.msh')
+        warm = self.outline_model(output_filename='warm')
+        self.assertFalse(os.path.exists('elevation.msh'))
+
+        cold_domain = cold._anuga.domain
+        warm_domain = warm._anuga.domain
+        np.testing.assert_array_equal(warm_domain.get_nodes(),
+                                      cold_domain.get_nodes())
+        np.testing.assert_array_equal(warm_domain.get_triangles(),
+                                      cold_domain.get_triangles())
+        self.assertEqual(warm_domain.boundary, cold_domain.boundary)
+        np.testing.assert_array_equal(warm.get_value('land_surface__elevation'),
+                                      cold.get_value('land_surface__elevation'))
+
+        # another elevation is another entry
+        self.write_elevation('1 2 3 4\n5 6 7 9\n')
+        self.outline_model(output_filename='changed')
+        self.assertEqual(len(os.listdir('cache')), 2)
@@ -0,0 +1,211 @@
+"""Tests of anuga_bmi.monitors."""
+
+import csv
+import unittest
+
+import numpy as np
+
+from anuga_bmi.monitors import _next_time, read_points
+
+from .models import ModelTestCase
+
+
+class TestReadPoints(ModelTestCase):
+
+    def test_dict(self):
+
+        names, xy = read_points({'b': [2., 3.], 'a': [0., 1.]})
+
+        self.assertEqual(names, ['a', 'b'])
+        np.testing.assert_array_equal(xy, [[0., 1.], [2., 3.]])
+
+
+    def test_csv(self):
+
+        for header in [True, False]:
+            with open('gauges.csv', 'w') as file_obj:
+                if header:
+                    file_obj.write('name,x,y\n')
+                file_obj.write('b,2,3\n a,0,1\n\n')
+
+            names, xy = read_points('gauges.csv')
+
+            self.assertEqual(names, ['a', 'b'])
+            np.testing.assert_array_equal(xy, [[0., 1.], [2., 3.]])
+
+
+    def test_no_points(self):
+
+        names, xy = read_points({})
+
+        self.assertEqual(names, [])
+        self.assertEqual(xy.shape, (0, 2))
+
+
+class TestNextTime(unittest.TestCase):
+
+    def test_grid(self):
+
+        self.assertEqual(_next_time(0., 5., 0.), 5.)
+        self.assertEqual(_next_time(0., 5., 7.3), 10.)
+        self.assertEqual(_next_time(5., 5., 21.), 25.)
+
+
+    def test_every_timestep(self):
+        self.assertEqual(_next_time(0., 0., 7.3), 7.3)
+
+
+class TestMonitors(ModelTestCase):
+
+    def test_gauges(self):
+
+        bmi = self.model(gauges={'inlet': [5., 40.], 'outlet': [95., 40.]},
+                         gauge_interval=5.)
+        bmi.update_until(20.)
+
+        monitors = bmi._anuga.monitors
+        domain = bmi._anuga.domain
+        results = monitors.results()
+
+        np.testing.assert_allclose(results['gauge_time'],
+                                   [0., 5., 10., 15., 20.])
+        self.assertEqual(list(results['gauge_names']), ['inlet', 'outlet'])
+        self.assertEqual(results['gauge_stage'].shape, (5, 2))
+
+        # the last sample is the interpolated stage at the gauges
+        stage = domain.get_quantity('stage')
+        expected = [stage.get_values(interpolation_points=[[x, y]])[0]
+                    for x, y in [[5., 40.], [95., 40.]]]
+        np.testing.assert_allclose(results['gauge_stage'][-1], expected,
+                                   atol=1e-10)
+
+        bmi.finalize()
+
+        with open('rectangle_gauges.csv', 'r') as file_obj:
+            rows = list(csv.reader(file_obj))
+
+        self.assertEqual(rows[0], ['time', 'inlet_stage', 'outlet_stage',
+                                   'inlet_height', 'outlet_height'])
+        self.assertEqual(len(rows), 6)
+        np.testing.assert_allclose([float(value) for value in rows[-1]][1:3],
+                                   expected, atol=1e-8)
+
+        with np.load('rectangle_monitors.npz') as saved:
+            np.testing.assert_array_equal(saved['gauge_time'],
+                                          results['gauge_time'])
+
+
+    def test_gauges_every_timestep(self):
+
+        bmi = self.model(gauges={'inlet': [5., 40.]}, gauge_interval=0.)
+        bmi.update_until(10.)
+
+        times = bmi._anuga.monitors.results()['gauge_time']
+
+        self.assertGreater(len(times), 3)
+        self.assertTrue(np.all(np.diff(times) > 0.))
+
+        bmi.finalize()
+
+
+    def test_gauge_outside_mesh(self):
+
+        self.assertRaises(ValueError, self.model,
+                          gauges={'inlet': [5., 40.], 'away': [500., 40.]})
+
+
+    def test_regions(self):
+
+        polygon = [[0., 0.], [30., 0.], [30., 80.], [0., 80.]]
+        bmi = self.model(regions_of_interest={'left': polygon},
+                         region_quantities=['height', 'stage'])
+        bmi.update_until(10.)
+
+        domain = bmi._anuga.domain
+        results = bmi._anuga.monitors.results()
+
+        x = domain.centroid_coordinates[:, 0]
+        np.testing.assert_array_equal(np.sort(results['left_triangles']),
+                                      np.flatnonzero(x < 30.))
+
+        np.testing.assert_allclose(results['region_time'], [0., 5., 10.])
+        self.assertEqual(results['left_height'].shape,
+                         (3, np.sum(x < 30.)))
+        np.testing.assert_array_equal(
+            results['left_stage'][-1],
+            domain.quantities['stage'].centroid_values[results['left_triangles']])
+
+        bmi.finalize()
+
+
+    def test_reductions(self):
+
+        bmi = self.model(reductions=['max_depth', 'max_speed', 'arrival_time'],
+                         arrival_depth=0.01)
+
+        max_depth = 0.
+        for time in [5., 10., 15., 20.]:
+            bmi.update_until(time)
+            height = bmi._anuga.domain.quantities['height'].centroid_values
+            max_depth = np.maximum(max_depth, height)
+
+        results = bmi._anuga.monitors.results()
+
+        # every timestep counts, not only the coupling times
+        self.assertTrue(np.all(results['max_depth'] >= max_depth))
+        self.assertTrue(np.all(results['max_speed'] >= 0.))
+        self.assertGreater(results['max_speed'].max(), 0.)
+
+        arrival_time = results['arrival_time']
+        arrived = ~np.isnan(arrival_time)
+        self.assertTrue(np.all(arrival_time[arrived] > 0.))
+        self.assertTrue(np.all(arrival_time[arrived] <= 20.))
+        np.testing.assert_array_equal(arrived, results['max_depth'] > 0.01)
+
+        # the flood comes in from the left
+        x = bmi._anuga.domain.centroid_coordinates[:, 0]
+        self.assertLess(arrival_time[np.argmin(x)], arrival_time[np.argmax(x)])
+
+        bmi.finalize()
+
+
+    def test_cumulative_deposition(self):
+
+        bmi = self.model(reductions=['cumulative_deposition'])
+
+        monitors = bmi._anuga.monitors
+        elevation = bmi._anuga.domain.quantities['elevation'].centroid_values
+
+        elevation[0] += 0.5
+        elevation[1] -= 0.5
+        monitors()
+        elevation[0] -= 0.2
+        monitors()
+        elevation[0] += 0.1
+        monitors()
+
+        deposition = monitors.results()['cumulative_deposition']
+
+        # erosion is not counted
+        self.assertAlmostEqual(deposition[0], 0.6)
+        self.assertEqual(deposition[1], 0.)
+        self.assertEqual(np.count_nonzero(deposition), 1)
+
+        bmi.finalize()
+
+
+    def test_unknown_reduction(self):
+        self.assertRaises(ValueError, self.model, reductions=['max_stage'])
+
+
+    def test_no_monitors(self):
+
+        bmi = self.model()
+
+        self.assertIsNone(bmi._anuga.monitors)
+
+        bmi.finalize()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,246 @@
+"""Tests of anuga_bmi.output."""
+
+import threading
+import unittest
+
+import numpy as np
+
+from anuga_bmi.output import BackgroundWriter, DirectWriter
+
+from .models import ModelTestCase
+
+
+class RecordingSink(object):
+    """Sink that keeps copies of the snapshots it writes."""
+
+    def __init__(self, fail_at=None, gate=None):
+        self.written = []
+        self.closed = False
+        self.fail_at = fail_at
+        self.gate = gate
+
+    def capture(self, domain):
+        return {'stage': domain.stage}
+
+    def write(self, time, arrays):
+        if self.gate is not None:
+            self.gate.wait()
+        if len(self.written) == self.fail_at:
+            raise IOError('disk full')
+        self.written.append((time, dict((name, value.copy())
+                                        for name, value in arrays.items())))
+
+    def close(self):
+        self.closed = True
+
+
+class Domain(object):
+
+    def __init__(self):
+        self.time = 0.
+        self.stage = np.zeros(5)
+
+    def get_time(self):
+        return self.time
+
+
+class TestWriters(unittest.TestCase):
+
+    def snapshots(self, writer, domain, n):
+        """Store n snapshots, reusing the same array."""
+        for i in range(n):
+            domain.time = float(i)
+            domain.stage[:] = i
+            writer.store_timestep(domain)
+
+
+    def check(self, sink, n):
+        self.assertEqual([time for time, _ in sink.written],
+                         [float(i) for i in range(n)])
+        for i, (_, arrays) in enumerate(sink.written):
+            np.testing.assert_array_equal(arrays['stage'], i)
+
+
+    def test_direct_writer(self):
+
+        sink = RecordingSink()
+        writer = DirectWriter(sink)
+        self.snapshots(writer, Domain(), 3)
+        writer.close()
+
+        self.check(sink, 3)
+        self.assertTrue(sink.closed)
+
+
+    def test_background_writer(self):
+
+        for n_slots in [1, 2, 4]:
+            sink = RecordingSink()
+            writer = BackgroundWriter(sink, n_slots)
+            self.snapshots(writer, Domain(), 10)
+
+            writer.flush()
+            self.check(sink, 10)
+
+            writer.close()
+            self.assertTrue(sink.closed)
+
+
+    def test_backpressure(self):
+
+        # with the sink blocked, submit blocks once every slot is used
+        gate = threading.Event()
+        sink = RecordingSink(gate=gate)
+        writer = BackgroundWriter(sink, n_slots=2)
+        domain = Domain()
+
+        thread = threading.Thread(target=self.snapshots,
+                                  args=(writer, domain, 4))
+        thread.start()
+        thread.join(0.5)
+        self.assertTrue(thread.is_alive())
+        self.assertEqual(len(sink.written), 0)
+
+        gate.set()
+        thread.join()
+        writer.close()
+        self.check(sink, 4)
+
+
+    def test_errors_are_raised_in_the_caller(self):
+
+        sink = RecordingSink(fail_at=1)
+        writer = BackgroundWriter(sink, n_slots=2)
+        self.snapshots(writer, Domain(), 3)
+
+        self.assertRaises(RuntimeError, writer.flush)
+
+        # the error is raised once, and later snapshots are dropped
+        writer.flush()
+        self.assertEqual(len(sink.written), 1)
+
+        writer.close()
+        self.assertTrue(sink.closed)
+
+
+    def test_errors_are_raised_on_close(self):
+
+        sink = RecordingSink(fail_at=0)
+        writer = BackgroundWriter(sink)
+        self.snapshots(writer, Domain(), 1)
+
+        self.assertRaises(RuntimeError, writer.close)
+        self.assertTrue(sink.closed)
+
+
+class TestSWWOutput(ModelTestCase):
+
+    def run_model(self, name, **params):
+        """Variables of the SWW file of a flood run."""
+
+        import netCDF4
+
+        bmi = self.model(output_filename=name, **params)
+        for time in [5., 7., 15., 20.]:
+            bmi.update_until(time)
+        bmi.finalize()
+
+        with netCDF4.Dataset(name + '.sww') as dataset:
+            return dict((name, np.array(variable[:]))
+                        for name, variable in dataset.variables.items())
+
+
+    def test_async_output_matches_anuga(self):
+
+        sync = self.run_model('sync', output_mode='sync')
+        background = self.run_model('async', output_mode='async',
+                                    output_buffer_size=2)
+
+        np.testing.assert_allclose(sync['time'], [0., 5., 10., 15., 20.])
+
+        for name in ['time', 'stage', 'xmomentum', 'ymomentum', 'elevation']:
+            np.testing.assert_array_equal(background[name], sync[name],
+                                          err_msg=name)
+
+
+class TestNetCDF4Output(ModelTestCase):
+
+    def run_model(self, name, **params):
+        """Final stage of a flood run, and its NetCDF4 dataset (open)."""
+
+        import netCDF4
+
+        bmi = self.model(output_filename=name, output_format='netcdf4',
+                         **params)
+        for time in [5., 7., 15., 20.]:
+            bmi.update_until(time)
+        stage = np.array(bmi._anuga.domain.quantities['stage'].centroid_values)
+        n_cells = len(bmi._anuga.domain)
+        bmi.finalize()
+
+        dataset = netCDF4.Dataset(name + '.nc')
+        self.addCleanup(dataset.close)
+
+        self.assertEqual(len(dataset.dimensions['cell']), n_cells)
+
+        return stage, dataset
+
+
+    def test_centroid_values(self):
+
+        stage, dataset = self.run_model('flood')
+
+        np.testing.assert_allclose(dataset.variables['time'][:],
+                                   [0., 5., 10., 15., 20.])
+
+        variable = dataset.variables['stage']
+        self.assertEqual(variable.dimensions, ('time', 'cell'))
+        self.assertEqual(variable.dtype, np.float32)
+        np.testing.assert_allclose(variable[-1], stage, rtol=1e-6, atol=1e-6)
+
+        # elevation is stored once
+        self.assertEqual(dataset.variables['elevation'].dimensions, ('cell',))
+        self.assertEqual(dataset.variables['x'].shape, stage.shape)
+        self.assertEqual(dataset.variables['triangles'].shape,
+                         (stage.size, 3))
+
+
+    def test_compression_and_chunks(self):
+
+        _, dataset = self.run_model('chunked', output_compression_level=6,
+                                    output_precision='float64',
+                                    output_chunks={'stage': [16, 32]})
+
+        stage = dataset.variables['stage']
+        self.assertEqual(stage.dtype, np.float64)
+        self.assertEqual(stage.chunking(), [16, 32])
+        self.assertTrue(stage.filters()['zlib'])
+        self.assertEqual(stage.filters()['complevel'], 6)
+        self.assertTrue(stage.filters()['shuffle'])
+
+        # the default chunks are clipped to the number of cells
+        n_cells = len(dataset.dimensions['cell'])
+        self.assertEqual(dataset.variables['xmomentum'].chunking(),
+                         [64, n_cells])
+
+
+    def test_uncompressed(self):
+
+        _, dataset = self.run_model('plain', output_compression_level=0)
+
+        self.assertFalse(dataset.variables['stage'].filters()['zlib'])
+        self.assertFalse(dataset.variables['x'].filters()['zlib'])
+
+
+    def test_least_significant_digit(self):
+
+        stage, dataset = self.run_model(
+            'quantized', output_least_significant_digit={'stage': 2})
+
+        values = dataset.variables['stage'][-1]
+        self.assertGreater(np.abs(values - stage).max(), 0.)
+        np.testing.assert_allclose(values, stage, atol=0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
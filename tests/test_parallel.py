@@ -0,0 +1,77 @@
+"""Tests of anuga_bmi.parallel, on one process."""
+
+import unittest
+
+import numpy as np
+
+from anuga_bmi.parallel import DomainDecomposition
+
+
+class Domain(object):
+    """The attributes of a distributed domain that the decomposition uses."""
+
+    def __init__(self, global_ids, full_flag, number_of_global_triangles):
+        self.tri_l2g = global_ids
+        self.tri_full_flag = full_flag
+        self.number_of_global_triangles = number_of_global_triangles
+
+
+class TestDomainDecomposition(unittest.TestCase):
+
+    def setUp(self):
+
+        # 4 full triangles and 2 ghosts of a 10 triangle mesh
+        self.decomposition = DomainDecomposition(
+            Domain([7, 2, 5, 9, 3, 0], [1, 1, 1, 1, 0, 0], 10))
+
+
+    def test_localize_all(self):
+
+        src = np.arange(10.) * 10.
+        values, local = self.decomposition.localize(src)
+
+        self.assertIsNone(local)
+        np.testing.assert_array_equal(values, [70., 20., 50., 90., 30., 0.])
+
+
+    def test_localize_indices(self):
+
+        values, local = self.decomposition.localize([10., 20., 30., 40.],
+                                                    [4, 5, 0, 7])
+
+        np.testing.assert_array_equal(local, [0, 2, 5])
+        np.testing.assert_array_equal(values, [40., 20., 30.])
+
+        value, local = self.decomposition.localize(1.5, [4, 5, 0, 7])
+        self.assertEqual(value, 1.5)
+        np.testing.assert_array_equal(local, [0, 2, 5])
+
+
+    def test_localize_repeated_indices(self):
+
+        # the last value of each repeated index wins, as in IndexPlan
+        indices = [5, 2, 8, 5, 2, 5, 2, 2]
+        src = np.arange(len(indices), dtype=float)
+
+        for _ in range(5):
+            values, local = self.decomposition.localize(src, indices)
+
+            np.testing.assert_array_equal(local, [1, 2])
+            np.testing.assert_array_equal(values, [7., 5.])
+
+        # long runs of equal keys, where an unstable sort reorders them
+        indices = np.repeat([2, 9], 1000)
+        values, local = self.decomposition.localize(np.arange(2000.), indices)
+
+        np.testing.assert_array_equal(local, [1, 3])
+        np.testing.assert_array_equal(values, [999., 1999.])
+
+
+    def test_gather(self):
+
+        out = np.full(10, -1.)
+        self.decomposition.gather(np.array([1., 2., 3., 4., 5., 6.]), out=out)
+
+        # only the full triangles are written
+        np.testing.assert_array_equal(out, [-1., -1., 2., -1., -1., 3.,
+                                            -1., 1., -1., 4.])
@@ -0,0 +1,180 @@
+"""Tests of anuga_bmi.raster."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from anuga_bmi.raster import (RasterGrid, RasterSeries, TriangleField,
+                              area_weights, read_asc)
+
+from .meshes import rectangle_mesh
+
+
+# 3 x 2 raster of 2 m cells, with a nodata cell
+ASC = """ncols\t3
+nrows   2
+xllcorner 10.0
+yllcorner\t\t20.0
+cellsize  2
+NODATA_value -9999
+1 2 3
+4 -9999 6
+"""
+
+
+class TestReadAsc(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def write(self, text):
+
+        filename = os.path.join(self.directory, 'raster.asc')
+        with open(filename, 'w') as file_obj:
+            file_obj.write(text)
+
+        return filename
+
+
+    def test_header_with_any_whitespace(self):
+
+        grid, values = read_asc(self.write(ASC))
+
+        # cell centres; the first row is the northernmost
+        np.testing.assert_array_equal(grid.x, [11., 13., 15.])
+        np.testing.assert_array_equal(grid.y, [23., 21.])
+        np.testing.assert_array_equal(values, [[1., 2., 3.],
+                                               [4., np.nan, 6.]])
+
+
+    def test_cell_centre_header(self):
+
+        text = ASC.replace('xllcorner 10.0', 'XLLCENTER 11.0')
+        text = text.replace('yllcorner\t\t20.0', 'YLLCENTER 21.0')
+        grid, _ = read_asc(self.write(text))
+
+        np.testing.assert_array_equal(grid.x, [11., 13., 15.])
+        np.testing.assert_array_equal(grid.y, [23., 21.])
+
+
+    def test_single_column(self):
+
+        text = ('ncols 1\nnrows 3\nxllcorner 0\nyllcorner 0\n'
+                'cellsize 1\n7\n8\n9\n')
+        _, values = read_asc(self.write(text))
+
+        np.testing.assert_array_equal(values, [[7.], [8.], [9.]])
+
+
+class TestAreaWeights(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes, self.triangles, _ = rectangle_mesh(4, 2)
+
+
+    def test_triangles_inside_one_cell(self):
+
+        # 2 m cells on [0, 4] x [0, 4]: each triangle lies in one cell
+        grid = RasterGrid([1., 3.], [3., 1.])
+        self.nodes, self.triangles, _ = rectangle_mesh(4, 4)
+
+        weights = area_weights(grid, self.nodes, self.triangles)
+        centroids = self.nodes[self.triangles].mean(axis=1)
+
+        np.testing.assert_allclose(weights.sum(axis=1).A.ravel(), 1.)
+        np.testing.assert_array_equal(weights.toarray().argmax(axis=1),
+                                      grid.cell_index(centroids))
+
+
+    def test_fractions_of_cells(self):
+
+        # cells of 1.5 m cut through the triangles
+        grid = RasterGrid(0.75 + 1.5 * np.arange(3), 0.75 + 1.5 * np.arange(2))
+        weights = area_weights(grid, self.nodes, self.triangles,
+                               samples_per_edge=8)
+
+        # the raster covers [0, 4.5] x [0, 3]: every triangle is inside
+        np.testing.assert_allclose(weights.sum(axis=1).A.ravel(), 1.)
+
+        # the area of the mesh in each cell
+        cell_areas = weights.T.dot(np.full(len(self.triangles), 0.5))
+        expected = np.outer([1.5, 0.5], [1.5, 1.5, 1.]).ravel()
+        np.testing.assert_allclose(cell_areas, expected, atol=0.05)
+
+
+    def test_triangles_outside(self):
+
+        grid = RasterGrid([0.5, 1.5], [0.5, 1.5])
+        weights = area_weights(grid, self.nodes, self.triangles)
+        centroids = self.nodes[self.triangles].mean(axis=1)
+
+        inside = centroids[:, 0] < 2.
+        row_sums = weights.sum(axis=1).A.ravel()
+        np.testing.assert_allclose(row_sums[inside], 1.)
+        np.testing.assert_array_equal(row_sums[~inside], 0.)
+
+
+class TestRasterSeries(unittest.TestCase):
+
+    def setUp(self):
+
+        import netCDF4
+
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'rain.nc')
+
+        with netCDF4.Dataset(self.filename, 'w') as dataset:
+            dataset.createDimension('time', 3)
+            dataset.createDimension('y', 2)
+            dataset.createDimension('x', 2)
+            dataset.createVariable('time', 'f8', ('time',))[:] = [0., 10., 20.]
+            dataset.createVariable('x', 'f8', ('x',))[:] = [1., 3.]
+            dataset.createVariable('y', 'f8', ('y',))[:] = [1., 3.]
+            rain = dataset.createVariable('rain', 'f8', ('time', 'y', 'x'),
+                                          fill_value=-1.)
+
+            # the same in both rows
+            frames = np.array([[1., 2.], [3., -1.], [5., 6.]])
+            rain[:] = np.ma.masked_equal(np.repeat(frames[:, np.newaxis], 2,
+                                                   axis=1), -1.)
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def test_frames(self):
+
+        series = RasterSeries(self.filename)
+
+        self.assertEqual(len(series), 3)
+        self.assertEqual([series.frame_index(t) for t in [-1., 0., 9.9, 10., 25.]],
+                         [-1, 0, 0, 1, 2])
+        np.testing.assert_array_equal(series.values(1), [3., np.nan] * 2)
+        np.testing.assert_array_equal(series.frame(1), [3., 0.] * 2)
+
+        series.close()
+
+
+    def test_triangle_field(self):
+
+        # 2 m cells on [0, 4] x [0, 4]
+        nodes, triangles, _ = rectangle_mesh(4, 4)
+        field = TriangleField(RasterSeries(self.filename), nodes, triangles,
+                              scale=10.)
+        left = nodes[triangles].mean(axis=1)[:, 0] < 2.
+
+        np.testing.assert_array_equal(field.at(-5.), 0.)
+        np.testing.assert_allclose(field.at(5.), np.where(left, 10., 20.))
+        np.testing.assert_allclose(field.at(15.), np.where(left, 30., 0.))
+        np.testing.assert_allclose(field.at(20.), np.where(left, 50., 60.))
+
+        field.series.close()
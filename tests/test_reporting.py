@@ -0,0 +1,106 @@
+"""Tests of anuga_bmi.reporting and the progress reporting of the BMI."""
+
+import logging
+import unittest
+
+from anuga_bmi.reporting import ProgressReporter
+
+from .models import ModelTestCase
+
+
+class RecordingHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class TestProgressReporter(unittest.TestCase):
+
+    def setUp(self):
+
+        self.messages = []
+        self.handler = RecordingHandler()
+        self.logger = logging.getLogger('anuga_bmi.test_reporting')
+        self.logger.setLevel(logging.INFO)
+        self.logger.addHandler(self.handler)
+
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+
+    def callback(self, message, statistics):
+        self.messages.append((message, statistics['advances']))
+
+
+    def test_levels(self):
+
+        reporter = ProgressReporter(logger=self.logger)
+
+        # YAML reads an unquoted off as False
+        reporter.set_level(False)
+        reporter.record_advance(10, 0.5, 1.)
+        self.assertEqual(self.handler.messages, [])
+
+        reporter.set_level('Summary')
+        reporter.record_advance(10, 0.5, 2.)
+        self.assertEqual(self.handler.messages,
+                         ['Time = 2.0000, steps = 10, wall time = 0.500 s'])
+
+        self.assertRaises(AssertionError, reporter.set_level, 'loud')
+
+
+    def test_counters(self):
+
+        reporter = ProgressReporter()
+        reporter.record_advance(10, 0.5, 1., elapsed=2.)
+        reporter.record_advance(30, 1.5, 2., elapsed=6.)
+
+        statistics = reporter.statistics
+        self.assertEqual(statistics['advances'], 2)
+        self.assertEqual(statistics['last_steps'], 30)
+        self.assertEqual(statistics['wall_time'], 2.)
+        self.assertEqual(statistics['last_mean_timestep'], 0.2)
+
+
+    def test_callback_and_interval(self):
+
+        reporter = ProgressReporter('summary', interval=3600.,
+                                    callback=self.callback,
+                                    logger=self.logger)
+
+        for n in range(3):
+            reporter.record_advance(10, 0.5, float(n))
+
+        # one message per hour, to the callback only
+        self.assertEqual(self.messages,
+                         [('Time = 0.0000, steps = 10, wall time = 0.500 s', 1)])
+        self.assertEqual(self.handler.messages, [])
+
+
+class TestProgressReportingModel(ModelTestCase):
+
+    def test_set_progress_reporting_keeps_the_callback(self):
+
+        messages = []
+        bmi = self.model()
+        bmi.set_progress_reporting('summary',
+                                   callback=lambda *args: messages.append(args))
+
+        # changing the level or interval does not drop the callback
+        bmi.set_progress_reporting('summary', interval=0.)
+        bmi.update_until(2.)
+
+        self.assertTrue(messages)
+        message, statistics = messages[-1]
+        self.assertTrue(message.startswith('Time = 2.0000'))
+        self.assertGreater(statistics['steps'], 0)
+
+        statistics = bmi.get_stepping_statistics()
+        self.assertEqual(statistics['advances'], len(messages))
+        self.assertGreater(statistics['max_timestep'], 0.)
@@ -0,0 +1,110 @@
+"""Tests of anuga_bmi.spatial."""
+
+import unittest
+
+import numpy as np
+
+from anuga_bmi.spatial import SpatialIndex, points_in_polygon
+
+from .meshes import rectangle_mesh
+
+
+def brute_force_weights(nodes, triangles, point):
+    """Barycentric weights of a point in every triangle."""
+
+    a, b, c = [nodes[triangles[:, k]] for k in range(3)]
+    u = b - a
+    v = c - a
+    d = point - a
+    det = u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]
+    w1 = (d[:, 0] * v[:, 1] - d[:, 1] * v[:, 0]) / det
+    w2 = (u[:, 0] * d[:, 1] - u[:, 1] * d[:, 0]) / det
+
+    return np.column_stack([1. - w1 - w2, w1, w2])
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes, self.triangles, _ = rectangle_mesh(9, 6, jitter=0.3)
+        self.index = SpatialIndex(self.nodes, self.triangles)
+        self.rng = np.random.RandomState(18)
+
+
+    def test_locate_matches_brute_force(self):
+
+        points = self.rng.uniform([0., 0.], [9., 6.], (300, 2))
+        ids, weights = self.index.locate(points)
+
+        for point, k, w in zip(points, ids, weights):
+            expected = brute_force_weights(self.nodes, self.triangles, point)
+            inside = np.flatnonzero(np.all(expected >= -1e-12, axis=1))
+
+            self.assertEqual(len(inside), 1)
+            self.assertEqual(k, inside[0])
+            np.testing.assert_allclose(w, expected[k], atol=1e-12)
+
+
+    def test_weights_interpolate_linear_fields(self):
+
+        points = self.rng.uniform([0., 0.], [9., 6.], (100, 2))
+        ids, weights = self.index.locate(points)
+
+        field = 2. * self.nodes[:, 0] - 3. * self.nodes[:, 1] + 1.
+        values = np.sum(weights * field[self.triangles[ids]], axis=1)
+
+        np.testing.assert_allclose(values, 2. * points[:, 0] -
+                                   3. * points[:, 1] + 1.)
+
+
+    def test_nodes_and_edges(self):
+
+        # every node, and the midpoint of every edge, is in a triangle
+        # that has it as a vertex or on an edge
+        midpoints = 0.5 * (self.nodes[self.triangles[:, 0]] +
+                           self.nodes[self.triangles[:, 1]])
+        points = np.concatenate([self.nodes, midpoints])
+
+        ids, weights = self.index.locate(points)
+
+        self.assertTrue(np.all(ids >= 0))
+        np.testing.assert_allclose(weights.sum(axis=1), 1.)
+        self.assertTrue(np.all(weights >= -1e-10))
+        np.testing.assert_allclose(
+            np.einsum('ij,ijk->ik', weights, self.nodes[self.triangles[ids]]),
+            points, atol=1e-12)
+
+
+    def test_outside_points(self):
+
+        points = np.array([[-0.5, 1.], [9.5, 3.], [4., -1.], [4., 100.]])
+        ids, weights = self.index.locate(points)
+
+        np.testing.assert_array_equal(ids, -1)
+        np.testing.assert_array_equal(weights, 0.)
+
+
+    def test_no_points(self):
+
+        ids, weights = self.index.locate(np.zeros((0, 2)))
+
+        self.assertEqual(ids.shape, (0,))
+        self.assertEqual(weights.shape, (0, 3))
+
+
+    def test_query_polygon(self):
+
+        # the bins give the same triangles as testing every centroid
+        polygon = [[1., 1.], [6., 1.5], [5., 5.], [1.5, 4.]]
+        found = self.index.query_polygon(polygon)
+
+        centroids = self.nodes[self.triangles].mean(axis=1)
+        expected = np.flatnonzero(points_in_polygon(centroids, polygon))
+
+        self.assertTrue(len(expected) > 0)
+
+        np.testing.assert_array_equal(found, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""Tests of anuga_bmi.topology."""
+
+import unittest
+
+import numpy as np
+
+from anuga_bmi.topology import MeshTopology
+
+from .meshes import rectangle_mesh
+from .models import ModelTestCase
+
+
+class TestMeshTopology(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes, self.triangles, self.neighbours = rectangle_mesh(
+            5, 4, jitter=0.2)
+        self.topology = MeshTopology(self.nodes, self.triangles)
+
+
+    def test_counts(self):
+
+        topology = self.topology
+        self.assertEqual(topology.node_count, 30)
+        self.assertEqual(topology.face_count, 40)
+
+        # Euler's formula for a mesh without holes
+        self.assertEqual(topology.edge_count,
+                         topology.node_count + topology.face_count - 1)
+
+        np.testing.assert_array_equal(topology.nodes_per_face, 3)
+        np.testing.assert_array_equal(topology.offsets,
+                                      3 * np.arange(1, topology.face_count + 1))
+
+
+    def test_edges_are_opposite_the_vertices(self):
+
+        edge_nodes = self.topology.edge_nodes[self.topology.face_edges]
+
+        for i in range(3):
+            others = self.triangles[:, [(i + 1) % 3, (i + 2) % 3]]
+            np.testing.assert_array_equal(np.sort(edge_nodes[:, i], axis=1),
+                                          np.sort(others, axis=1))
+
+
+    def test_neighbours_share_edges(self):
+
+        face_edges = self.topology.face_edges
+        counts = np.bincount(face_edges.ravel())
+
+        for k, i in zip(*np.nonzero(self.neighbours >= 0)):
+            self.assertIn(face_edges[k, i], face_edges[self.neighbours[k, i]])
+
+        # interior edges have two faces, boundary edges one
+        boundary = self.neighbours < 0
+        np.testing.assert_array_equal(counts[face_edges[boundary]], 1)
+        np.testing.assert_array_equal(counts[face_edges[~boundary]], 2)
+
+
+    def test_edge_midpoints(self):
+
+        np.testing.assert_allclose(
+            self.topology.edge_x,
+            self.nodes[self.topology.edge_nodes, 0].mean(axis=1))
+        np.testing.assert_allclose(
+            self.topology.edge_y,
+            self.nodes[self.topology.edge_nodes, 1].mean(axis=1))
+
+
+    def test_arrays_are_read_only(self):
+
+        for name in ['node_x', 'node_y', 'face_nodes', 'nodes_per_face',
+                     'offsets', 'edge_nodes', 'face_edges', 'edge_x', 'edge_y']:
+            array = getattr(self.topology, name)
+            self.assertFalse(array.flags.writeable, name)
+            self.assertTrue(array.flags.c_contiguous, name)
+
+
+class TestGridConnectivity(ModelTestCase):
+
+    def test_references_and_copies(self):
+
+        bmi = self.model()
+        domain = bmi._anuga.domain
+
+        face_nodes = bmi.get_grid_face_nodes(0)
+        self.assertIs(bmi.get_grid_face_nodes(0), face_nodes)
+        np.testing.assert_array_equal(face_nodes, domain.get_triangles())
+
+        out = np.empty(face_nodes.size, dtype=np.int32)
+        self.assertIs(bmi.get_grid_face_nodes(0, out), out)
+        np.testing.assert_array_equal(out, face_nodes.ravel())
+
+        self.assertEqual(bmi.get_grid_node_count(0), len(domain.get_nodes()))
+        self.assertEqual(bmi.get_grid_face_count(0), len(domain))
+        self.assertEqual(bmi.get_grid_edge_count(0),
+                         len(bmi.get_grid_edge_nodes(0)))
+        np.testing.assert_array_equal(bmi.get_grid_connectivity(0),
+                                      face_nodes.ravel())
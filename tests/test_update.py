@@ -0,0 +1,75 @@
+"""Tests of advancing BmiAnuga in time."""
+
+import numpy as np
+
+from .models import ModelTestCase
+
+
+class TestUpdate(ModelTestCase):
+
+    def test_update_advances_one_time_step(self):
+
+        bmi = self.model(coupling_timestep=0.5)
+        domain = bmi._anuga.domain
+
+        for i in range(1, 8):
+            bmi.update()
+            self.assertAlmostEqual(bmi.get_current_time(), 0.5 * i)
+            self.assertAlmostEqual(domain.get_time(), 0.5 * i)
+
+        bmi.finalize()
+
+
+    def test_generator_is_kept(self):
+
+        bmi = self.model(coupling_timestep=0.5)
+        solver = bmi._anuga
+        bmi.update()
+        generator = solver._evolve
+
+        for _ in range(5):
+            bmi.update()
+        self.assertIs(solver._evolve, generator)
+
+        bmi.finalize()
+        self.assertIsNone(solver._evolve)
+
+
+    def test_update_until_in_one_advance(self):
+
+        looped = self.model(output_filename='looped', coupling_timestep=0.5)
+        for _ in range(15):
+            looped.update()
+
+        single = self.model(output_filename='single', coupling_timestep=0.5)
+        single.update_until(7.5)
+
+        self.assertEqual(single.get_current_time(), 7.5)
+        self.assertEqual(single._anuga.domain.get_time(), 7.5)
+        self.assertEqual(single.get_stepping_statistics()['advances'], 1)
+        self.assertEqual(looped.get_stepping_statistics()['advances'], 15)
+
+        import netCDF4
+
+        # the output times do not depend on how the run is split
+        looped.finalize()
+        single.finalize()
+        for name in ['looped', 'single']:
+            with netCDF4.Dataset(name + '.sww') as dataset:
+                np.testing.assert_allclose(dataset.variables['time'][:],
+                                           [0., 5.])
+
+
+    def test_update_until_the_past(self):
+
+        bmi = self.model()
+        bmi.update_until(2.)
+        bmi.update_until(1.)
+
+        self.assertEqual(bmi.get_current_time(), 2.)
+        self.assertEqual(bmi.get_stepping_statistics()['advances'], 1)
+
+        bmi.update_frac(0.5)
+        self.assertAlmostEqual(bmi.get_current_time(), 4.5)
+
+        bmi.finalize()
@@ -0,0 +1,162 @@
+"""Tests of getting and setting BmiAnuga values."""
+
+import numpy as np
+
+from .models import ModelTestCase
+
+
+STAGE = 'land_surface_water_surface__elevation'
+DEPTH = 'land_surface_water__depth'
+ELEVATION = 'land_surface__elevation'
+FRICTION = 'manning_n_parameter'
+
+
+class TestValueRefs(ModelTestCase):
+
+    def setUp(self):
+        super(TestValueRefs, self).setUp()
+        self.bmi = self.model(initial_flow_depth=0.5)
+        self.quantities = self.bmi._anuga.domain.quantities
+
+
+    def assert_consistent(self, names, indices=slice(None)):
+        """Depth = stage - elevation, and flat written triangles."""
+
+        stage = self.quantities['stage'].centroid_values
+        elevation = self.quantities['elevation'].centroid_values
+        np.testing.assert_allclose(self.quantities['height'].centroid_values,
+                                   stage - elevation)
+
+        for quantity in [self.quantities[name] for name in names]:
+            for values in [quantity.vertex_values, quantity.edge_values]:
+                np.testing.assert_array_equal(
+                    values[indices],
+                    np.repeat(quantity.centroid_values[indices, np.newaxis],
+                              3, axis=1))
+
+
+    def test_refs_are_the_centroid_values(self):
+
+        for var_name, name in [(STAGE, 'stage'), (DEPTH, 'height'),
+                               (ELEVATION, 'elevation'), (FRICTION, 'friction')]:
+            self.assertIs(self.bmi.get_value_ref(var_name),
+                          self.quantities[name].centroid_values)
+
+
+    def test_refs_stay_valid_after_set_value(self):
+
+        stage = self.bmi.get_value_ref(STAGE)
+        depth = self.bmi.get_value_ref(DEPTH)
+        elevation = self.bmi.get_value_ref(ELEVATION)
+        old_depth = depth.copy()
+
+        new_elevation = elevation - 1.
+        self.bmi.set_value(ELEVATION, new_elevation)
+
+        # the water surface does not move with the bed
+        np.testing.assert_array_equal(elevation, new_elevation)
+        np.testing.assert_allclose(depth, old_depth + 1.)
+        self.assertIs(self.bmi.get_value_ref(STAGE), stage)
+        self.assert_consistent(['elevation', 'height'])
+
+        self.bmi.set_value(DEPTH, np.full(len(depth), 0.25))
+        np.testing.assert_allclose(stage, elevation + 0.25)
+        self.assert_consistent(['stage', 'height'])
+
+
+    def test_set_value_at_indices(self):
+
+        stage = self.bmi.get_value(STAGE)
+        vertex_values = self.quantities['stage'].vertex_values.copy()
+        indices = [4, 9, 2]
+
+        self.bmi.set_value_at_indices(STAGE, [1., 2., 3.], indices)
+
+        stage[indices] = [1., 2., 3.]
+        np.testing.assert_array_equal(self.bmi.get_value(STAGE), stage)
+        np.testing.assert_array_equal(
+            self.bmi.get_value_at_indices(STAGE, indices), [1., 2., 3.])
+
+        # only the written triangles are flattened
+        self.assert_consistent(['stage', 'height'], indices)
+        others = np.setdiff1d(np.arange(len(stage)), indices)
+        np.testing.assert_array_equal(
+            self.quantities['stage'].vertex_values[others],
+            vertex_values[others])
+
+
+    def test_values_follow_the_model(self):
+
+        stage = self.bmi.get_value_ref(STAGE)
+        self.bmi.update_until(2.)
+
+        np.testing.assert_array_equal(
+            stage, self.bmi._anuga.domain.quantities['stage'].centroid_values)
+        self.assertTrue(np.any(stage != self.bmi.get_value(ELEVATION) + 0.5))
+
+
+class TestBatchedValues(ModelTestCase):
+
+    def test_get_values_reuses_buffers(self):
+
+        bmi = self.model(initial_flow_depth=0.5)
+        out = bmi.get_values([STAGE, DEPTH])
+        buffers = dict(out)
+
+        bmi.update_until(1.)
+        values = bmi.get_values([STAGE, DEPTH, ELEVATION], out)
+
+        self.assertIs(values, out)
+        self.assertIs(out[STAGE], buffers[STAGE])
+        self.assertIs(out[DEPTH], buffers[DEPTH])
+        for var_name in [STAGE, DEPTH, ELEVATION]:
+            np.testing.assert_array_equal(out[var_name],
+                                          bmi.get_value_ref(var_name))
+
+
+    def test_set_values_matches_set_value(self):
+
+        one = self.model(output_filename='one', initial_flow_depth=0.5)
+        many = self.model(output_filename='many', initial_flow_depth=0.5)
+
+        n = one.get_grid_size(0)
+        rng = np.random.RandomState(3)
+        values = {ELEVATION: rng.uniform(-2., 0., n),
+                  DEPTH: rng.uniform(0., 1., n),
+                  FRICTION: np.full(n, 0.03)}
+
+        # the depth is written last, so the stage follows both
+        for var_name in [ELEVATION, DEPTH, FRICTION]:
+            one.set_value(var_name, values[var_name])
+        many.set_values(values)
+
+        for var_name in [STAGE, DEPTH, ELEVATION, FRICTION]:
+            np.testing.assert_allclose(many.get_value(var_name),
+                                       one.get_value(var_name),
+                                       err_msg=var_name)
+        np.testing.assert_allclose(many.get_value(STAGE),
+                                   values[ELEVATION] + values[DEPTH])
+
+
+    def test_set_values_at_indices(self):
+
+        bmi = self.model(initial_flow_depth=0.5)
+        stage = bmi.get_value(STAGE)
+        elevation = bmi.get_value(ELEVATION)
+
+        indices = [7, 3, 3, 12]
+        plan = bmi.create_index_plan(indices)
+
+        for where in [indices, plan]:
+            bmi.set_values({STAGE: [1., 2., 3., 4.],
+                            ELEVATION: [0., -1., -2., -3.]}, where)
+
+            # the last value of a repeated index wins
+            stage[[7, 3, 12]] = [1., 3., 4.]
+            elevation[[7, 3, 12]] = [0., -2., -3.]
+            np.testing.assert_array_equal(bmi.get_value(STAGE), stage)
+            np.testing.assert_array_equal(bmi.get_value(ELEVATION), elevation)
+            np.testing.assert_allclose(bmi.get_value(DEPTH), stage - elevation)
+
+        np.testing.assert_array_equal(
+            bmi.get_value_at_indices(STAGE, plan), [1., 3., 3., 4.])